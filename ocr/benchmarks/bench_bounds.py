@@ -0,0 +1,128 @@
+"""
+bench_bounds.py
+
+Micro-benchmark for content-bounds detection in `split_pages`. Compares the
+previous Canny-based detector with the projection-based
+`detect_content_bounds` on every page of the given PDFs (or on synthetic
+form pages when none are given), reporting time per page and the largest
+difference between the two crops.
+
+Usage (from the `ocr/` directory):
+
+    python3 -m benchmarks.bench_bounds [file.pdf ...]
+"""
+
+import sys
+import time
+from typing import List, Tuple
+
+import cv2
+import fitz
+import numpy as np
+
+from pipeline.split_pages import detect_content_bounds
+
+
+def detect_bounds_canny(img: np.ndarray) -> Tuple[float, float, float, float]:
+    """
+    Reference implementation: bounding box of all Canny edge pixels.
+    """
+    edges = cv2.Canny(img, 50, 150)
+    y_coords, x_coords = np.where(edges > 0)
+    return x_coords.min(), y_coords.min(), x_coords.max(), y_coords.max()
+
+
+def synthetic_pages(count: int = 20, speckle: bool = False) -> List[np.ndarray]:
+    """
+    Render simple ruled form pages with text, optionally adding scanner speckle.
+    """
+    rng = np.random.default_rng(0)
+    pages = []
+    for i in range(count):
+        doc = fitz.open()
+        page = doc.new_page(width=612, height=792)
+        x0, y0 = 30 + i % 7 * 3.3, 35 + i % 5 * 2.7
+        page.draw_rect(fitz.Rect(x0, y0, 580 - i % 3, 760 - i % 4))
+        for row in range(30):
+            y = y0 + 20 + row * 22
+            page.draw_line((x0, y), (580 - i % 3, y), width=0.5)
+            page.insert_text((x0 + 6, y - 6), f"FIELD {row} VALUE {i * row}", fontsize=9)
+        pix = page.get_pixmap(colorspace=fitz.csGRAY)
+        img = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.h, pix.w).copy()
+        if speckle:
+            ys = rng.integers(0, pix.h, 40)
+            xs = rng.integers(0, pix.w, 40)
+            img[ys, xs] = 0
+        pages.append(img)
+        doc.close()
+    return pages
+
+
+def pdf_pages(paths: List[str], scale_factor: float = 1) -> List[np.ndarray]:
+    """
+    Render every page of the given PDFs to grayscale, as split_pages does.
+    """
+    pages = []
+    for path in paths:
+        doc = fitz.open(path)
+        for page in doc:
+            pix = page.get_pixmap(
+                matrix=fitz.Matrix(scale_factor, scale_factor), colorspace=fitz.csGRAY
+            )
+            pages.append(
+                np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.h, pix.w)
+            )
+        doc.close()
+    return pages
+
+
+def time_per_page(fn, pages: List[np.ndarray], repeat: int = 5) -> float:
+    """
+    Best-of-`repeat` mean time per page in milliseconds.
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for img in pages:
+            fn(img)
+        best = min(best, (time.perf_counter() - start) / len(pages))
+    return best * 1000
+
+
+def max_bound_diff(fn_a, fn_b, pages_a, pages_b) -> float:
+    """
+    Largest difference in pixels between the bounds of paired pages.
+    """
+    return max(
+        np.max(np.abs(np.subtract(fn_a(a), fn_b(b)))) for a, b in zip(pages_a, pages_b)
+    )
+
+
+def compare(label: str, pages: List[np.ndarray]) -> None:
+    """
+    Print timings and the maximum bound difference (in pixels) for a page set.
+    """
+    canny_ms = time_per_page(detect_bounds_canny, pages)
+    proj_ms = time_per_page(detect_content_bounds, pages)
+    max_diff = max_bound_diff(detect_bounds_canny, detect_content_bounds, pages, pages)
+    print(
+        f"{label}: {len(pages)} pages, canny {canny_ms:.2f} ms/page, "
+        f"projection {proj_ms:.2f} ms/page, speedup {canny_ms / proj_ms:.1f}x, "
+        f"max diff vs canny {max_diff:.2f} px"
+    )
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        compare("pdf", pdf_pages(sys.argv[1:]))
+    else:
+        clean, noisy = synthetic_pages(), synthetic_pages(speckle=True)
+        compare("clean", clean)
+        compare("speckle", noisy)
+        # Speckle robustness: how far each detector moves from the clean crop
+        print(
+            "speckle shift: canny "
+            f"{max_bound_diff(detect_bounds_canny, detect_bounds_canny, clean, noisy):.2f} px, "
+            "projection "
+            f"{max_bound_diff(detect_content_bounds, detect_content_bounds, clean, noisy):.2f} px"
+        )
@@ -0,0 +1,200 @@
+"""
+bench_table_validator.py
+
+Equivalence check and micro-benchmark for `utilities.table_validator`. The
+previous pandas implementations are kept here as the reference; both are run
+on a synthetic corpus of EEO-1 (12x15) and EEO-5 tables with consistent
+totals, OCR-like digit errors and random confidences. Row validity, column
+validity, corrected tables and the grand-total update must match exactly.
+
+Usage (from the `ocr/` directory):
+
+    python3 -m benchmarks.bench_table_validator [table_count]
+"""
+
+import copy
+import sys
+import time
+from typing import List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from utilities import table_validator as tv
+
+
+def column_validator_pandas(form_type: str, data: List[List[int]]) -> List[bool]:
+    """
+    Reference implementation of column_validator.
+    """
+    df = pd.DataFrame(data)
+    isValid = [False for _ in range(len(df.columns))]
+    h, w = len(data), len(data[0])
+    for col in df.columns:
+        if form_type == "eeo1":
+            total = df.loc[0 : h - 3, col].sum()
+            target = df.loc[h - 2, col]
+        elif form_type == "eeo5":
+            total = df.loc[0 : h - 2, col].sum()
+            target = df.loc[h - 1, col]
+        else:
+            continue
+        if total == target:
+            isValid[int(col)] = True
+    return isValid
+
+
+def row_validator_with_correction_pandas(
+    form_type: str, data: List[List[int]], confidence_table: List[List[float]]
+) -> List[bool]:
+    """
+    Reference implementation of row_validator_with_correction.
+    """
+    df = pd.DataFrame(data)
+    isValid = [False for _ in range(len(df.index))]
+    h, w = len(data), len(data[0])
+    for row_index in df.index:
+        total = df.loc[row_index, 0 : w - 2].sum()
+        target = df.loc[row_index, w - 1]
+        if total == target:
+            isValid[int(row_index)] = True
+        else:
+            conf_row = confidence_table[row_index]
+            low_conf_indices = [i for i, conf in enumerate(conf_row) if conf < 0.7]
+            if len(low_conf_indices) == 1:
+                low_conf_index = low_conf_indices[0]
+                if low_conf_index != w - 1:
+                    rest_sum = (
+                        sum(data[row_index][:-1]) - data[row_index][low_conf_index]
+                    )
+                    data[row_index][low_conf_index] = data[row_index][-1] - rest_sum
+                else:
+                    data[row_index][low_conf_index] = sum(data[row_index][:-1])
+                isValid[int(row_index)] = True
+    return isValid
+
+
+def row_validator_pandas(data: List[List[int]]) -> List[bool]:
+    """
+    Reference implementation of row_validator.
+    """
+    df = pd.DataFrame(data)
+    isValid = [False for _ in range(len(df.index))]
+    for row_index in df.index:
+        if df.loc[row_index, 0:13].sum() == df.loc[row_index, 14]:
+            isValid[int(row_index)] = True
+    return isValid
+
+
+def update_total_pandas(data: List[List[int]]) -> bool:
+    """
+    Reference implementation of update_total.
+    """
+    df = pd.DataFrame(data)
+    h, w = len(data), len(data[0])
+    sum1 = df.iloc[0 : h - 3, -1].sum()
+    sum2 = df.iloc[h - 2, 0 : w - 1].sum()
+    if sum1 == sum2:
+        data[-2][-1] = sum1
+        return True
+    return False
+
+
+def synthetic_tables(
+    count: int, form_type: str, seed: int = 0
+) -> List[Tuple[List[List[int]], List[List[float]]]]:
+    """
+    Build tables whose row and column totals are consistent, then corrupt a
+    few cells and lower their confidence the way OCR misreads do.
+    """
+    rng = np.random.default_rng(seed)
+    rows, cols = (10, 14) if form_type == "eeo1" else (6, 9)
+    tables = []
+    for _ in range(count):
+        body = rng.integers(0, 40, size=(rows, cols))
+        body = np.hstack([body, body.sum(axis=1, keepdims=True)])
+        total = body.sum(axis=0, keepdims=True)
+        if form_type == "eeo1":
+            prior = rng.integers(0, 600, size=(1, cols + 1))
+            table = np.vstack([body, total, prior])
+        else:
+            table = np.vstack([body, total])
+        conf = rng.uniform(0.75, 1.0, size=table.shape)
+        for _ in range(rng.integers(0, 4)):
+            i, j = rng.integers(0, table.shape[0]), rng.integers(0, table.shape[1])
+            table[i, j] = rng.integers(0, 99)
+            if rng.random() < 0.7:
+                conf[i, j] = rng.uniform(0.1, 0.7)
+        if rng.random() < 0.1:
+            conf[rng.integers(0, table.shape[0]), :] = -1.0
+        tables.append((table.tolist(), conf.tolist()))
+    return tables
+
+
+def check_equivalence(form_type: str, tables) -> int:
+    """
+    Compare the numpy functions with the pandas references; returns the
+    number of tables checked.
+    """
+    for data, conf in tables:
+        ref, new = copy.deepcopy(data), copy.deepcopy(data)
+        assert tv.row_validator_with_correction(
+            form_type, new, conf
+        ) == row_validator_with_correction_pandas(form_type, ref, conf)
+        assert new == ref
+        assert tv.column_validator(form_type, new) == column_validator_pandas(form_type, ref)
+        assert tv.column_validator("other", new) == column_validator_pandas("other", ref)
+        if form_type == "eeo1":
+            assert tv.row_validator(new) == row_validator_pandas(ref)
+            assert tv.update_total(new) == update_total_pandas(ref)
+            assert new == ref
+
+        batch = np.asarray([data], dtype=np.int64)
+        rows_ok, cols_ok = tv.validate_tables(form_type, batch, np.asarray([conf]))
+        ref = copy.deepcopy(data)
+        ref_rows = row_validator_with_correction_pandas(form_type, ref, conf)
+        assert rows_ok[0].tolist() == ref_rows
+        assert cols_ok[0].tolist() == column_validator_pandas(form_type, ref)
+        assert batch[0].tolist() == ref
+    return len(tables)
+
+
+def time_per_table(fn, tables, repeat: int = 3) -> float:
+    """
+    Best wall time per table of fn(data, conf), in milliseconds.
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        copies = copy.deepcopy(tables)
+        start = time.perf_counter()
+        for data, conf in copies:
+            fn(data, conf)
+        best = min(best, time.perf_counter() - start)
+    return best / len(tables) * 1000
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    for form_type in ("eeo1", "eeo5"):
+        tables = synthetic_tables(count, form_type)
+        checked = check_equivalence(form_type, tables)
+        print(f"{form_type}: {checked} tables identical to the pandas reference")
+
+        pandas_ms = time_per_table(
+            lambda d, c: (
+                row_validator_with_correction_pandas(form_type, d, c),
+                column_validator_pandas(form_type, d),
+            ),
+            tables,
+        )
+        numpy_ms = time_per_table(lambda d, c: tv.table_validator(form_type, d, c), tables)
+
+        stack = np.asarray([d for d, _ in tables], dtype=np.int64)
+        confs = np.asarray([c for _, c in tables])
+        start = time.perf_counter()
+        tv.validate_tables(form_type, stack, confs)
+        batch_ms = (time.perf_counter() - start) / len(tables) * 1000
+        print(
+            f"  pandas {pandas_ms:.3f} ms/table, numpy {numpy_ms:.3f} ms/table, "
+            f"batched {batch_ms:.4f} ms/table"
+        )
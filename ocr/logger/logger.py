@@ -1,65 +1,311 @@
 """
 Custom Logger Module
 
-Provides a Logger class wrapping Python's logging library to output
+Provides Logger and LoggerProxy classes wrapping Python's logging library to output
 formatted logs to a file and optionally to the console with an optional prefix.
+
+Records are not written by the calling thread: they are put on an in-memory queue and
+a background QueueListener thread writes them to their log files, so OCR and rendering
+never block on file I/O. Every record carries the path of its log file, so one listener
+serves all documents.
+
+A LoggerProxy is a module-level logger whose log file is bound per document with
+`bind()`. The binding lives in a context variable, so documents processed at the same
+time in different threads each write to their own log.
+
+Besides text lines, loggers emit structured events with `event()`: one JSON object per
+line in the document's event log, the log file path with a `.jsonl` extension. Each
+event carries the time (`ts`), document ID (`doc`), stage (the logger prefix), event
+type (`event`), level and the fields given by the caller, such as `loc` (column, row),
+`value`, `conf` or `duration_ms`. utilities/get_log_summary.py aggregates them.
+
+The listener keeps at most MAX_OPEN_LOGS log files open and closes the least recently
+used one beyond that, so a long run does not leak file descriptors. A stage closes the
+files of a document when it is done with it (`close()`); logging to them again reopens
+them in append mode. `resource_usage()` reports the open files and memory of the process.
 """
 
+import atexit
+import json
 import logging
+import os
+import queue
+import resource
+import sys
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from contextvars import ContextVar, Token
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional, Tuple
 
 # Default path for the log file
 LOG_FILE_PATH = "output.log"
+LOG_FORMAT = "[%(levelname)s],%(asctime)s,%(message)s"
+DATE_FORMAT = "%Y/%m/%d %H:%M:%S"
+MAX_OPEN_LOGS = 64  # Log and event files kept open by the listener, least recently used closed first
 
+_formatter = logging.Formatter(LOG_FORMAT, datefmt=DATE_FORMAT)
+_queue_logger = logging.getLogger("eeo_ocr.queue")
+_queue_logger.propagate = False
+_queue_logger.setLevel(logging.DEBUG)
+_listener: Optional[QueueListener] = None
+_listener_pid: Optional[int] = None
+_listener_lock = threading.Lock()
+_file_handler: Optional["DocumentFileHandler"] = None
 
-class Logger:
+
+def event_log_path(log_file_path: str) -> str:
     """
-    Logger wrapper to handle file and console logging with a custom format and prefix.
+    :param log_file_path: Path to a text log file
+    :return: Path to the JSONL event log of the same document
+    """
+    return os.path.splitext(log_file_path)[0] + ".jsonl"
 
-    :param log_file_path: Path to the log file where messages will be written
-    :param prefix: Optional string to prepend to each log message
-    :param debug: If True, set logging level to DEBUG; otherwise INFO
-    :param log_to_console: If True, also output logs to the console
+
+def _json_default(value):
+    # numpy scalars and arrays from the table code
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    return str(value)
+
+
+class DocumentFileHandler(logging.Handler):
     """
+    Handler writing each record to the log file named in its `log_file` attribute,
+    and its event, if any, to the matching JSONL event log. A record with the
+    `close_log` attribute closes the files of its log instead. Only used from
+    the listener thread.
 
-    def __init__(
-        self,
-        log_file_path: str = LOG_FILE_PATH,
-        prefix: str = "",
-        debug: bool = False,
-        log_to_console: bool = True,
-    ):
+    :param max_open: Files kept open; the least recently used one is closed
+        when another is opened
+    """
+
+    def __init__(self, max_open: int = MAX_OPEN_LOGS):
+        super().__init__()
+        self.max_open = max(max_open, 2)
+        # Path -> FileHandler or event file, least recently used first
+        self.files: "OrderedDict[str, object]" = OrderedDict()
+        self.opened = 0
+        self.evicted = 0
+
+    def _file(self, path: str, is_event: bool):
+        f = self.files.get(path)
+        if f is not None:
+            self.files.move_to_end(path)
+            return f
+        if len(self.files) >= self.max_open:
+            _, lru = self.files.popitem(last=False)
+            lru.close()
+            self.evicted += 1
+        if is_event:
+            f = open(path, "a", encoding="utf-8", buffering=1)
+        else:
+            f = logging.FileHandler(path)
+            f.setFormatter(_formatter)
+        self.files[path] = f
+        self.opened += 1
+        return f
+
+    def close_file(self, log_file_path: str):
+        """
+        :param log_file_path: Path to a text log file; it and its event log are closed
+        """
+        for path in (log_file_path, event_log_path(log_file_path)):
+            f = self.files.pop(path, None)
+            if f is not None:
+                f.close()
+
+    def emit(self, record: logging.LogRecord):
+        path = getattr(record, "log_file", None) or LOG_FILE_PATH
+        if getattr(record, "close_log", False):
+            self.close_file(path)
+            return
+        event = getattr(record, "event", None)
+        if event is not None:
+            line = {"ts": round(record.created, 3), **event}
+            self._file(event_log_path(path), True).write(
+                json.dumps(line, default=_json_default) + "\n"
+            )
+            if not record.getMessage():
+                return
+        self._file(path, False).emit(record)
+
+    def close(self):
+        for f in self.files.values():
+            f.close()
+        self.files.clear()
+        super().close()
+
+
+class ConsoleFilter(logging.Filter):
+    """
+    Pass only the records of loggers created with log_to_console.
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return getattr(record, "console", False) and bool(record.getMessage())
+
+
+def start_logging():
+    """
+    Start the background listener of this process, if it is not running.
+    A forked worker process starts its own listener and queue.
+    """
+    global _listener, _listener_pid, _file_handler
+    with _listener_lock:
+        if _listener is not None and _listener_pid == os.getpid():
+            return
+        log_queue = queue.SimpleQueue()
+        for handler in list(_queue_logger.handlers):
+            _queue_logger.removeHandler(handler)
+        _queue_logger.addHandler(QueueHandler(log_queue))
+
+        console_handler = logging.StreamHandler()
+        console_handler.setFormatter(_formatter)
+        console_handler.addFilter(ConsoleFilter())
+        _file_handler = DocumentFileHandler()
+        _listener = QueueListener(log_queue, _file_handler, console_handler)
+        _listener.start()
+        _listener_pid = os.getpid()
+
+
+def stop_logging():
+    """
+    Write every queued record, close the log files and stop the listener.
+    Logging again starts a new listener.
+    """
+    global _listener
+    with _listener_lock:
+        if _listener is None or _listener_pid != os.getpid():
+            return
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+
+def flush_logs():
+    """
+    Block until every record logged so far has been written.
+    """
+    stop_logging()
+
+
+atexit.register(stop_logging)
+
+
+def close_log(log_file_path: str):
+    """
+    Close a log file and its event log once the records logged so far are written.
+
+    :param log_file_path: Path to the text log file
+    """
+    if _listener is None or _listener_pid != os.getpid():
+        return
+    _queue_logger.log(
+        logging.INFO, "", extra={"log_file": log_file_path, "close_log": True, "event": None}
+    )
+
+
+def open_fd_count() -> Optional[int]:
+    """
+    :return: File descriptors open in this process, or None where /proc is unavailable
+    """
+    try:
+        return len(os.listdir("/proc/self/fd"))
+    except OSError:
+        return None
+
+
+def resource_usage() -> Dict:
+    """
+    :return: Dict with the open file descriptors of this process, its peak
+        resident memory in MB, and the log files open, opened and closed by
+        the LRU cap in the listener of this process
+    """
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    max_rss_mb = max_rss / (1024 * 1024) if sys.platform == "darwin" else max_rss / 1024
+    handler = _file_handler if _listener_pid == os.getpid() else None
+    return {
+        "open_fds": open_fd_count(),
+        "max_rss_mb": round(max_rss_mb, 1),
+        "open_logs": len(handler.files) if handler is not None else 0,
+        "opened_logs": handler.opened if handler is not None else 0,
+        "evicted_logs": handler.evicted if handler is not None else 0,
+    }
+
+
+def default_document(log_file_path: str) -> str:
+    """
+    :param log_file_path: Path to a log file
+    :return: Its file name without extension, used as document ID
+    """
+    return os.path.splitext(os.path.basename(log_file_path))[0]
+
+
+class _PrefixedLogger(ABC):
+    """
+    Shared logging methods: messages are prefixed and queued for the listener.
+    Subclasses decide which log file and document the messages go to.
+    """
+
+    def __init__(self, prefix: str, debug: bool, log_to_console: bool):
         # Determine log level based on debug flag
-        level = logging.DEBUG if debug else logging.INFO
-
-        # Create or retrieve a logger using the file path as its name
-        self.logger = logging.getLogger(log_file_path)
-        # Prevent logs from being passed to ancestor loggers
-        self.logger.propagate = False
-        # Set the logger's threshold level
-        self.logger.setLevel(level)
+        self.level = logging.DEBUG if debug else logging.INFO
         self.prefix = prefix
+        self.log_to_console = log_to_console
+
+    @abstractmethod
+    def _target(self) -> Tuple[str, Optional[str]]:
+        """
+        :return: (log file path, document ID) the messages go to
+        """
 
-        # Remove existing handlers to avoid duplicate output
-        if self.logger.hasHandlers():
-            self.logger.handlers.clear()
+    @property
+    def log_file_path(self) -> str:
+        return self._target()[0]
 
-        # Define a standard formatter for file and console
-        formatter = logging.Formatter(
-            "[%(levelname)s],%(asctime)s,%(message)s", datefmt="%Y/%m/%d %H:%M:%S"
+    def _log(self, level: int, msg: str, event: Optional[Dict] = None):
+        if level < self.level:
+            return
+        if _listener is None or _listener_pid != os.getpid():
+            start_logging()
+        log_file_path, document = self._target()
+        if event is not None:
+            event = {
+                "doc": document,
+                "stage": self.prefix,
+                "event": event.pop("event"),
+                "level": logging.getLevelName(level),
+                **event,
+            }
+        _queue_logger.log(
+            level,
+            f"{self.prefix},{msg}" if msg else "",
+            extra={"log_file": log_file_path, "console": self.log_to_console, "event": event},
         )
 
-        # Configure file handler
-        file_handler = logging.FileHandler(log_file_path)
-        file_handler.setLevel(level)
-        file_handler.setFormatter(formatter)
-        self.logger.addHandler(file_handler)
+    def event(self, event: str, level: int = logging.INFO, msg: Optional[str] = None, **fields):
+        """
+        Log a structured event to the document's JSONL event log, and `msg`,
+        if given, to its text log.
 
-        # Optionally configure console (stream) handler
-        if log_to_console:
-            stream_handler = logging.StreamHandler()
-            stream_handler.setLevel(level)
-            stream_handler.setFormatter(formatter)
-            self.logger.addHandler(stream_handler)
+        :param event: Event type, e.g. 'unconfident_cell'
+        :param level: Logging level of the event
+        :param msg: Optional text log message, prefixed if specified
+        :param fields: JSON-serializable event fields, e.g. loc, value, conf,
+            duration_ms
+        """
+        self._log(level, msg, {"event": event, **fields})
+
+    def close(self):
+        """
+        Close the current log file and its event log after the records logged
+        so far; call when the document is done.
+        """
+        close_log(self.log_file_path)
 
     def debug(self, msg: str):
         """
@@ -67,7 +313,7 @@ class Logger:
 
         :param msg: The message to log
         """
-        self.logger.debug(f"{self.prefix},{msg}")
+        self._log(logging.DEBUG, msg)
 
     def info(self, msg: str):
         """
@@ -75,7 +321,7 @@ class Logger:
 
         :param msg: The message to log
         """
-        self.logger.info(f"{self.prefix},{msg}")
+        self._log(logging.INFO, msg)
 
     def warning(self, msg: str):
         """
@@ -83,7 +329,7 @@ class Logger:
 
         :param msg: The message to log
         """
-        self.logger.warning(f"{self.prefix},{msg}")
+        self._log(logging.WARNING, msg)
 
     def error(self, msg: str):
         """
@@ -91,4 +337,67 @@ class Logger:
 
         :param msg: The message to log
         """
-        self.logger.error(f"{self.prefix},{msg}")
+        self._log(logging.ERROR, msg)
+
+
+class Logger(_PrefixedLogger):
+    """
+    Logger wrapper to handle file and console logging with a custom format and prefix.
+
+    :param log_file_path: Path to the log file where messages will be written
+    :param prefix: Optional string to prepend to each log message
+    :param debug: If True, set logging level to DEBUG; otherwise INFO
+    :param log_to_console: If True, also output logs to the console
+    """
+
+    def __init__(
+        self,
+        log_file_path: str = LOG_FILE_PATH,
+        prefix: str = "",
+        debug: bool = False,
+        log_to_console: bool = True,
+        document: Optional[str] = None,
+    ):
+        super().__init__(prefix, debug, log_to_console)
+        self.target = (log_file_path, document or default_document(log_file_path))
+
+    def _target(self) -> Tuple[str, Optional[str]]:
+        return self.target
+
+
+class LoggerProxy(_PrefixedLogger):
+    """
+    Module-level logger whose log file is bound per document in a context variable.
+    Until a file is bound in the current context, messages go to LOG_FILE_PATH.
+
+    :param prefix: Optional string to prepend to each log message
+    :param debug: If True, set logging level to DEBUG; otherwise INFO
+    :param log_to_console: If True, also output logs to the console
+    """
+
+    def __init__(self, prefix: str = "", debug: bool = False, log_to_console: bool = True):
+        super().__init__(prefix, debug, log_to_console)
+        self._log_file = ContextVar(
+            f"log_file_{prefix}", default=(LOG_FILE_PATH, default_document(LOG_FILE_PATH))
+        )
+
+    def _target(self) -> Tuple[str, Optional[str]]:
+        return self._log_file.get()
+
+    def bind(self, log_file_path: str, document: Optional[str] = None) -> Token:
+        """
+        Send the messages logged in the current context to a document's log file.
+
+        :param log_file_path: Path to the log file of the document
+        :param document: Document ID of the events (default: log file name)
+        :return: Token restoring the previous file with reset()
+        """
+        return self._log_file.set((log_file_path, document or default_document(log_file_path)))
+
+    def reset(self, token: Token):
+        """
+        Restore the log file bound before bind() returned the token.
+
+        :param token: Token returned by bind()
+        """
+        self._log_file.reset(token)
@@ -2,33 +2,37 @@
 Module: cells_to_contents.py
 
 Processes OCR-extracted cell images to extract text and table data,
-validates and post-processes numerical tables, merges EEO-5 sections,
+validates and post-processes numerical tables (repairing inconsistent
+totals where the row and column sums pin down the misread cells), merges EEO-5 sections,
 and outputs consolidated JSON results.
 """
 
 import gc
 import os
 import re
-import json
 import shutil
-from typing import Dict, List, Tuple, Union
+import time
+from logging import WARNING
+from typing import Dict, List, Optional, Tuple, Union
 
+import numpy as np
 from doctr.io import DocumentFile
 
 from utilities.dir_helper import create_dir_if_not_exists
-from logger.logger import Logger
+from logger.logger import LoggerProxy
 from utilities.table_validator import table_validator, update_total
-from pipeline.checkboxes import extract_from_checkbox
+from utilities.table_repair import repair_table
+from pipeline.checkboxes import checkbox_result, load_page_gray
+from pipeline.registration import IDENTITY
+from pipeline.result_model import DocumentResult, TableEntry, TextEntry
 from utilities.dir_helper import get_files_in_directory
 
 CONFIDENCE_THRESHOLD = 0.8  # Minimum confidence to accept an OCR digit
 EEO5_TABLE_SECTION_SET = {"a1", "a2", "a3", "b", "c"}  # Valid sections for EEO-5 tables
+EEO1_ROW_HEIGHT = 25  # Row height in pixels of the EEO-1 table cell
 
-# Initialize a default logger; will be reconfigured per file
-file_logger = Logger(
-    log_file_path="output.log",
-    prefix="CELL_TO_CONTENTS",
-)
+# Logger of this stage; its log file is bound per document
+file_logger = LoggerProxy(prefix="CELL_TO_CONTENTS")
 
 
 def get_current_processing_files(out_dir: str) -> List[str]:
@@ -62,16 +66,29 @@ def post_process_table(
 
             # Empty cell
             if val == -1:
-                file_logger.warning(f"Empty_cell,loc:[{j}, {i}]")
+                file_logger.event(
+                    "empty_cell", WARNING, f"Empty_cell,loc:[{j}, {i}]", loc=[j, i]
+                )
                 digit_table[i][j] = 0
             # Non-digit content
             elif not isinstance(val, str) or not val.isdigit():
-                file_logger.warning(f"Invalid_digit,val:{val},loc:[{j}, {i}]")
+                file_logger.event(
+                    "invalid_digit",
+                    WARNING,
+                    f"Invalid_digit,val:{val},loc:[{j}, {i}]",
+                    loc=[j, i],
+                    value=val,
+                )
                 digit_table[i][j] = 0
             # Low-confidence but digit
             elif conf < CONFIDENCE_THRESHOLD:
-                file_logger.warning(
-                    f"Unconfident_cell,val:{val},conf:{conf:.2f},loc:[{j}, {i}]"
+                file_logger.event(
+                    "unconfident_cell",
+                    WARNING,
+                    f"Unconfident_cell,val:{val},conf:{conf:.2f},loc:[{j}, {i}]",
+                    loc=[j, i],
+                    value=int(val),
+                    conf=round(float(conf), 4),
                 )
             # Convert valid digit string to int
             digit_table[i][j] = int(digit_table[i][j])
@@ -101,42 +118,31 @@ def parse_doctr_json_output(data: dict) -> Tuple[List[str], List[float]]:
     return str_lines, confidence_lines
 
 
-def calculate_midpoint(
-    topright: List[float],
-    bottomleft: List[float],
-    total_width: float,
-    total_height: float,
-) -> Tuple[float, float]:
-    """
-    Compute the midpoint of a word's bounding box, scaled to PDF dimensions.
-
-    :param topright: [x, y] of top-right corner (normalized)
-    :param bottomleft: [x, y] of bottom-left corner (normalized)
-    :param total_width: PDF page width in pixels
-    :param total_height: PDF page height in pixels
-    :return: (mid_x, mid_y) in pixel coordinates
-    """
-    if len(topright) != 2 or len(bottomleft) != 2:
-        raise ValueError("topright and bottomleft must be of length 2")
-
-    mid_x = (topright[0] + bottomleft[0]) * total_width / 2
-    mid_y = (topright[1] + bottomleft[1]) * total_height / 2
-    return mid_x, mid_y
-
-
-def init_data_table_and_conf_table(
-    table_config: Dict,
-) -> Tuple[List[List[int]], List[List[float]]]:
+def collect_words(document) -> Tuple[List[str], np.ndarray, np.ndarray, Tuple[int, int]]:
     """
-    Initialize empty digit and confidence tables based on config shape.
+    Gather the words of a doctr Document into flat arrays, in reading order.
 
-    :param table_config: (rows, cols) for the table
-    :return: (digit_table, confidence_table)
+    :param document: doctr Document returned by the predictor
+    :return: (word values, (N, 2) word midpoints in normalized page
+        coordinates, (N,) confidences, page dimensions (height, width))
     """
-    rows, cols = get_table_row_and_col_num(table_config)
-    digit_table = [[-1] * cols for _ in range(rows)]
-    confidence_table = [[-1.0] * cols for _ in range(rows)]
-    return digit_table, confidence_table
+    values: List[str] = []
+    geometries: List = []
+    confidences: List[float] = []
+    dimensions = (0, 0)
+    for page in document.pages:
+        dimensions = page.dimensions
+        for block in page.blocks:
+            for line in block.lines:
+                for word in line.words:
+                    values.append(word.value)
+                    geometries.append(word.geometry)
+                    confidences.append(word.confidence)
+    if not values:
+        return values, np.empty((0, 2)), np.empty(0), dimensions
+    # geometry is ((x0, y0), (x1, y1)); the midpoint is the mean of both corners
+    midpoints = np.asarray(geometries, dtype=np.float64).mean(axis=1)
+    return values, midpoints, np.asarray(confidences, dtype=np.float64), dimensions
 
 
 def get_table_row_and_col_num(table_config: Dict) -> Tuple[int, int]:
@@ -153,19 +159,88 @@ def get_table_row_and_col_num(table_config: Dict) -> Tuple[int, int]:
     return table_config[0], table_config[1]
 
 
+def assign_words_to_grid(
+    values: List[str],
+    midpoints: np.ndarray,
+    confidences: np.ndarray,
+    total_width: float,
+    total_height: float,
+    row_num: int,
+    col_num: int,
+    padding: float = 45,
+    row_height: Optional[float] = None,
+) -> Tuple[List[List[Union[int, str]]], List[List[float]]]:
+    """
+    Place words into table cells by their midpoints.
+
+    When several words land in the same cell, the first digit word is kept;
+    a cell without digit words keeps its last word.
+
+    :param values: Word values in reading order
+    :param midpoints: (N, 2) normalized word midpoints
+    :param confidences: (N,) word confidences
+    :param total_width: Cell PDF width in pixels
+    :param total_height: Cell PDF height in pixels
+    :param row_num: Number of table rows
+    :param col_num: Number of table columns
+    :param padding: Margin in pixels before table grid
+    :param row_height: Row height in pixels; None spreads the rows evenly
+        over the page height
+    :return: (digit_table, confidence_table) with -1 in empty cells
+    """
+    cell_width = (total_width - 2 * padding) / col_num
+    if row_height is None:
+        row_height = (total_height - 2 * padding) / row_num
+
+    cols = np.floor((midpoints[:, 0] * total_width - padding) / cell_width).astype(int)
+    rows = np.floor((midpoints[:, 1] * total_height - padding) / row_height).astype(int)
+
+    for i in np.flatnonzero([not val.isdigit() for val in values]):
+        file_logger.event(
+            "invalid_digit",
+            WARNING,
+            f"Invalid_digit,val:{values[i]},loc:[{cols[i]}, {rows[i]}]",
+            loc=[int(cols[i]), int(rows[i])],
+            value=values[i],
+        )
+
+    # Words in the padding belong to the nearest border cell
+    cols = np.clip(cols, 0, col_num - 1)
+    rows = np.clip(rows, 0, row_num - 1)
+    cells = rows * col_num + cols
+
+    order = np.arange(len(values))
+    is_digit = np.fromiter((val.isdigit() for val in values), dtype=bool, count=len(values))
+    first_digit = np.full(row_num * col_num, len(values))
+    np.minimum.at(first_digit, cells[is_digit], order[is_digit])
+    last_word = np.full(row_num * col_num, -1)
+    np.maximum.at(last_word, cells, order)
+    chosen = np.where(first_digit < len(values), first_digit, last_word)
+    filled = np.flatnonzero(chosen >= 0)
+
+    digit_table = np.full(row_num * col_num, -1, dtype=object)
+    digit_table[filled] = [values[i] for i in chosen[filled]]
+    confidence_table = np.full(row_num * col_num, -1.0)
+    confidence_table[filled] = confidences[chosen[filled]]
+    return (
+        digit_table.reshape(row_num, col_num).tolist(),
+        confidence_table.reshape(row_num, col_num).tolist(),
+    )
+
+
 def parse_doctr_json_output_table(
     form_type: str,
-    data,
+    document,
     table_config: Dict,
     sect: Union[str, None] = None,
     padding: int = 45,
 ) -> Tuple[List[str], List[float]]:
     """
-    Parse paginated doctr output into a structured numeric table.
+    Parse a doctr Document into a structured numeric table.
     Supports EEO-1 (full-page table) and EEO-5 (section-specific tables).
 
     :param form_type: 'eeo1' or 'eeo5'
-    :param data: Raw doctr JSON
+    :param document: doctr Document returned by the predictor
     :param table_config: Config for table dimensions
     :param sect: For eeo5, section key ('a1','b', etc.)
     :param padding: Margin in pixels before table grid
@@ -176,111 +251,82 @@ def parse_doctr_json_output_table(
     confidence_table = [[-1]]
 
     if form_type == "eeo1":
-        row_num, col_num = get_table_row_and_col_num(table_config)
-        digit_table, confidence_table = init_data_table_and_conf_table(table_config)
-        for page in data.get("pages", []):
-            page_dimensions = page.get("dimensions")
-            # !! REQUIERED to scale down by 2: `read_pdf` from docTR scales up by 2 by default
-            total_height, total_width = page_dimensions[0] / 2, page_dimensions[1] / 2
-
-            avg_cell_width = (total_width - 2 * padding) / col_num
-
-            for block in page.get("blocks", {}):
-                for line in block.get("lines", {}):
-                    for raw_word in line.get("words", {}):
-                        mid_x, mid_y = calculate_midpoint(
-                            raw_word["geometry"][0],
-                            raw_word["geometry"][1],
-                            total_width,
-                            total_height,
-                        )
-
-                        val, conf = raw_word["value"], raw_word["confidence"]
-
-                        x_relative = int((mid_x - padding) // avg_cell_width)
-                        y_relative = int((mid_y - padding) // 25)
-                        if y_relative >= row_num:
-                            y_relative = row_num - 1
-
-                        if not val.isdigit():
-                            file_logger.warning(
-                                f"Invalid_digit,val:{val},loc:[{x_relative}, {y_relative}]"
-                            )
-
-                        if (
-                            digit_table[y_relative][x_relative] == -1
-                            or not digit_table[y_relative][x_relative].isdigit()
-                        ):
-                            digit_table[y_relative][x_relative] = val
-                            confidence_table[y_relative][x_relative] = conf
-    elif form_type == "eeo5":
-        if sect is None or sect not in EEO5_TABLE_SECTION_SET:
+        dims = table_config
+        row_height = EEO1_ROW_HEIGHT
+    elif form_type == "eeo5" and sect in EEO5_TABLE_SECTION_SET:
+        dims = table_config[sect]
+        row_height = None
+    else:
+        dims = None
+        if form_type == "eeo5":
             file_logger.error(f"sect invalid: {sect}")
-        else:
-            row_num, col_num = get_table_row_and_col_num(table_config[sect])
-            digit_table, confidence_table = init_data_table_and_conf_table(
-                table_config[sect]
-            )
-            for page in data.get("pages", []):
-                page_dimensions = page.get("dimensions")
-                # !!! REQUIERED to scale down by 2: `read_pdf` from docTR scales up by 2 by default
-                total_height, total_width = (
-                    page_dimensions[0] / 2,
-                    page_dimensions[1] / 2,
-                )
 
-                avg_cell_height = (total_height - 2 * padding) / row_num
-                avg_cell_width = (total_width - 2 * padding) / col_num
-
-                for block in page.get("blocks", {}):
-                    for line in block.get("lines", {}):
-                        for raw_word in line.get("words", {}):
-                            mid_x, mid_y = calculate_midpoint(
-                                raw_word["geometry"][0],
-                                raw_word["geometry"][1],
-                                total_width,
-                                total_height,
-                            )
-
-                            val, conf = raw_word["value"], raw_word["confidence"]
-
-                            x_relative = int((mid_x - padding) // avg_cell_width)
-                            y_relative = int((mid_y - padding) // avg_cell_height)
-                            if y_relative >= row_num:
-                                y_relative = row_num - 1
-
-                            if not val.isdigit():
-                                file_logger.warning(
-                                    f"Invalid_digit,val:{val},loc:[{x_relative}, {y_relative}]"
-                                )
-
-                            if (
-                                digit_table[y_relative][x_relative] == -1
-                                or not digit_table[y_relative][x_relative].isdigit()
-                            ):
-                                digit_table[y_relative][x_relative] = val
-                                confidence_table[y_relative][x_relative] = conf
+    if dims is not None:
+        row_num, col_num = get_table_row_and_col_num(dims)
+        values, midpoints, confidences, page_dimensions = collect_words(document)
+        # !! REQUIERED to scale down by 2: `read_pdf` from docTR scales up by 2 by default
+        total_height, total_width = page_dimensions[0] / 2, page_dimensions[1] / 2
+        digit_table, confidence_table = assign_words_to_grid(
+            values,
+            midpoints,
+            confidences,
+            total_width,
+            total_height,
+            row_num,
+            col_num,
+            padding,
+            row_height,
+        )
 
     if form_type == "eeo1":
         post_process_table(digit_table, confidence_table)
-        is_row_valid, is_col_valid = table_validator(
-            form_type, digit_table, confidence_table
-        )
-        if all(is_col_valid) and all(is_row_valid):
-            file_logger.info("Valid table")
-        elif (
-            all(is_row_valid)
-            and all(is_col_valid[:-1])
-            and not is_col_valid[-1]
-            and update_total(digit_table)
-        ):
-            file_logger.info("Valid table, invalid sum")
-        else:
-            file_logger.warning(f"Invalid table:row-{is_row_valid},col-{is_col_valid}")
+        validate_and_repair(form_type, digit_table, confidence_table, "h-TABLE")
 
     return (digit_table, confidence_table)
 
 
+def validate_and_repair(
+    form_type: str, data_table: List[List[int]], conf_table: List[List[float]], table: str
+) -> None:
+    """
+    Validate a post-processed table, fix its grand total or repair it in
+    place when possible, and log the outcome as a table event.
+
+    :param form_type: 'eeo1' or 'eeo5'
+    :param data_table: Integer table, modified in place
+    :param conf_table: Parallel confidences
+    :param table: Table ID recorded in the event
+    """
+    is_row_valid, is_col_valid = table_validator(form_type, data_table, conf_table)
+    if all(is_col_valid) and all(is_row_valid):
+        file_logger.event("valid_table", msg="Valid table", table=table)
+    elif (
+        all(is_row_valid)
+        and all(is_col_valid[:-1])
+        and not is_col_valid[-1]
+        and update_total(data_table)
+    ):
+        file_logger.event("valid_table_invalid_sum", msg="Valid table, invalid sum", table=table)
+    else:
+        changes = repair_table(form_type, data_table, conf_table)
+        if changes:
+            file_logger.event(
+                "repaired_table",
+                msg=f"Repaired table,cells:{changes}",
+                table=table,
+                cells=[[int(i), int(j), int(old), int(new)] for i, j, old, new in changes],
+            )
+        else:
+            file_logger.event(
+                "invalid_table",
+                WARNING,
+                f"Invalid table:row-{is_row_valid},col-{is_col_valid}",
+                table=table,
+                rows=is_row_valid,
+                cols=is_col_valid,
+            )
+
+
 def is_eeo5_table_cell(filename: str) -> Tuple[bool, str]:
     """
     Identify whether a cell filename corresponds to an EEO-5 table section.
@@ -334,8 +380,11 @@ def extract_contents(
     result_dir: str,
     predictor,
     table_config: Dict,
-    log_dir: str = "../logs"
-) -> None:
+    log_dir: str = "../logs",
+    page_transform: tuple = IDENTITY,
+    checkbox_raster=None,
+    compact_json: bool = False,
+) -> Optional[DocumentResult]:
     """
     Main pipeline to:
       1. Iterate over cell PDFs
@@ -353,25 +402,29 @@ def extract_contents(
     :param predictor: Doctr OCR predictor instance
     :param table_config: Table schema mapping
     :param log_dir: Log directory path
+    :param page_transform: Layout-to-page transform of the first page, used
+        to place the checkboxes
+    :param checkbox_raster: Grayscale raster of the cropped first page, as
+        decoded by pdf_to_cells or split_image_pages; the checkboxes are read
+        from it instead of reopening the cropped PDF
+    :param compact_json: Write the result JSON without indentation
+    :return: The document's result, or None if there were no cells
     """
 
     # Prepare logging per file
-    global file_logger
     create_dir_if_not_exists(log_dir)
 
     # Gather cell files to process
     files = get_current_processing_files(cell_dir)
     if len(files) == 0:
-        return
+        return None
 
     # Determine base filename for logs and JSON
     sect_filename = os.path.splitext(os.path.basename(files[0]))[0]
     filename = sect_filename.split("_section_")[0]
 
-    file_logger = Logger(
-        log_file_path=f"{log_dir}/{filename}.log",
-        prefix="CELL_TO_CONTENTS",
-    )
+    file_logger.bind(f"{log_dir}/{filename}.log")
+    start = time.perf_counter()
     cells = sorted(get_files_in_directory(cell_dir), key=lambda x: x)
 
     file_logger.info(f"********** Processing File {filename} **********")
@@ -389,31 +442,39 @@ def extract_contents(
             continue
         cell_file = f"{cell_dir}/{cell}"
         file_logger.info(f"Processing cell {cell_file}...")
+        cell_start = time.perf_counter()
 
         doc = DocumentFile.from_pdf(cell_file)
-        gc.collect()
-        result = predictor(doc)  # raw json output from docTR
+        result = predictor(doc)  # doctr Document
         del doc
-        gc.collect()
-        raw_result = result.export()
         if form_type == "eeo1":
             if cellname.endswith("h_TABLE"):
                 (str_lines, confidence_lines) = parse_doctr_json_output_table(
-                    form_type, raw_result, table_config
+                    form_type, result, table_config
                 )
             else:
-                (str_lines, confidence_lines) = parse_doctr_json_output(raw_result)
+                (str_lines, confidence_lines) = parse_doctr_json_output(result.export())
             contents_raw[cellname] = (str_lines, confidence_lines)
         elif form_type == "eeo5":
             ok, sect = is_eeo5_table_cell(cellname)
             if ok:
                 (str_lines, confidence_lines) = parse_doctr_json_output_table(
-                    form_type, raw_result, table_config, sect
+                    form_type, result, table_config, sect
                 )
                 table_raw[sect] = (str_lines, confidence_lines)
             else:
-                (str_lines, confidence_lines) = parse_doctr_json_output(raw_result)
+                (str_lines, confidence_lines) = parse_doctr_json_output(result.export())
                 contents_raw[cellname] = (str_lines, confidence_lines)
+        file_logger.event(
+            "cell_done",
+            cell=cellname.split("_section_", 1)[-1],
+            duration_ms=round((time.perf_counter() - cell_start) * 1000, 1),
+        )
+
+    # DocumentFile.from_pdf (pypdfium2) leaves a reference cycle per cell
+    # bitmap (a ctypes array type), which survives into the oldest
+    # generation; collect them once per document rather than per cell
+    gc.collect()
 
     # Merge and post-process EEO-5 tables if present
     if form_type == "eeo5":
@@ -422,58 +483,58 @@ def extract_contents(
             data_table, conf_table = tables[k][0], tables[k][1]
 
             post_process_table(data_table, conf_table)
-            is_row_valid, is_col_valid = table_validator(
-                form_type, data_table, conf_table
-            )
-            if all(is_col_valid) and all(is_row_valid):
-                file_logger.info("Valid table")
-            elif (
-                all(is_row_valid)
-                and all(is_col_valid[:-1])
-                and not is_col_valid[-1]
-                and update_total(data_table)
-            ):
-                file_logger.info("Valid table, invalid sum")
-            else:
-                file_logger.warning(
-                    f"Invalid table:row-{is_row_valid},col-{is_col_valid}"
-                )
+            validate_and_repair(form_type, data_table, conf_table, f"table-{k.upper()}")
 
             contents_raw[f"the_section_table_{k.upper()}"] = data_table, conf_table
 
     # PRASE 2-2: TXT to JSON
-    # Build final JSON structure
-    json_data = []
+    # Build final result in memory
+    result = DocumentResult(filename)
     pattern = re.compile(r".*_section_([a-z]+)_([a-zA-Z0-9_]+)", re.IGNORECASE)
     for section_key in contents_raw.keys():
         match = pattern.match(section_key)
         if match:
             section, field = match.groups()
             content = contents_raw[section_key]
-            json_data.append(
-                {
-                    "id": f"{section}-{field}",
-                    "section": section,
-                    "content": content[0],
-                    "confidence": content[1],
-                }
+            if content[0] and isinstance(content[0][0], list):
+                entry_cls = TableEntry
+            else:
+                entry_cls = TextEntry
+            result.add(entry_cls(f"{section}-{field}", section, content[0], content[1]))
+    result.sort()
+
+    # Extract checkboxes from the page raster into the same result
+    if form_type == "eeo1":
+        file_logger.info(f"Processing cell {result_dir}/{filename}_section_ef...")
+    elif form_type == "eeo5":
+        file_logger.info(f"Processing cell {result_dir}/{filename}_section_a...")
+    if checkbox_raster is not None:
+        result.add(
+            checkbox_result(form_type, checkbox_raster, checkbox_config, page_transform)
+        )
+    else:
+        image, scale_x, scale_y = load_page_gray(f"{pdf_tmp_path}/{filename}.pdf")
+        result.add(
+            checkbox_result(
+                form_type, image, checkbox_config, page_transform, scale_x, scale_y
             )
-    json_data = sorted(json_data, key=lambda x: x["id"])
+        )
 
     create_dir_if_not_exists(result_dir)
 
     output_json_path = f"{result_dir}/{filename}_result.json"
     file_logger.info(f"Saving JSON result to {output_json_path}")
-    with open(output_json_path, "w", encoding="utf-8") as json_file:
-        json.dump(json_data, json_file, indent=4, ensure_ascii=False)
+    result.write(output_json_path, compact=compact_json)
 
-    # Extract checkboxes and clean up
-    if form_type == "eeo1":
-        file_logger.info(f"Processing cell {result_dir}/{filename}_section_ef...")
-    elif form_type == "eeo5":
-        file_logger.info(f"Processing cell {result_dir}/{filename}_section_a...")
-    extract_from_checkbox(
-        form_type, pdf_tmp_path, result_dir, filename + ".pdf", checkbox_config
-    )
+    # Clean up
     shutil.rmtree(cell_dir)
     os.makedirs(cell_dir, exist_ok=True)
+
+    file_logger.event(
+        "stage_done",
+        cells=len(cells),
+        duration_ms=round((time.perf_counter() - start) * 1000, 1),
+    )
+    # The document is done: release its log files
+    file_logger.close()
+    return result
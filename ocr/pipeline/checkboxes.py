@@ -2,7 +2,9 @@
 Module: extract_checkboxes.py
 
 Extracts checkbox states from EEO-1 and EEO-5 PDF forms, renders ROI debug images,
-and writes consolidated results to JSON files.
+and writes consolidated results to JSON files. Checkboxes are read from the grayscale
+raster of the cropped page: one integral image per page gives the pixel sum of every
+checkbox region in four lookups.
 """
 
 import cv2
@@ -13,13 +15,28 @@ import json
 import os
 
 from utilities.load_config import load_cell_coordination_config
+from pipeline.page_raster import page_raster
+from pipeline.registration import IDENTITY, transform_rect
+from pipeline.result_model import CheckboxEntry, write_records
+from pipeline.split_pages import DEFAULT_HEIGHT, DEFAULT_WIDTH
+
+CHECKBOX_ZOOM = 3  # Render zoom the checkbox coordinates are expressed in
+CHECKBOX_THRESHOLD = 0.7  # Mean intensity fraction at or below which a box is checked
+# Result entry id and section of the checkbox group per form type
+CHECKBOX_SECTIONS = {
+    "eeo1": ("E-AND_F", "E"),
+    "eeo5": ("a-TYPE_OF_AGENCY", "a"),
+}
+
+# Checkbox configs, loaded once per process
+_checkbox_rects = {}
 
 
 def is_rectangle_dark(image, top_left, bottom_right, threshold):
     """
     Determine whether a rectangular region in the image is predominantly dark.
 
-    :param image: RGB image array as a NumPy ndarray
+    :param image: RGB or grayscale image array as a NumPy ndarray
     :param top_left: Tuple (x1, y1) of the rectangle's top-left corner
     :param bottom_right: Tuple (x2, y2) of the rectangle's bottom-right corner
     :param threshold: Fraction of the maximum possible pixel sum below which
@@ -41,55 +58,152 @@ def is_rectangle_dark(image, top_left, bottom_right, threshold):
     return False
 
 
+def integral_image(image: np.ndarray) -> np.ndarray:
+    """
+    Summed-area table of a grayscale image.
+
+    :param image: 2D uint8 image
+    :return: (h + 1, w + 1) array whose entry [y, x] is the sum of
+        image[:y, :x]; int32 when the total cannot overflow it, otherwise
+        float64 (exact for any realistic page)
+    """
+    image = np.ascontiguousarray(image)
+    depth = cv2.CV_32S if image.size * 255 < 2**31 else cv2.CV_64F
+    return cv2.integral(image, sdepth=depth)
+
+
+def dark_regions(integral: np.ndarray, rects: np.ndarray, threshold: float) -> np.ndarray:
+    """
+    Vectorized is_rectangle_dark over many regions, four table lookups each.
+
+    :param integral: Summed-area table from integral_image
+    :param rects: (K, 4) integer pixel rects (x1, y1, x2, y2), end exclusive;
+        they are clamped to the image
+    :param threshold: Fraction of the maximum possible pixel sum below which
+                      the region is considered dark
+    :return: (K,) bool array, True for dark regions (and for empty ones, as
+        is_rectangle_dark)
+    """
+    h, w = integral.shape[0] - 1, integral.shape[1] - 1
+    x1 = np.clip(rects[:, 0], 0, w)
+    y1 = np.clip(rects[:, 1], 0, h)
+    x2 = np.clip(rects[:, 2], x1, w)
+    y2 = np.clip(rects[:, 3], y1, h)
+    sums = integral[y2, x2] - integral[y1, x2] - integral[y2, x1] + integral[y1, x1]
+    area = (x2 - x1) * (y2 - y1)
+    return sums <= threshold * area * 255
+
+
+def load_checkbox_rects(checkbox_config):
+    """
+    Load a checkbox config once per process as parallel key and rect arrays.
+
+    :param checkbox_config: Path to YAML config mapping checkbox keys to coordinates
+    :return: (list of keys, (K, 4) float array of zoom-3 pixel rects)
+    """
+    if checkbox_config not in _checkbox_rects:
+        key_map = load_cell_coordination_config(checkbox_config)
+        rects = np.array(list(key_map.values()), dtype=np.float64).reshape(-1, 4)
+        _checkbox_rects[checkbox_config] = (list(key_map.keys()), rects)
+    return _checkbox_rects[checkbox_config]
+
+
+def load_page_gray(pdf_path):
+    """
+    Grayscale raster of the first page of a cropped page PDF.
+
+    :param pdf_path: Path to the PDF file
+    :return: (2D uint8 image, x pixels per point, y pixels per point); the
+        embedded image of single-image pages, otherwise a zoom-3 render
+    """
+    doc = fitz.open(pdf_path)
+    try:
+        raster = page_raster(doc[0])
+        if raster is None:
+            pix = doc[0].get_pixmap(
+                matrix=fitz.Matrix(CHECKBOX_ZOOM, CHECKBOX_ZOOM), colorspace=fitz.csGRAY
+            )
+            image = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.h, pix.w)
+            raster = (image, CHECKBOX_ZOOM, CHECKBOX_ZOOM)
+    finally:
+        doc.close()
+    return raster
+
+
+def checkbox_result(
+    form_type, image, checkbox_config, transform=IDENTITY, scale_x=None, scale_y=None
+):
+    """
+    Evaluate every checkbox of a cropped page raster and build its result entry.
+
+    :param form_type: 'eeo1' or 'eeo5' to determine JSON structure
+    :param image: 2D uint8 grayscale raster of the cropped page
+    :param checkbox_config: Path to YAML config mapping checkbox keys to coordinates
+    :param transform: (sx, tx, sy, ty) layout-to-page transform of the page,
+        as returned by pdf_to_cells
+    :param scale_x: Raster pixels per layout point along x (derived from the
+        image width when None)
+    :param scale_y: Raster pixels per layout point along y (derived from the
+        image height when None)
+    :return: CheckboxEntry with the checkbox states
+    """
+    if scale_x is None:
+        scale_x = image.shape[1] / DEFAULT_WIDTH
+    if scale_y is None:
+        scale_y = image.shape[0] / DEFAULT_HEIGHT
+    keys, rects = load_checkbox_rects(checkbox_config)
+    if transform != IDENTITY:
+        sx, tx, sy, ty = transform
+        rects = rects * (sx, sy, sx, sy) + np.array((tx, ty, tx, ty)) * CHECKBOX_ZOOM
+    # Checkbox coordinates are pixels of a zoom-3 render; rasters at other
+    # resolutions get the coordinates rescaled
+    factors = np.array((scale_x, scale_y, scale_x, scale_y)) / CHECKBOX_ZOOM
+    pixels = np.round(rects * factors).astype(np.int64)
+    states = dark_regions(integral_image(image), pixels, CHECKBOX_THRESHOLD)
+    json_map = dict(zip(keys, states.tolist()))
+
+    entry_id, section = CHECKBOX_SECTIONS[form_type]
+    return CheckboxEntry(entry_id, section, json_map)
+
+
 def extract_from_checkbox(
-    form_type, input_folder, output_folder, file_name, checkbox_config
+    form_type,
+    input_folder,
+    output_folder,
+    file_name,
+    checkbox_config,
+    transform=IDENTITY,
+    raster=None,
 ):
     """
     Extract checkbox states from a single PDF page and append the results to a JSON file.
+    The pipeline adds checkbox_result to its in-memory result instead.
 
     :param form_type: 'eeo1' or 'eeo5' to determine JSON structure
     :param input_folder: Directory containing the PDF file
     :param output_folder: Directory to write the result JSON
     :param file_name: Name of the PDF file to process
     :param checkbox_config: Path to YAML config mapping checkbox keys to coordinates
+    :param transform: (sx, tx, sy, ty) layout-to-page transform of the page,
+        as returned by pdf_to_cells
+    :param raster: Optional cropped page raster; when given, no PDF is opened
+        and file_name only names the result JSON
     :return: None
     """
-    zoom = 3
-    directory = os.path.join(input_folder, file_name)
-    doc = fitz.open(directory)
-
-    pix = doc[0].get_pixmap(
-        matrix=fitz.Matrix(zoom, zoom)
-    )  # Scale factor for higher resolution
-    image = np.array(Image.frombytes("RGB", [pix.width, pix.height], pix.samples))
-
-    checkbox_key_map = load_cell_coordination_config(checkbox_config)
-    json_map = {}
-    threshold = 0.7
-    for key, value in checkbox_key_map.items():
-        top_left = (value[0], value[1])
-        bottom_right = (value[2], value[3])
-        json_map[key] = is_rectangle_dark(image, top_left, bottom_right, threshold)
-    json_output = {}
-    if form_type == "eeo1":
-        json_output["id"] = "E-AND_F"
-        json_output["section"] = "E"
-        json_output["content"] = json_map
-    elif form_type == "eeo5":
-        json_output["id"] = "a-TYPE_OF_AGENCY"
-        json_output["section"] = "a"
-        json_output["content"] = json_map
+    if raster is not None:
+        entry = checkbox_result(form_type, raster, checkbox_config, transform)
+    else:
+        image, scale_x, scale_y = load_page_gray(os.path.join(input_folder, file_name))
+        entry = checkbox_result(
+            form_type, image, checkbox_config, transform, scale_x, scale_y
+        )
 
     folder_name = os.path.splitext(file_name)[0]
     path = os.path.join(output_folder, folder_name + "_result.json")
-    with open(path, "r+") as f:
+    with open(path, "r") as f:
         data = json.load(f)
-        data.append(json_output)
-        f.seek(0)
-        json.dump(data, f, indent=4)
-        f.truncate()
-        print("Data written to json file" + folder_name + "_result.json")
-        f.close()
+    data.append(entry.to_record())
+    write_records(path, data)
 
 
 def extract_checkboxes(input_folder, output_folder, checkbox_config):
@@ -0,0 +1,190 @@
+"""
+Module: classify_form.py
+
+Routes a document to its form type and layout variant (EEO-1 type1/type2,
+EEO-5) without running OCR. The first pages are rendered as low-resolution
+grayscale thumbnails cropped to their content bounds, reduced to ruling-line
+profiles and correlated with the profiles drawn from each layout config.
+When the PDF has a text layer, the layout keywords narrow the candidates
+first. Image scans (TIFF/PNG/JPEG) are scored from their decoded frames.
+
+The known layouts and their configs are listed in config/layouts.yaml.
+"""
+
+from typing import Dict, List, Optional, Tuple
+
+import cv2
+import fitz
+import numpy as np
+
+from utilities.form_lines import (
+    LAYOUT_HEIGHT,
+    LAYOUT_WIDTH,
+    layout_rule_profile,
+    profile_correlation,
+    rule_profile,
+)
+from utilities.load_config import (
+    load_cell_coordination_config,
+    load_section_config,
+    load_yaml_config,
+)
+from pipeline.image_input import is_image_file, iter_image_pages
+from pipeline.split_pages import crop_raster_to_bounds, detect_outer_edges_in_pdf
+
+DEFAULT_LAYOUTS = "config/layouts.yaml"
+DEFAULT_SECTION_CONFIG = "config/section_config.yaml"
+THUMBNAIL_SCALE = 1.0  # Thumbnail pixels per layout point
+CLASSIFY_PAGES = 2  # Leading pages scored per document
+MIN_LAYOUT_SCORE = 0.30  # Below this no layout is considered a match
+
+
+def load_layouts(
+    layouts_path: str = DEFAULT_LAYOUTS,
+    section_config_path: str = DEFAULT_SECTION_CONFIG,
+    scale: float = THUMBNAIL_SCALE,
+) -> Dict:
+    """
+    Load the known layouts and precompute their expected rule profiles.
+
+    Only the sections of the first form page (per section_config) are drawn,
+    since that is the page the classifier compares against.
+
+    :param layouts_path: Path to the layouts YAML
+    :param section_config_path: Path to the section config YAML
+    :param scale: Thumbnail pixels per layout point
+    :return: Mapping of layout name to its config entry, extended with
+        `row_profile` and `col_profile`
+    """
+    layouts = load_yaml_config(layouts_path)
+    width = int(round(LAYOUT_WIDTH * scale))
+    height = int(round(LAYOUT_HEIGHT * scale))
+    for layout in layouts.values():
+        key_map = load_cell_coordination_config(layout["form_config"])
+        sections = load_section_config(section_config_path, layout["form_type"])[0]
+        layout["row_profile"] = layout_rule_profile(key_map, 0, height, scale, sections)
+        layout["col_profile"] = layout_rule_profile(key_map, 1, width, scale, sections)
+    return layouts
+
+
+def render_thumbnail(page: fitz.Page, scale: float = THUMBNAIL_SCALE) -> np.ndarray:
+    """
+    Render a page cropped to its content bounds and stretched to the layout
+    size, the same normalization split_pages applies before cutting cells.
+
+    :param page: Source fitz.Page
+    :param scale: Thumbnail pixels per layout point
+    :return: 2D uint8 grayscale thumbnail
+    """
+    bounds = detect_outer_edges_in_pdf(page)
+    if bounds.is_empty:
+        bounds = page.rect
+    matrix = fitz.Matrix(
+        LAYOUT_WIDTH * scale / bounds.width, LAYOUT_HEIGHT * scale / bounds.height
+    )
+    pix = page.get_pixmap(matrix=matrix, clip=bounds, colorspace=fitz.csGRAY)
+    img = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.h, pix.w)
+    # Rounding of the clip can leave the thumbnail a pixel off the layout size
+    height = int(round(LAYOUT_HEIGHT * scale))
+    width = int(round(LAYOUT_WIDTH * scale))
+    padded = np.full((height, width), 255, dtype=np.uint8)
+    h, w = min(height, img.shape[0]), min(width, img.shape[1])
+    padded[:h, :w] = img[:h, :w]
+    return padded
+
+
+def raster_thumbnail(img: np.ndarray, scale: float = THUMBNAIL_SCALE) -> np.ndarray:
+    """
+    Thumbnail of an image page: cropped to its content bounds and resized to
+    the layout size, matching render_thumbnail.
+
+    :param img: 2D uint8 grayscale page image
+    :param scale: Thumbnail pixels per layout point
+    :return: 2D uint8 grayscale thumbnail
+    """
+    cropped = crop_raster_to_bounds(img, straighten=False)
+    size = (int(round(LAYOUT_WIDTH * scale)), int(round(LAYOUT_HEIGHT * scale)))
+    return cv2.resize(cropped, size, interpolation=cv2.INTER_AREA)
+
+
+def score_thumbnail(img: np.ndarray, layouts: Dict) -> Dict[str, float]:
+    """
+    Score a thumbnail against every layout.
+
+    :param img: Thumbnail from render_thumbnail
+    :param layouts: Layouts from load_layouts
+    :return: Mapping of layout name to the mean of the row and column
+        profile correlations
+    """
+    rows = rule_profile(img, 0)
+    cols = rule_profile(img, 1)
+    return {
+        name: (
+            profile_correlation(rows, layout["row_profile"])
+            + profile_correlation(cols, layout["col_profile"])
+        )
+        / 2
+        for name, layout in layouts.items()
+    }
+
+
+def text_layer_candidates(page: fitz.Page, layouts: Dict) -> List[str]:
+    """
+    Return the layouts whose keywords appear in the page text layer.
+
+    :param page: Source fitz.Page
+    :param layouts: Layouts from load_layouts
+    :return: Matching layout names; empty for scanned pages or no match
+    """
+    text = page.get_text().upper()
+    if not text.strip():
+        return []
+    return [
+        name
+        for name, layout in layouts.items()
+        if any(keyword.upper() in text for keyword in layout.get("keywords", []))
+    ]
+
+
+def classify_pdf(
+    pdf_path: str,
+    layouts: Dict,
+    max_pages: int = CLASSIFY_PAGES,
+    min_score: float = MIN_LAYOUT_SCORE,
+    scale: float = THUMBNAIL_SCALE,
+) -> Tuple[Optional[str], Dict[str, float]]:
+    """
+    Find the layout of a document.
+
+    Every leading page is scored against every layout and each layout keeps
+    its best page score, so a cover or continuation page does not hide the
+    page the layout describes.
+
+    :param pdf_path: Path to the input PDF or image scan (TIFF/PNG/JPEG)
+    :param layouts: Layouts from load_layouts
+    :param max_pages: Number of leading pages to score
+    :param min_score: Minimum best score to accept a layout
+    :param scale: Thumbnail pixels per layout point
+    :return: (layout name or None, scores per layout)
+    """
+    scores = {name: -1.0 for name in layouts}
+    candidates = set()
+    if is_image_file(pdf_path):
+        for _, img in iter_image_pages(pdf_path, 0, max_pages):
+            page_scores = score_thumbnail(raster_thumbnail(img, scale), layouts)
+            for name, score in page_scores.items():
+                scores[name] = max(scores[name], score)
+    else:
+        doc = fitz.open(pdf_path)
+        for page in doc.pages(0, min(max_pages, len(doc))):
+            candidates.update(text_layer_candidates(page, layouts))
+            page_scores = score_thumbnail(render_thumbnail(page, scale), layouts)
+            for name, score in page_scores.items():
+                scores[name] = max(scores[name], score)
+        doc.close()
+
+    eligible = [name for name in layouts if not candidates or name in candidates]
+    best = max(eligible, key=lambda name: scores[name], default=None)
+    if best is None or scores[best] < min_score:
+        return None, scores
+    return best, scores
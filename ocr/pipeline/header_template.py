@@ -0,0 +1,252 @@
+"""
+Module: header_template.py
+
+Cheap header validation for cropped EEO-1 pages. Instead of running the OCR
+predictor on the TYPE_OF_REPORT strip of every page, the strip is rendered
+as a downsampled grayscale raster and compared with a stored header image
+using normalized cross-correlation. Only pages whose score falls into the
+ambiguous band between the reject and accept thresholds need the OCR check.
+
+Without a header image, the first header strip that the OCR check reads
+with a similarity of at least BOOTSTRAP_SIMILARITY is saved as the template,
+and the following pages and documents are matched against it. The image can
+also be built from a chosen known-good cropped page:
+
+    python3 -m pipeline.header_template <page_cropped.pdf> <form_config.yaml>
+"""
+
+import os
+import sys
+from typing import Dict, Optional, Tuple
+
+import cv2
+import fitz
+import numpy as np
+
+from utilities.load_config import load_cell_coordination_config
+from pipeline.page_raster import rect_to_pixels
+
+DEFAULT_HEADER_TEMPLATE = "config/templates/eeo1_type_of_report.png"
+TEMPLATE_SCALE = 1.0  # Render scale of the strip (a third of the 3x cell render)
+TEMPLATE_MARGIN = 6  # Slack in points around the header rect for the NCC search
+ACCEPT_SCORE = 0.80  # Scores at or above this keep the page without OCR
+REJECT_SCORE = 0.40  # Scores at or below this drop the page without OCR
+BOOTSTRAP_SIMILARITY = 0.95  # OCR similarity a header needs to become the missing template
+MIN_TEMPLATE_INK = 0.02  # Ink fraction a template needs once the form rules are whitened
+
+# Templates are small; keep them for the life of the process
+_template_cache: Dict[str, np.ndarray] = {}
+
+
+def load_header_template(template_path: str) -> Optional[np.ndarray]:
+    """
+    Load a grayscale header template, caching it per path. A missing file is
+    not cached, so a template saved later (by any process) is picked up.
+
+    :param template_path: Path to the stored header image
+    :return: Template as a 2D uint8 array, or None if the file is missing
+    """
+    template = _template_cache.get(template_path)
+    if template is None and template_path and os.path.exists(template_path):
+        template = cv2.imread(template_path, cv2.IMREAD_GRAYSCALE)
+        if template is not None:
+            _template_cache[template_path] = template
+    return template
+
+
+def save_header_template(strip: np.ndarray, out_path: str) -> np.ndarray:
+    """
+    Save a header strip as the template image. The file is replaced
+    atomically, so processes matching against it never read a partial image.
+
+    :param strip: 2D uint8 strip from render_header_strip or raster_header_strip
+    :param out_path: Destination of the template image
+    :return: The template as saved
+    :raises ValueError: If the strip holds no header text, only form rules
+    """
+    template = trim_to_ink(suppress_rules(strip))
+    if np.mean(template < 160) < MIN_TEMPLATE_INK:
+        raise ValueError("header strip holds no text to match")
+    out_dir = os.path.dirname(out_path) or "."
+    os.makedirs(out_dir, exist_ok=True)
+    tmp_path = os.path.join(out_dir, f".{os.getpid()}.{os.path.basename(out_path)}")
+    cv2.imwrite(tmp_path, template)
+    os.replace(tmp_path, out_path)
+    _template_cache[out_path] = template
+    return template
+
+
+def suppress_rules(img: np.ndarray) -> np.ndarray:
+    """
+    Whiten long horizontal and vertical form rules so that the correlation is
+    driven by the header text rather than by the cell borders, which every
+    page of the form shares.
+
+    :param img: 2D uint8 grayscale strip
+    :return: Copy of the strip with ruling lines set to white
+    """
+    ink = (img < 160).astype(np.uint8)
+    h, w = ink.shape
+    horizontal = cv2.morphologyEx(
+        ink,
+        cv2.MORPH_OPEN,
+        cv2.getStructuringElement(cv2.MORPH_RECT, (max(1, w // 4), 1)),
+    )
+    vertical = cv2.morphologyEx(
+        ink,
+        cv2.MORPH_OPEN,
+        cv2.getStructuringElement(cv2.MORPH_RECT, (1, max(1, int(h * 0.8)))),
+    )
+    cleaned = img.copy()
+    cleaned[(horizontal | vertical) > 0] = 255
+    return cleaned
+
+
+def trim_to_ink(img: np.ndarray, pad: int = 2) -> np.ndarray:
+    """
+    Trim a template to the bounding box of its ink plus a small pad.
+
+    :param img: 2D uint8 grayscale image
+    :param pad: Pixels to keep around the ink
+    :return: Trimmed image, or the input if it holds no ink
+    """
+    ys, xs = np.nonzero(img < 160)
+    if len(ys) == 0:
+        return img
+    y0, y1 = max(0, ys.min() - pad), min(img.shape[0], ys.max() + pad + 1)
+    x0, x1 = max(0, xs.min() - pad), min(img.shape[1], xs.max() + pad + 1)
+    return img[y0:y1, x0:x1]
+
+
+def render_header_strip(
+    page: fitz.Page, key_map: Dict, scale: float = TEMPLATE_SCALE, margin: float = 0
+) -> np.ndarray:
+    """
+    Render the TYPE_OF_REPORT strip of a cropped page as a grayscale array.
+
+    :param page: Cropped fitz.Page
+    :param key_map: Form config mapping sections to cell rects
+    :param scale: Render zoom factor
+    :param margin: Extra points to include around the header rect
+    :return: 2D uint8 array of the strip
+    """
+    rect = fitz.Rect(*(key_map["a"]["TYPE_OF_REPORT"]))
+    if margin:
+        rect = (rect + (-margin, -margin, margin, margin)) & page.rect
+    pix = page.get_pixmap(
+        matrix=fitz.Matrix(scale, scale), clip=rect, colorspace=fitz.csGRAY
+    )
+    return np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.h, pix.w)
+
+
+def match_header_template(
+    page: fitz.Page, key_map: Dict, template: np.ndarray
+) -> float:
+    """
+    Score how well the header strip of a page matches the stored template.
+
+    The strip is rendered with a small margin so the normalized
+    cross-correlation can absorb a few points of offset between layouts.
+
+    :param page: Cropped fitz.Page
+    :param key_map: Form config mapping sections to cell rects
+    :param template: Grayscale template from load_header_template
+    :return: Best TM_CCOEFF_NORMED score in [-1, 1]
+    """
+    return match_header_strip(
+        render_header_strip(page, key_map, margin=TEMPLATE_MARGIN), template
+    )
+
+
+def raster_header_strip(
+    img: np.ndarray,
+    key_map: Dict,
+    scale: float = TEMPLATE_SCALE,
+    margin: float = 0,
+    page_size: Tuple[float, float] = (523, 679),
+) -> np.ndarray:
+    """
+    Cut the TYPE_OF_REPORT strip from a cropped page raster and resample it
+    to the zoom render_header_strip would produce.
+
+    :param img: 2D uint8 raster of a cropped page (any resolution)
+    :param key_map: Form config mapping sections to cell rects
+    :param scale: Output zoom factor (pixels per layout point)
+    :param margin: Extra points to include around the header rect
+    :param page_size: Size of the cropped page in layout points
+    :return: 2D uint8 array of the strip
+    """
+    page_rect = fitz.Rect(0, 0, *page_size)
+    rect = fitz.Rect(*(key_map["a"]["TYPE_OF_REPORT"]))
+    if margin:
+        rect = (rect + (-margin, -margin, margin, margin)) & page_rect
+    scale_x = img.shape[1] / page_rect.width
+    scale_y = img.shape[0] / page_rect.height
+    x0, y0, x1, y1 = rect_to_pixels(rect, page_rect.tl, scale_x, scale_y, img.shape)
+    size = (max(1, int(round(rect.width * scale))), max(1, int(round(rect.height * scale))))
+    return cv2.resize(img[y0:y1, x0:x1], size, interpolation=cv2.INTER_AREA)
+
+
+def match_header_raster(img: np.ndarray, key_map: Dict, template: np.ndarray) -> float:
+    """
+    Score the header strip of a cropped page raster against the stored template.
+
+    :param img: 2D uint8 raster of a cropped page
+    :param key_map: Form config mapping sections to cell rects
+    :param template: Grayscale template from load_header_template
+    :return: Best TM_CCOEFF_NORMED score in [-1, 1]
+    """
+    return match_header_strip(
+        raster_header_strip(img, key_map, margin=TEMPLATE_MARGIN), template
+    )
+
+
+def match_header_strip(strip: np.ndarray, template: np.ndarray) -> float:
+    """
+    Score a header strip rendered with a margin against the stored template.
+
+    :param strip: 2D uint8 strip from render_header_strip or raster_header_strip
+    :param template: Grayscale template from load_header_template
+    :return: Best TM_CCOEFF_NORMED score in [-1, 1]
+    """
+    strip = suppress_rules(strip)
+    # The search image must be at least as large as the template
+    if strip.shape[0] < template.shape[0] or strip.shape[1] < template.shape[1]:
+        pad_y = max(0, template.shape[0] - strip.shape[0])
+        pad_x = max(0, template.shape[1] - strip.shape[1])
+        strip = cv2.copyMakeBorder(
+            strip, 0, pad_y, 0, pad_x, cv2.BORDER_CONSTANT, value=255
+        )
+    scores = cv2.matchTemplate(strip, template, cv2.TM_CCOEFF_NORMED)
+    score = float(scores.max())
+    # A flat (blank) strip yields NaN: treat it as no match
+    return score if np.isfinite(score) else -1.0
+
+
+def build_header_template(
+    cropped_pdf_path: str, form_config: str, out_path: str = DEFAULT_HEADER_TEMPLATE
+) -> str:
+    """
+    Save the header strip of a known-good cropped page as the template image.
+
+    :param cropped_pdf_path: Path to a `*_cropped.pdf` page produced by split_pages
+    :param form_config: Path to the form config used to crop the page
+    :param out_path: Destination of the template image
+    :return: Path of the written template
+    """
+    key_map = load_cell_coordination_config(form_config)
+    doc = fitz.open(cropped_pdf_path)
+    save_header_template(render_header_strip(doc[0], key_map), out_path)
+    doc.close()
+    return out_path
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print(
+            "Usage: python3 -m pipeline.header_template "
+            "<page_cropped.pdf> <form_config.yaml> [out_path]"
+        )
+        sys.exit(1)
+    path = build_header_template(*sys.argv[1:4])
+    print(f"Header template saved to {path}")
@@ -0,0 +1,59 @@
+"""
+Module: image_input.py
+
+Reads scanned forms delivered as image files (multi-page TIFF, PNG, JPEG)
+without wrapping them in a PDF. Frames are decoded one at a time, so a
+long TIFF never sits in memory at once, and are handed to the raster
+cropping and cell stages as grayscale arrays.
+"""
+
+import os
+from typing import Iterator, Tuple
+
+import numpy as np
+from PIL import Image
+
+IMAGE_EXTENSIONS = (".tif", ".tiff", ".png", ".jpg", ".jpeg")
+# Files picked up from an input directory
+INPUT_EXTENSIONS = (".pdf",) + IMAGE_EXTENSIONS
+
+
+def is_image_file(path: str) -> bool:
+    """
+    Check whether a path names a supported image file.
+
+    :param path: File path or name
+    :return: True for TIFF, PNG and JPEG files
+    """
+    return os.path.splitext(path)[1].lower() in IMAGE_EXTENSIONS
+
+
+def count_image_pages(image_path: str) -> int:
+    """
+    Count the frames of an image file without decoding them.
+
+    :param image_path: Path to the image file
+    :return: Number of frames (1 for single-frame formats)
+    """
+    with Image.open(image_path) as img:
+        return getattr(img, "n_frames", 1)
+
+
+def iter_image_pages(
+    image_path: str, start: int = 0, stop: int = None
+) -> Iterator[Tuple[int, np.ndarray]]:
+    """
+    Decode the frames of an image file one at a time as grayscale arrays.
+
+    :param image_path: Path to the image file
+    :param start: First frame index to decode
+    :param stop: Frame index to stop before (all frames when None)
+    :return: Iterator of (frame index, 2D uint8 array)
+    """
+    with Image.open(image_path) as img:
+        n_frames = getattr(img, "n_frames", 1)
+        stop = n_frames if stop is None else min(stop, n_frames)
+        for index in range(start, stop):
+            img.seek(index)
+            # convert() decodes only the current frame
+            yield index, np.asarray(img.convert("L"))
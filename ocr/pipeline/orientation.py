@@ -0,0 +1,90 @@
+"""
+Module: orientation.py
+
+Page-level skew correction. Every cell of a page shares the page's
+orientation, so the angle is estimated once on the cropped page raster and
+the raster is straightened before any cell is cut from it. The OCR predictor
+can then run with orientation detection disabled instead of estimating it
+again for every cell crop.
+"""
+
+import cv2
+import numpy as np
+
+ESTIMATION_SCALE = 1 / 3  # Estimate on a 1x raster; the angle does not depend on scale
+MIN_ANGLE = 0.2  # Degrees; smaller skews are not worth resampling the page
+MAX_ANGLE = 10  # Degrees; a form rule is never tilted further than this
+MIN_RULE_RATIO = 0.5  # Shortest rule used for the estimate, as a fraction of the width
+
+
+def estimate_page_angle(img: np.ndarray, scale: float = ESTIMATION_SCALE) -> float:
+    """
+    Estimate the skew of a grayscale page raster from its horizontal form
+    rules: long line segments are found with a probabilistic Hough transform
+    and the median of their angles is returned.
+
+    :param img: 2D uint8 grayscale page raster
+    :param scale: Downscale factor applied before estimation
+    :return: Skew in degrees in image coordinates (positive when rules descend
+        to the right), or 0 when no rule is found
+    """
+    small = img
+    if scale != 1:
+        small = cv2.resize(img, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    ink = np.where(small < 160, 255, 0).astype(np.uint8)
+    # Keep only short horizontal runs so text strokes do not feed the transform
+    ink = cv2.morphologyEx(
+        ink, cv2.MORPH_OPEN, cv2.getStructuringElement(cv2.MORPH_RECT, (15, 1))
+    )
+    min_length = int(small.shape[1] * MIN_RULE_RATIO)
+    segments = cv2.HoughLinesP(
+        ink,
+        rho=1,
+        theta=np.pi / 720,
+        threshold=min_length // 2,
+        minLineLength=min_length,
+        maxLineGap=5,
+    )
+    if segments is None:
+        return 0.0
+    x1, y1, x2, y2 = segments.reshape(-1, 4).T.astype(np.float64)
+    angles = np.degrees(np.arctan2(y2 - y1, x2 - x1))
+    angles = angles[np.abs(angles) <= MAX_ANGLE]
+    if len(angles) == 0:
+        return 0.0
+    return float(np.median(angles))
+
+
+def straighten_page(img: np.ndarray, angle: float) -> np.ndarray:
+    """
+    Rotate a grayscale page raster around its centre to undo the estimated
+    skew, keeping its size and filling the uncovered corners with paper white.
+
+    :param img: 2D uint8 grayscale page raster
+    :param angle: Skew returned by estimate_page_angle
+    :return: Straightened raster of the same shape
+    """
+    h, w = img.shape[:2]
+    rot_mat = cv2.getRotationMatrix2D((w / 2, h / 2), angle, 1.0)
+    return cv2.warpAffine(
+        img,
+        rot_mat,
+        (w, h),
+        flags=cv2.INTER_LINEAR,
+        borderMode=cv2.BORDER_CONSTANT,
+        borderValue=255,
+    )
+
+
+def correct_page_orientation(img: np.ndarray) -> tuple:
+    """
+    Estimate the page skew once and straighten the raster if needed.
+
+    :param img: 2D uint8 grayscale page raster
+    :return: (raster, angle) where raster is the input itself and angle is 0
+        when no correction was applied
+    """
+    angle = estimate_page_angle(img)
+    if abs(angle) >= MIN_ANGLE:
+        return straighten_page(img, angle), angle
+    return img, 0.0
@@ -0,0 +1,123 @@
+"""
+Module: page_raster.py
+
+Zero-render access to scanned pages. A scanned filing is usually one
+embedded JPEG/CCITT/JBIG2 image per page; instead of rasterizing the whole
+page with get_pixmap (which resamples the scan to the render zoom), the
+embedded image is decoded at its native resolution and layout rects are
+mapped into its pixel space.
+
+The same path applies to the cropped pages written by split_pages, which
+hold a single image covering the page, so cells and checkboxes are cut
+from that raster directly.
+"""
+
+from typing import Optional, Tuple
+
+import fitz
+import numpy as np
+
+MIN_IMAGE_COVERAGE = 0.95  # Fraction of the page area the image must cover
+
+
+def single_page_image(page: fitz.Page) -> Optional[Tuple[int, fitz.Rect]]:
+    """
+    Find the embedded image of a page that is nothing but one upright image.
+
+    :param page: fitz.Page to inspect
+    :return: (xref, rect the image is displayed in, in page coordinates), or
+        None if the page holds several images, vector content, visible text,
+        or an image that is rotated, flipped or does not cover the page
+    """
+    images = page.get_images(full=True)
+    if len(images) != 1:
+        return None
+    xref = images[0][0]
+    placements = page.get_image_rects(xref, transform=True)
+    if len(placements) != 1:
+        return None
+    rect, matrix = placements[0]
+    # Only plain scaling keeps image pixels aligned with page axes
+    if matrix.b != 0 or matrix.c != 0 or matrix.a <= 0 or matrix.d <= 0:
+        return None
+    covered = (rect & page.rect).get_area()
+    if covered < MIN_IMAGE_COVERAGE * page.rect.get_area():
+        return None
+    if page.get_drawings():
+        return None
+    # Visible text drawn over the scan (invisible OCR layers are fine)
+    if any(span["type"] != 3 for span in page.get_texttrace()):
+        return None
+    return xref, rect
+
+
+def extract_page_raster(page: fitz.Page) -> Optional[Tuple[np.ndarray, fitz.Rect]]:
+    """
+    Decode the embedded image of a single-image page as grayscale.
+
+    :param page: fitz.Page to read
+    :return: (2D uint8 image at native resolution, rect it covers in page
+        coordinates), or None if the page is not a single-image page
+    """
+    found = single_page_image(page)
+    if found is None:
+        return None
+    xref, rect = found
+    pix = fitz.Pixmap(page.parent, xref)
+    if pix.alpha:
+        pix = fitz.Pixmap(pix, 0)
+    if pix.colorspace is None or pix.colorspace.n != 1:
+        pix = fitz.Pixmap(fitz.csGRAY, pix)
+    img = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.h, pix.stride)
+    return img[:, : pix.w], rect
+
+
+def page_raster(page: fitz.Page) -> Optional[Tuple[np.ndarray, float, float]]:
+    """
+    Raster of a page whose single image covers exactly the page, such as
+    the cropped pages written by split_pages.
+
+    :param page: fitz.Page to read
+    :return: (2D uint8 image, x pixels per point, y pixels per point), or
+        None if the page is not backed by one full-page image
+    """
+    found = extract_page_raster(page)
+    if found is None:
+        return None
+    img, rect = found
+    if abs(rect.x0 - page.rect.x0) > 0.5 or abs(rect.y0 - page.rect.y0) > 0.5:
+        return None
+    if abs(rect.x1 - page.rect.x1) > 0.5 or abs(rect.y1 - page.rect.y1) > 0.5:
+        return None
+    return img, img.shape[1] / page.rect.width, img.shape[0] / page.rect.height
+
+
+def rect_to_pixels(rect, origin: fitz.Point, scale_x: float, scale_y: float, shape) -> Tuple[int, int, int, int]:
+    """
+    Map a rect in page coordinates onto pixel bounds of a raster.
+
+    :param rect: (x0, y0, x1, y1) in page coordinates
+    :param origin: Page point of the raster's top-left pixel corner
+    :param scale_x: Pixels per point along x
+    :param scale_y: Pixels per point along y
+    :param shape: Shape of the raster, used to clamp the bounds
+    :return: (x0, y0, x1, y1) pixel bounds, end exclusive
+    """
+    x0, y0, x1, y1 = rect
+    h, w = shape[:2]
+    px0 = min(w, max(0, int(round((x0 - origin.x) * scale_x))))
+    py0 = min(h, max(0, int(round((y0 - origin.y) * scale_y))))
+    px1 = min(w, max(px0, int(round((x1 - origin.x) * scale_x))))
+    py1 = min(h, max(py0, int(round((y1 - origin.y) * scale_y))))
+    return px0, py0, px1, py1
+
+
+def gray_pixmap(img: np.ndarray) -> fitz.Pixmap:
+    """
+    Wrap a 2D uint8 array in a grayscale fitz.Pixmap.
+
+    :param img: 2D uint8 image
+    :return: Pixmap holding a copy of the pixels
+    """
+    img = np.ascontiguousarray(img)
+    return fitz.Pixmap(fitz.csGRAY, img.shape[1], img.shape[0], img.tobytes(), False)
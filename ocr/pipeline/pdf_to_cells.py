@@ -2,17 +2,35 @@
 Module: pdf_to_cells.py
 
 Splits PDF forms into individual cell PDFs based on predefined coordinates,
-applies padding around each cell, and logs processing steps. Includes utilities
-for file discovery and existence checks.
+applies padding around each cell, and logs processing steps. The coordinates
+are registered against each page first, so shifted or slightly scaled forms
+are cropped where their cells actually are. Includes utilities for file
+discovery and existence checks.
+
+Image scans never become PDF pages: raster_to_cells cuts the cells of a
+cropped page raster from split_pages.split_image_pages directly.
 """
 
 import os
-from typing import Dict, List
+import time
+from typing import Dict, List, Optional
 import fitz
+import numpy as np
 
 from utilities.load_config import load_cell_coordination_config
 from utilities.dir_helper import create_dir_if_not_exists
-from logger.logger import Logger
+from logger.logger import LoggerProxy
+from pipeline.page_raster import gray_pixmap, page_raster, rect_to_pixels
+from pipeline.registration import (
+    IDENTITY,
+    estimate_page_transform,
+    estimate_raster_transform,
+    transform_key_map,
+)
+from pipeline.split_pages import DEFAULT_HEIGHT, DEFAULT_WIDTH
+
+# Logger of this stage; its log file is bound per document
+file_logger = LoggerProxy(prefix="PDF_TO_CELLS")
 
 
 def get_files_in_directory(directory: str, extension: str = ".pdf"):
@@ -43,13 +61,22 @@ def file_exists(path: str) -> bool:
 
 
 def gen_cell(
-    page, fields, key, output_folder, filename, section, scale_factor=3, padding=45
+    page,
+    fields,
+    key,
+    output_folder,
+    filename,
+    section,
+    scale_factor=3,
+    padding=45,
+    raster=None,
 ):
     """
     Crop a specified region from a PDF page, add padding, and save as a new PDF cell.
 
     Steps:
-      1. Render the clipped region at the given scale factor in grayscale.
+      1. Render the clipped region at the given scale factor in grayscale,
+         or cut it from the page raster when one is given.
       2. Compute new page dimensions by adding padding.
       3. Create a new PDF page and insert the cropped image centered.
       4. Save the padded cell PDF to the output folder.
@@ -62,16 +89,39 @@ def gen_cell(
     :param section: Section identifier used in the output filename
     :param scale_factor: Zoom factor for rendering (default: 3)
     :param padding: Number of pixels to pad around the cropped region (default: 45)
+    :param raster: Optional (image, x scale, y scale) from page_raster; the
+        cell is then cut from the image at its native resolution
     """
-    new_doc = fitz.open()
-
     rect = fields[key]
 
-    cropped_pix = page.get_pixmap(
-        matrix=fitz.Matrix(scale_factor, scale_factor),
-        clip=rect,
-        colorspace=fitz.csGRAY,
-    )
+    cropped_pix = None
+    if raster is not None:
+        img, scale_x, scale_y = raster
+        x0, y0, x1, y1 = rect_to_pixels(rect, page.rect.tl, scale_x, scale_y, img.shape)
+        if x1 > x0 and y1 > y0:
+            cropped_pix = gray_pixmap(img[y0:y1, x0:x1])
+    if cropped_pix is None:
+        cropped_pix = page.get_pixmap(
+            matrix=fitz.Matrix(scale_factor, scale_factor),
+            clip=rect,
+            colorspace=fitz.csGRAY,
+        )
+
+    save_padded_cell(cropped_pix, output_folder, filename, section, key, padding)
+
+
+def save_padded_cell(cropped_pix, output_folder, filename, section, key, padding=45):
+    """
+    Save a cropped cell image as a padded single-page cell PDF.
+
+    :param cropped_pix: fitz.Pixmap of the cell
+    :param output_folder: Directory to save the cell PDF
+    :param filename: Base filename (without extension) for output
+    :param section: Section identifier used in the output filename
+    :param key: Cell key used in the output filename
+    :param padding: Number of pixels to pad around the cell (default: 45)
+    """
+    new_doc = fitz.open()
 
     pad_x = padding
     pad_y = padding
@@ -97,7 +147,12 @@ def gen_cell(
 
 
 def split_section(
-    page: fitz.Page, section: str, filename: str, output_folder: str, key_map: dict
+    page: fitz.Page,
+    section: str,
+    filename: str,
+    output_folder: str,
+    key_map: dict,
+    raster=None,
 ):
     """
     Split a PDF page into individual cell PDFs for a given section.
@@ -111,12 +166,13 @@ def split_section(
     :param filename: Base filename for output PDFs
     :param output_folder: Directory in which to save cell PDFs
     :param key_map: Mapping of all sections to their field coordinate dicts
+    :param raster: Optional page raster from page_raster, passed to gen_cell
     """
     file_logger.info(f"Splitting Section {section} of the PDF...")
     fields = key_map[section]
 
     for key in fields.keys():
-        gen_cell(page, fields, key, output_folder, filename, section)
+        gen_cell(page, fields, key, output_folder, filename, section, raster=raster)
 
 
 def pdf_to_cells(
@@ -125,20 +181,31 @@ def pdf_to_cells(
     section_config: Dict,
     page_num_ls: List[int],
     log_dir: str = "../logs",
-):
+    register: bool = True,
+    zero_render: bool = True,
+    page_rasters: Optional[Dict] = None,
+) -> Dict[int, tuple]:
     """
     Orchestrate splitting a PDF into individual cell PDFs across specified pages.
 
     Steps:
       1. Load section-to-coordinate mapping from the form config.
       2. Initialize logging and ensure output directories exist.
-      3. For each page index, split into cells based on section_config.
+      3. For each page index, register the layout against the page.
+      4. Split the page into cells based on section_config.
 
     :param pdf_path: Path to the input PDF file
     :param form_config: Path to YAML config mapping sections to cell coordinates
     :param section_config: Mapping from page indices to lists of section identifiers
     :param page_num_ls: List of page indices to process
     :param log_dir: Directory for log files (default: "../logs")
+    :param register: Estimate and apply a per-page layout transform
+    :param zero_render: Cut cells from the page image of single-image pages
+        instead of rendering each cell
+    :param page_rasters: Optional dict receiving the decoded raster of each
+        single-image page, keyed by page index, for the checkbox stage
+    :return: Mapping of page index to the (sx, tx, sy, ty) transform applied,
+        for reuse by the checkbox extraction
     """
     filename = os.path.splitext(os.path.basename(pdf_path))[0]
     filename_no_ext = os.path.splitext(filename)[0]
@@ -149,21 +216,19 @@ def pdf_to_cells(
     if not os.path.exists(log_dir):
         os.makedirs(log_dir, exist_ok=True)
 
-    global file_logger
-    file_logger = Logger(
-        log_file_path=f"{log_dir}/{filename_no_ext}.log",
-        prefix="PDF_TO_CELLS",
-    )
+    file_logger.bind(f"{log_dir}/{filename_no_ext}.log")
+    start = time.perf_counter()
 
     create_dir_if_not_exists(log_dir)
 
+    transforms = {}
     if key_map == {}:
         file_logger.error("Empty config")
-        return
+        return transforms
 
     if not file_exists(pdf_path):
         file_logger.error(f"File {pdf_path} does not exist.")
-        return
+        return transforms
 
     # PRASE 1: Split PDF into sections
     out_dir = os.path.join(file_dir, "cells")
@@ -174,7 +239,100 @@ def pdf_to_cells(
     for page_num in page_num_ls:
         cur_page = doc[page_num]
         cur_page_conf = section_config[page_num]
+        page_key_map = key_map
+        transform = IDENTITY
+        if register:
+            transform, score = estimate_page_transform(cur_page, key_map, cur_page_conf)
+            if transform != IDENTITY:
+                sx, tx, sy, ty = transform
+                file_logger.info(
+                    f"Page {page_num} registered: scale ({sx:.4f}, {sy:.4f}), "
+                    f"offset ({tx:.2f}, {ty:.2f}), score {score:.2f}"
+                )
+                page_key_map = transform_key_map(key_map, transform, cur_page_conf)
+        transforms[page_num] = transform
+        # Decode the page image once and cut every cell from it
+        raster = page_raster(cur_page) if zero_render else None
+        if raster is not None and page_rasters is not None:
+            page_rasters[page_num] = raster[0]
         for sect in cur_page_conf:
-            split_section(cur_page, sect, filename, out_dir, key_map)
+            split_section(cur_page, sect, filename, out_dir, page_key_map, raster)
 
     doc.close()
+    file_logger.event(
+        "stage_done",
+        pages=len(page_num_ls),
+        duration_ms=round((time.perf_counter() - start) * 1000, 1),
+    )
+    return transforms
+
+
+def raster_to_cells(
+    filename: str,
+    rasters: Dict,
+    form_config: str,
+    section_config: Dict,
+    out_dir: str,
+    log_dir: str = "../logs",
+    register: bool = True,
+) -> Dict[int, tuple]:
+    """
+    Split cropped page rasters into individual cell PDFs, the image-input
+    counterpart of pdf_to_cells. Each raster spans the fixed layout page.
+
+    :param filename: Base filename for output PDFs
+    :param rasters: Mapping of page index to 2D uint8 cropped page raster
+    :param form_config: Path to YAML config mapping sections to cell coordinates
+    :param section_config: Mapping from page indices to lists of section identifiers
+    :param out_dir: Directory in which to save cell PDFs
+    :param log_dir: Directory for log files (default: "../logs")
+    :param register: Estimate and apply a per-page layout transform
+    :return: Mapping of page index to the (sx, tx, sy, ty) transform applied,
+        for reuse by the checkbox extraction
+    """
+    key_map = load_cell_coordination_config(form_config)
+
+    create_dir_if_not_exists(log_dir)
+
+    file_logger.bind(f"{log_dir}/{filename}.log")
+    start = time.perf_counter()
+
+    transforms = {}
+    if key_map == {}:
+        file_logger.error("Empty config")
+        return transforms
+
+    os.makedirs(out_dir, exist_ok=True)
+    origin = fitz.Point(0, 0)
+    for page_num, img in sorted(rasters.items()):
+        cur_page_conf = section_config[page_num]
+        page_key_map = key_map
+        transform = IDENTITY
+        if register:
+            transform, score = estimate_raster_transform(img, key_map, cur_page_conf)
+            if transform != IDENTITY:
+                sx, tx, sy, ty = transform
+                file_logger.info(
+                    f"Page {page_num} registered: scale ({sx:.4f}, {sy:.4f}), "
+                    f"offset ({tx:.2f}, {ty:.2f}), score {score:.2f}"
+                )
+                page_key_map = transform_key_map(key_map, transform, cur_page_conf)
+        transforms[page_num] = transform
+        scale_x = img.shape[1] / DEFAULT_WIDTH
+        scale_y = img.shape[0] / DEFAULT_HEIGHT
+        for sect in cur_page_conf:
+            file_logger.info(f"Splitting Section {sect} of the image...")
+            for key, rect in page_key_map[sect].items():
+                x0, y0, x1, y1 = rect_to_pixels(rect, origin, scale_x, scale_y, img.shape)
+                cell = img[y0:y1, x0:x1]
+                if cell.size == 0:
+                    # Keep one blank cell so every expected cell file exists
+                    file_logger.warning(f"Cell {key} of section {sect} is outside the page")
+                    cell = np.full((1, 1), 255, dtype=np.uint8)
+                save_padded_cell(gray_pixmap(cell), out_dir, filename, sect, key)
+    file_logger.event(
+        "stage_done",
+        pages=len(rasters),
+        duration_ms=round((time.perf_counter() - start) * 1000, 1),
+    )
+    return transforms
@@ -0,0 +1,261 @@
+"""
+Module: registration.py
+
+Registers a cropped page against its layout config. Cell and checkbox
+rects in the layout YAMLs assume the form sits exactly where it sat on the
+page the coordinates were taken from; scans and re-typeset PDFs are often
+shifted or slightly scaled after cropping. Instead of re-rendering such
+documents, the page is rendered once at low resolution, reduced to ruling
+line profiles, and an axis-aligned scale and translation is fitted per axis
+against the profiles drawn from the layout's cell edges. The rects are then
+transformed before cropping.
+
+A transform is a tuple (sx, tx, sy, ty) in layout points mapping a layout
+point (x, y) to the page point (sx * x + tx, sy * y + ty).
+"""
+
+from typing import Dict, Iterable, Optional, Tuple
+
+import cv2
+import fitz
+import numpy as np
+
+from utilities.form_lines import (
+    LAYOUT_HEIGHT,
+    LAYOUT_WIDTH,
+    layout_edges,
+    layout_rule_profile,
+    rule_profile,
+)
+
+IDENTITY = (1.0, 0.0, 1.0, 0.0)
+REGISTRATION_SCALE = 1.0  # Render pixels per layout point
+SCALE_RANGE = 0.04  # Scales within 1 +/- this are searched
+SCALE_STEPS = 17  # Number of scales searched per axis
+MAX_SHIFT = 20  # Largest translation searched, in layout points
+MIN_SCORE = 0.30  # Correlation below this keeps the identity transform
+MIN_OFFSET = 1.0  # Corrections below this many points are not applied
+REFINE_WINDOW = 3  # Points around each predicted edge searched for its rule
+MIN_MATCHED_EDGES = 4  # Matched edges needed to refine the coarse fit
+MIN_PEAK = 0.005  # Smallest profile peak accepted as a rule during refinement
+
+
+def _fit_axis(
+    observed: np.ndarray, key_map: Dict, axis: int, sections, scale: float
+) -> Tuple[float, float, float]:
+    """
+    Fit scale and translation along one axis by correlating the observed
+    profile with the layout profile drawn at each candidate scale, then
+    refining the best candidate edge by edge.
+
+    :param observed: Rule profile of the page along the axis
+    :param key_map: Layout config mapping sections to cell rects
+    :param axis: 0 for the vertical (row) axis, 1 for the horizontal axis
+    :param sections: Sections whose rects are drawn
+    :param scale: Render pixels per layout point
+    :return: (scale, translation in points, correlation score)
+    """
+    n = len(observed)
+    obs = observed - observed.mean()
+    obs_norm = float(np.sqrt((obs * obs).sum()))
+    max_shift = int(MAX_SHIFT * scale)
+    best = (1.0, 0.0, -1.0)
+    if obs_norm == 0:
+        return best
+    for s in np.linspace(1 - SCALE_RANGE, 1 + SCALE_RANGE, SCALE_STEPS):
+        expected = layout_rule_profile(key_map, axis, n, scale * s, sections)
+        exp = expected - expected.mean()
+        exp_norm = float(np.sqrt((exp * exp).sum()))
+        if exp_norm == 0:
+            continue
+        # corr[k] pairs observed[i] with expected[i - k] for k in [-(n-1), n-1]
+        corr = np.correlate(obs, exp, mode="full")[
+            n - 1 - max_shift : n + max_shift
+        ] / (obs_norm * exp_norm)
+        k = int(np.argmax(corr))
+        score = float(corr[k])
+        if score > best[2]:
+            shift = k - max_shift + _parabolic_offset(corr, k)
+            best = (float(s), shift / scale, score)
+    if best[2] < 0:
+        return best
+    edges = layout_edges(key_map, axis, sections)
+    s, t = _refine_axis(observed, edges, best[0], best[1], scale)
+    return s, t, best[2]
+
+
+def _parabolic_offset(values: np.ndarray, k: int) -> float:
+    """Sub-sample offset of the peak at k from a parabola through its neighbours."""
+    if 0 < k < len(values) - 1:
+        denom = values[k - 1] - 2 * values[k] + values[k + 1]
+        if denom < 0:
+            return float(0.5 * (values[k - 1] - values[k + 1]) / denom)
+    return 0.0
+
+
+def _refine_axis(
+    observed: np.ndarray, edges: np.ndarray, s: float, t: float, scale: float
+) -> Tuple[float, float]:
+    """
+    Refine a coarse fit by matching each layout edge to the rule peak next to
+    its predicted position and fitting scale and translation by weighted
+    least squares.
+
+    :param observed: Rule profile of the page along the axis
+    :param edges: Layout edge positions along the axis, in points
+    :param s: Coarse scale
+    :param t: Coarse translation in points
+    :param scale: Render pixels per layout point
+    :return: (scale, translation in points); the coarse fit if too few
+        edges were matched
+    """
+    n = len(observed)
+    window = REFINE_WINDOW * scale
+    src, dst, weights = [], [], []
+    for edge in edges:
+        center = (s * edge + t) * scale
+        lo = max(0, int(np.floor(center - window)))
+        hi = min(n, int(np.ceil(center + window)) + 1)
+        if hi - lo < 3:
+            continue
+        segment = observed[lo:hi]
+        k = int(np.argmax(segment))
+        # Skip weak peaks and maxima cut off by the page border
+        if segment[k] < MIN_PEAK or k in (0, len(segment) - 1):
+            continue
+        src.append(edge)
+        # Sample i covers [i, i + 1) of the render
+        dst.append((lo + k + 0.5 + _parabolic_offset(segment, k)) / scale)
+        weights.append(np.sqrt(segment[k]))
+    if len(src) < MIN_MATCHED_EDGES:
+        return s, t
+    fit_s, fit_t = np.polyfit(src, dst, 1, w=weights)
+    if abs(fit_s - s) > SCALE_RANGE or abs(fit_t - t) > REFINE_WINDOW:
+        return s, t
+    return float(fit_s), float(fit_t)
+
+
+def estimate_page_transform(
+    page: fitz.Page,
+    key_map: Dict,
+    sections: Optional[Iterable[str]] = None,
+    scale: float = REGISTRATION_SCALE,
+) -> Tuple[Tuple[float, float, float, float], float]:
+    """
+    Estimate the transform from layout coordinates to a cropped page.
+
+    :param page: Cropped fitz.Page
+    :param key_map: Layout config mapping sections to cell rects
+    :param sections: Sections of the layout present on this page (all if None)
+    :param scale: Render pixels per layout point
+    :return: (transform, score); the identity is returned when the fit is
+        weak or the correction is negligible
+    """
+    pix = page.get_pixmap(matrix=fitz.Matrix(scale, scale), colorspace=fitz.csGRAY)
+    img = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.h, pix.w)
+    transform, score = fit_image_transform(img, key_map, sections, scale)
+    if score < MIN_SCORE or is_negligible(transform, page.rect):
+        return IDENTITY, score
+    return transform, score
+
+
+def estimate_raster_transform(
+    img: np.ndarray,
+    key_map: Dict,
+    sections: Optional[Iterable[str]] = None,
+    scale: float = REGISTRATION_SCALE,
+) -> Tuple[Tuple[float, float, float, float], float]:
+    """
+    Estimate the transform from layout coordinates to a cropped page raster,
+    the image-input counterpart of estimate_page_transform.
+
+    :param img: 2D uint8 raster spanning the cropped page
+    :param key_map: Layout config mapping sections to cell rects
+    :param sections: Sections of the layout present on this page (all if None)
+    :param scale: Raster pixels per layout point used for the fit
+    :return: (transform, score); the identity is returned when the fit is
+        weak or the correction is negligible
+    """
+    size = (int(round(LAYOUT_WIDTH * scale)), int(round(LAYOUT_HEIGHT * scale)))
+    small = cv2.resize(img, size, interpolation=cv2.INTER_AREA)
+    transform, score = fit_image_transform(small, key_map, sections, scale)
+    page_rect = fitz.Rect(0, 0, LAYOUT_WIDTH, LAYOUT_HEIGHT)
+    if score < MIN_SCORE or is_negligible(transform, page_rect):
+        return IDENTITY, score
+    return transform, score
+
+
+def fit_image_transform(
+    img: np.ndarray,
+    key_map: Dict,
+    sections: Optional[Iterable[str]] = None,
+    scale: float = REGISTRATION_SCALE,
+) -> Tuple[Tuple[float, float, float, float], float]:
+    """
+    Fit the transform from layout coordinates to a page raster, without
+    falling back to the identity.
+
+    :param img: 2D uint8 grayscale raster of the cropped page
+    :param key_map: Layout config mapping sections to cell rects
+    :param sections: Sections of the layout present on this page (all if None)
+    :param scale: Raster pixels per layout point
+    :return: (transform, score) where score is the weaker of the two axis
+        correlations
+    """
+    sections = list(sections) if sections is not None else None
+    sy, ty, score_y = _fit_axis(rule_profile(img, 0), key_map, 0, sections, scale)
+    sx, tx, score_x = _fit_axis(rule_profile(img, 1), key_map, 1, sections, scale)
+    return (sx, tx, sy, ty), min(score_x, score_y)
+
+
+def is_negligible(transform, page_rect: fitz.Rect, tolerance: float = MIN_OFFSET) -> bool:
+    """
+    Check whether a transform moves no point of the page by `tolerance` or more.
+
+    :param transform: (sx, tx, sy, ty)
+    :param page_rect: Rect of the page in layout points
+    :param tolerance: Largest displacement in points still considered negligible
+    :return: True if the transform can be skipped
+    """
+    sx, tx, sy, ty = transform
+    dx = max(abs(tx), abs((sx - 1) * page_rect.x1 + tx))
+    dy = max(abs(ty), abs((sy - 1) * page_rect.y1 + ty))
+    return dx < tolerance and dy < tolerance
+
+
+def transform_rect(rect, transform, zoom: float = 1) -> Tuple:
+    """
+    Map a layout rect onto the page.
+
+    :param rect: (x0, y0, x1, y1) in layout points times `zoom`
+    :param transform: (sx, tx, sy, ty) in layout points
+    :param zoom: Zoom of the rect coordinates (3 for the checkbox configs)
+    :return: Transformed (x0, y0, x1, y1) in the same units as `rect`
+    """
+    sx, tx, sy, ty = transform
+    x0, y0, x1, y1 = rect
+    return (
+        sx * x0 + tx * zoom,
+        sy * y0 + ty * zoom,
+        sx * x1 + tx * zoom,
+        sy * y1 + ty * zoom,
+    )
+
+
+def transform_key_map(key_map: Dict, transform, sections=None) -> Dict:
+    """
+    Transform the cell rects of a layout config.
+
+    :param key_map: Layout config mapping sections to cell rects
+    :param transform: (sx, tx, sy, ty)
+    :param sections: Sections to transform (all if None); others are kept
+    :return: New config with the same structure
+    """
+    return {
+        section: (
+            {key: transform_rect(rect, transform) for key, rect in fields.items()}
+            if sections is None or section in sections
+            else fields
+        )
+        for section, fields in key_map.items()
+    }
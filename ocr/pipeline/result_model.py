@@ -0,0 +1,203 @@
+"""
+Module: result_model.py
+
+In-memory model of one document's OCR result, serialized once per document.
+
+A result is an ordered list of entries, each written as a JSON object with
+the keys id, section, content and (except for checkboxes) confidence, in
+that order. Text fields keep their lines as lists; numeric tables are held
+as int64 / float64 arrays and written as nested lists. The entries use
+__slots__ so a document's result carries no per-instance dicts.
+
+Serialization uses orjson when it is installed and falls back to the
+standard json module otherwise; both write UTF-8, indented by two spaces,
+or without any whitespace in compact mode.
+"""
+
+import json
+import os
+from typing import Dict, List, Union
+
+import numpy as np
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+INDENT = 2  # Spaces per indentation level of non-compact results
+
+
+class TextEntry:
+    """
+    Text field: OCR lines and their average confidences.
+    """
+
+    __slots__ = ("id", "section", "content", "confidence")
+
+    def __init__(self, id: str, section: str, content: List[str], confidence: List[float]):
+        self.id = id
+        self.section = section
+        self.content = content
+        self.confidence = confidence
+
+    def to_record(self, native: bool = False) -> Dict:
+        """
+        :param native: Unused; text entries hold Python values only
+        :return: JSON-ready dict
+        """
+        return {
+            "id": self.id,
+            "section": self.section,
+            "content": self.content,
+            "confidence": self.confidence,
+        }
+
+
+class TableEntry:
+    """
+    Numeric table with its per-cell confidences.
+    """
+
+    __slots__ = ("id", "section", "content", "confidence")
+
+    def __init__(self, id: str, section: str, content, confidence):
+        self.id = id
+        self.section = section
+        self.content = np.asarray(content, dtype=np.int64)
+        self.confidence = np.asarray(confidence, dtype=np.float64)
+
+    def to_record(self, native: bool = False) -> Dict:
+        """
+        :param native: Convert the arrays to nested lists (needed by the
+            standard json module)
+        :return: JSON-ready dict
+        """
+        return {
+            "id": self.id,
+            "section": self.section,
+            "content": self.content.tolist() if native else self.content,
+            "confidence": self.confidence.tolist() if native else self.confidence,
+        }
+
+
+class CheckboxEntry:
+    """
+    Checkbox states of a section, keyed by checkbox name.
+    """
+
+    __slots__ = ("id", "section", "content")
+
+    def __init__(self, id: str, section: str, content: Dict[str, bool]):
+        self.id = id
+        self.section = section
+        self.content = content
+
+    def to_record(self, native: bool = False) -> Dict:
+        """
+        :param native: Unused; checkbox entries hold Python values only
+        :return: JSON-ready dict
+        """
+        return {"id": self.id, "section": self.section, "content": self.content}
+
+
+Entry = Union[TextEntry, TableEntry, CheckboxEntry]
+
+
+class DocumentResult:
+    """
+    Ordered entries of one document's result.
+    """
+
+    __slots__ = ("name", "entries")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.entries: List[Entry] = []
+
+    def add(self, entry: Entry) -> None:
+        """
+        Append an entry.
+
+        :param entry: Text, table or checkbox entry
+        """
+        self.entries.append(entry)
+
+    def sort(self) -> None:
+        """
+        Order the entries by id.
+        """
+        self.entries.sort(key=lambda entry: entry.id)
+
+    def to_records(self, native: bool = True) -> List[Dict]:
+        """
+        :param native: Convert table arrays to nested lists
+        :return: List of JSON-ready dicts, in entry order
+        """
+        return [entry.to_record(native) for entry in self.entries]
+
+    def dumps(self, compact: bool = False) -> bytes:
+        """
+        Serialize the result.
+
+        :param compact: Write without indentation or spaces
+        :return: UTF-8 encoded JSON
+        """
+        if orjson is not None:
+            return dumps_records(self.to_records(native=False), compact)
+        return dumps_records(self.to_records(), compact)
+
+    def write(self, path: str, compact: bool = False) -> None:
+        """
+        Write the result to a file in one call.
+
+        :param path: Output JSON path
+        :param compact: Write without indentation or spaces
+        """
+        write_bytes(path, self.dumps(compact))
+
+
+def dumps_records(records, compact: bool = False) -> bytes:
+    """
+    Serialize JSON-ready records (lists, dicts, numpy arrays when orjson is
+    installed).
+
+    :param records: Object to serialize
+    :param compact: Write without indentation or spaces
+    :return: UTF-8 encoded JSON
+    """
+    if orjson is not None:
+        option = orjson.OPT_SERIALIZE_NUMPY
+        if not compact:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(records, option=option)
+    if compact:
+        text = json.dumps(records, ensure_ascii=False, separators=(",", ":"))
+    else:
+        text = json.dumps(records, ensure_ascii=False, indent=INDENT)
+    return text.encode("utf-8")
+
+
+def write_bytes(path: str, data: bytes) -> None:
+    """
+    Write serialized JSON through a temporary file and rename it into place,
+    so readers never see a partial result.
+
+    :param path: Output JSON path
+    :param data: Serialized JSON
+    """
+    tmp_path = path + ".part"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def write_records(path: str, records, compact: bool = False) -> None:
+    """
+    Serialize JSON-ready records and write them in one call.
+
+    :param path: Output JSON path
+    :param records: Object to serialize
+    :param compact: Write without indentation or spaces
+    """
+    write_bytes(path, dumps_records(records, compact))
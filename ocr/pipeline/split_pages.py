@@ -2,12 +2,17 @@
 Module: split_pages.py
 
 Detects content boundaries in PDF pages, crops to those bounds,
-splits multi-page EEO-1 forms into individual page PDFs,
-validates section headers using OCR predictions and sequence matching,
+splits multi-page EEO-1 forms into individual page PDFs (or, for image
+scans, into page rasters streamed frame by frame), validates section
+headers by template matching with an OCR fallback for ambiguous pages,
 and logs processing steps and errors.
 """
 
 import os
+import math
+import time
+from concurrent.futures import ProcessPoolExecutor
+
 import cv2
 import fitz
 import numpy as np
@@ -16,32 +21,214 @@ from difflib import SequenceMatcher
 
 from utilities.load_config import load_cell_coordination_config
 from utilities.dir_helper import create_dir_if_not_exists
-from logger.logger import Logger
+from logger.logger import LoggerProxy
+from pipeline.orientation import correct_page_orientation
+from pipeline.page_raster import extract_page_raster, gray_pixmap
+from pipeline.image_input import iter_image_pages
+from pipeline.header_template import (
+    ACCEPT_SCORE,
+    BOOTSTRAP_SIMILARITY,
+    DEFAULT_HEADER_TEMPLATE,
+    REJECT_SCORE,
+    load_header_template,
+    match_header_raster,
+    match_header_template,
+    raster_header_strip,
+    render_header_strip,
+    save_header_template,
+)
+
+
+INK_THRESHOLD = 220  # Gray levels below this count as ink (Canny's step at its high threshold)
+BOUNDS_DOWNSAMPLE = 4  # Min-pooling factor of the coarse bounds search
+MIN_INK_PIXELS = 2  # Coarse ink pixels a row/column needs to count as content
+
+# Logger of this stage; its log file is bound per document
+file_logger = LoggerProxy(prefix="SPLIT_PAGES")
+
+
+def _first_content_index(profile, min_ink):
+    """Return the first index whose projection reaches min_ink, or -1."""
+    hits = np.flatnonzero(profile >= min_ink)
+    return int(hits[0]) if len(hits) else -1
+
+
+def _refine_bound(img, coarse, factor, axis, from_start, ink_threshold):
+    """
+    Refine a coarse bound at full resolution with sub-pixel precision.
+
+    Looks for the outermost line holding at least two ink pixels inside the
+    window covered by the coarse bound, then moves the edge by the ink
+    coverage of that line so that anti-aliased borders land where the gray
+    level crosses paper white.
+
+    :param img: Full resolution grayscale image
+    :param coarse: Coarse bound index along the axis
+    :param factor: Downsampling factor used for the coarse search
+    :param axis: 0 to refine a row (y) bound, 1 for a column (x) bound
+    :param from_start: True for the minimum bound, False for the maximum
+    :param ink_threshold: Gray level below which a pixel counts as ink
+    :return: Sub-pixel position of the content edge
+    """
+    size = img.shape[axis]
+    lo = max(0, coarse * factor - factor)
+    hi = min(size, (coarse + 1) * factor + factor)
+    window = img[lo:hi, :] if axis == 0 else img[:, lo:hi]
+    # Lines with a single ink pixel are speckle, not content
+    ink_counts = np.count_nonzero(window < ink_threshold, axis=1 - axis)
+    darkest = window.min(axis=1 - axis)
+    ink_lines = np.flatnonzero(ink_counts >= 2)
+    if len(ink_lines) == 0:
+        return float(coarse * factor if from_start else (coarse + 1) * factor)
+    idx = ink_lines[0] if from_start else ink_lines[-1]
+    coverage = (255 - float(darkest[idx])) / 255
+    if from_start:
+        # Canny marks the paper-side neighbour of the first ink line
+        return lo + idx + (1 - coverage) - 1
+    return lo + idx + coverage
+
+
+def detect_content_bounds(
+    img,
+    downsample=BOUNDS_DOWNSAMPLE,
+    ink_threshold=INK_THRESHOLD,
+    min_ink=MIN_INK_PIXELS,
+):
+    """
+    Find the bounding box of the content of a grayscale page raster.
+
+    The raster is min-pooled by `downsample` (thin form rules survive), then
+    thresholded. Row and column ink projections, counting only pixels that
+    continue along the projected line (so scanner speckle drops out), give a
+    coarse box in which rows/columns holding fewer than `min_ink` ink pixels
+    are ignored. Each side is then refined at full resolution.
+
+    :param img (np.ndarray): 2D uint8 grayscale image.
+    :param downsample (int): Pooling factor of the coarse search.
+    :param ink_threshold (int): Gray level below which a pixel counts as ink.
+    :param min_ink (int): Minimum coarse ink pixels for a content row/column.
+
+    :returns Tuple[float, float, float, float]: (x0, y0, x1, y1) in pixels,
+        or the full image extent when no content is found.
+    """
+    h, w = img.shape
+    f = max(1, int(downsample))
+    # Min-pool by eroding with an f x f window and sampling every f-th pixel
+    coarse = cv2.erode(img, np.ones((f, f), dtype=np.uint8))[::f, ::f]
+    ink = coarse < ink_threshold
+
+    # Drop speckle: a content row is made of horizontal runs (rules, words)
+    # and a content column of vertical runs, so only ink pixels with a
+    # neighbour along the projected line are counted
+    row_runs = np.zeros_like(ink)
+    row_runs[:, 1:] |= ink[:, :-1]
+    row_runs[:, :-1] |= ink[:, 1:]
+    col_runs = np.zeros_like(ink)
+    col_runs[1:, :] |= ink[:-1, :]
+    col_runs[:-1, :] |= ink[1:, :]
+
+    rows = np.count_nonzero(ink & row_runs, axis=1)
+    cols = np.count_nonzero(ink & col_runs, axis=0)
+    top = _first_content_index(rows, min_ink)
+    left = _first_content_index(cols, min_ink)
+    if top < 0 or left < 0:
+        return 0.0, 0.0, float(w), float(h)
+    bottom = len(rows) - 1 - _first_content_index(rows[::-1], min_ink)
+    right = len(cols) - 1 - _first_content_index(cols[::-1], min_ink)
+
+    # Refine each side at full scale, restricted to the coarse content span
+    x_span = img[:, max(0, left * f - f) : min(w, (right + 2) * f)]
+    y_span = img[max(0, top * f - f) : min(h, (bottom + 2) * f), :]
+    y0 = _refine_bound(x_span, top, f, 0, True, ink_threshold)
+    y1 = _refine_bound(x_span, bottom, f, 0, False, ink_threshold)
+    x0 = _refine_bound(y_span, left, f, 1, True, ink_threshold)
+    x1 = _refine_bound(y_span, right, f, 1, False, ink_threshold)
+    return max(0.0, x0), max(0.0, y0), min(float(w), x1), min(float(h), y1)
 
 
 def detect_outer_edges_in_pdf(page, scale_factor=1):
     """
-    Render a PDF page to grayscale, detect edges, and return the
-    bounding rectangle around the detected content edges.
+    Render a PDF page to grayscale and return the bounding rectangle
+    around its content, using thresholded row/column ink projections.
 
     :param page (fitz.Page): The PDF page to analyze.
     :param scale_factor (float): Zoom factor for rendering to improve edge detection.
 
     returns fitz.Rect: Bounding box of detected content edges.
     """
-    """Detect edges and return the bounding box of content."""
     pix = page.get_pixmap(
         matrix=fitz.Matrix(scale_factor, scale_factor), colorspace=fitz.csGRAY
     )
     img = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.h, pix.w)
 
-    edges = cv2.Canny(img, 50, 150)
+    x0, y0, x1, y1 = detect_content_bounds(img)
 
-    y_coords, x_coords = np.where(edges > 0)
-    min_x, max_x = x_coords.min(), x_coords.max()
-    min_y, max_y = y_coords.min(), y_coords.max()
+    return fitz.Rect(x0, y0, x1, y1) / scale_factor
 
-    return fitz.Rect(min_x, min_y, max_x, max_y)
+
+# Fixed dimensions of a cropped page; the layout configs are defined in this space
+DEFAULT_WIDTH = 523
+DEFAULT_HEIGHT = 679
+HEADER_LINE = "SECTION A - TYPE OF REPORT"
+
+
+def crop_page_to_bounds(page, dst_doc, scale_factor=3, straighten=True, zero_render=True):
+    """
+    Crop a page to its detected content bounds and append the result to
+    another document as a page with the fixed layout dimensions. The
+    cropped raster is straightened once here, so every cell cut from the
+    page later is already upright.
+
+    Scanned pages made of a single embedded image are cropped from the
+    decoded image at its native resolution instead of being rendered.
+
+    :param page (fitz.Page): The source PDF page.
+    :param dst_doc (fitz.Document): Document receiving the cropped page.
+    :param scale_factor (int): Zoom factor when cropping to maintain resolution.
+    :param straighten (bool): Estimate the page skew and correct it.
+    :param zero_render (bool): Use the embedded image of single-image pages.
+
+    :returns fitz.Page: The cropped page inside dst_doc.
+    """
+    raster = extract_page_raster(page) if zero_render else None
+    if raster is not None:
+        img = crop_raster_to_bounds(raster[0], straighten)
+    else:
+        detected_rect = detect_outer_edges_in_pdf(page)
+        cropped_pix = page.get_pixmap(
+            matrix=fitz.Matrix(scale_factor, scale_factor),
+            clip=detected_rect,
+            colorspace=fitz.csGRAY,
+        )
+        img = np.frombuffer(cropped_pix.samples, dtype=np.uint8).reshape(
+            cropped_pix.h, cropped_pix.w
+        )
+
+        if straighten:
+            img, _ = correct_page_orientation(img)
+
+    cropped_page = dst_doc.new_page(width=DEFAULT_WIDTH, height=DEFAULT_HEIGHT)
+
+    # Insert cropped content into the new page
+    cropped_page.insert_image(cropped_page.rect, pixmap=gray_pixmap(img))
+    return cropped_page
+
+
+def crop_raster_to_bounds(img, straighten=True):
+    """
+    Crop a grayscale page raster to its detected content bounds, keeping its
+    native resolution, and straighten it.
+
+    :param img (np.ndarray): 2D uint8 page raster.
+    :param straighten (bool): Estimate the page skew and correct it.
+
+    :returns np.ndarray: Cropped raster; it spans the fixed layout page.
+    """
+    x0, y0, x1, y1 = detect_content_bounds(img)
+    img = img[int(y0) : int(math.ceil(y1)), int(x0) : int(math.ceil(x1))]
+    if straighten:
+        img, _ = correct_page_orientation(img)
+    return img
 
 
 def crop_pdf_to_bounds(pdf_path, filename, output_folder, scale_factor=3):
@@ -56,35 +243,140 @@ def crop_pdf_to_bounds(pdf_path, filename, output_folder, scale_factor=3):
 
     :returns str: Path to the saved cropped PDF file.
     """
-    DEFAULT_WIDTH = 523
-    DEFAULT_HEIGHT = 679
-
     pdf_doc = fitz.open(pdf_path)
     new_doc = fitz.open()
 
-    for i, page in enumerate(pdf_doc):
-        detected_rect = detect_outer_edges_in_pdf(page)
-
-        cropped_page = new_doc.new_page(width=DEFAULT_WIDTH, height=DEFAULT_HEIGHT)
-
-        cropped_pix = page.get_pixmap(
-            matrix=fitz.Matrix(scale_factor, scale_factor),
-            clip=detected_rect,
-            colorspace=fitz.csGRAY,
-        )
-
-        # Insert cropped content into the new page
-        cropped_page.insert_image(cropped_page.rect, pixmap=cropped_pix)
+    for page in pdf_doc:
+        crop_page_to_bounds(page, new_doc, scale_factor)
 
     # Save the final cropped PDF
     out_path = os.path.join(output_folder, f"{filename}_cropped.pdf")
     new_doc.save(out_path)
     new_doc.close()
+    pdf_doc.close()
     return out_path
 
 
+def save_page(doc, page_num, out_path):
+    """
+    Write a single page of a document to its own PDF file.
+
+    :param doc (fitz.Document): Source document.
+    :param page_num (int): Index of the page to write.
+    :param out_path (str): Destination PDF path.
+    """
+    page_doc = fitz.open()
+    page_doc.insert_pdf(doc, from_page=page_num, to_page=page_num)
+    page_doc.save(out_path)
+    page_doc.close()
+
+
+def crop_page_range(
+    pdf_path, start, end, key_map, header_template, scale_factor=3
+):
+    """
+    Crop a contiguous range of pages and score their headers against the
+    template. Opens the source PDF independently so ranges of one document
+    can be processed by different worker processes.
+
+    :param pdf_path (str): Path to the source PDF.
+    :param start (int): First page index of the range (inclusive).
+    :param end (int): Last page index of the range (exclusive).
+    :param key_map (dict): Mapping of sections to detection rects.
+    :param header_template (str): Path to the stored header image.
+    :param scale_factor (int): Zoom factor when cropping to maintain resolution.
+
+    :returns Tuple[int, bytes, List]: Range start, the cropped pages as PDF bytes,
+        and the template score of each page (None without a template).
+    """
+    template = load_header_template(header_template)
+    src_doc = fitz.open(pdf_path)
+    cropped_doc = fitz.open()
+    scores = []
+    for page_num in range(start, end):
+        page = crop_page_to_bounds(src_doc[page_num], cropped_doc, scale_factor)
+        scores.append(
+            match_header_template(page, key_map, template)
+            if template is not None
+            else None
+        )
+    data = cropped_doc.tobytes()
+    cropped_doc.close()
+    src_doc.close()
+    return start, data, scores
+
+
+def split_page_ranges(page_count, workers, min_range_pages):
+    """
+    Split a document into contiguous page ranges, one batch per worker.
+
+    :param page_count (int): Number of pages in the document.
+    :param workers (int): Number of worker processes available.
+    :param min_range_pages (int): Smallest range worth sending to a worker.
+
+    :returns List[Tuple[int, int]]: (start, end) page ranges in order.
+    """
+    range_size = max(min_range_pages, math.ceil(page_count / max(1, workers)))
+    return [
+        (start, min(start + range_size, page_count))
+        for start in range(0, page_count, range_size)
+    ]
+
+
+def crop_and_score_pages(
+    pdf_path, page_count, key_map, header_template, workers=1, min_range_pages=8
+):
+    """
+    Crop every page of a document and score its header, splitting the work
+    into page ranges across a process pool when the document is large enough.
+    Results are merged back in page order.
+
+    :param pdf_path (str): Path to the source PDF.
+    :param page_count (int): Number of pages in the document.
+    :param key_map (dict): Mapping of sections to detection rects.
+    :param header_template (str): Path to the stored header image.
+    :param workers (int): Maximum number of worker processes.
+    :param min_range_pages (int): Smallest range worth sending to a worker.
+
+    :returns Tuple[fitz.Document, List]: In-memory document of cropped pages and
+        the template score of each page.
+    """
+    ranges = split_page_ranges(page_count, workers, min_range_pages)
+    if len(ranges) <= 1:
+        results = [
+            crop_page_range(pdf_path, start, end, key_map, header_template)
+            for start, end in ranges
+        ]
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(ranges))) as pool:
+            futures = [
+                pool.submit(
+                    crop_page_range, pdf_path, start, end, key_map, header_template
+                )
+                for start, end in ranges
+            ]
+            results = [future.result() for future in futures]
+
+    cropped_doc = fitz.open()
+    scores = []
+    for _, data, range_scores in sorted(results, key=lambda r: r[0]):
+        range_doc = fitz.open("pdf", data)
+        cropped_doc.insert_pdf(range_doc)
+        range_doc.close()
+        scores.extend(range_scores)
+    return cropped_doc, scores
+
+
 def process_pdf(
-    form_type: str, pdf_path: str, form_config: str, predictor, sim_threshold: float=0.70, log_dir: str = "../logs"
+    form_type: str,
+    pdf_path: str,
+    form_config: str,
+    predictor,
+    sim_threshold: float = 0.70,
+    log_dir: str = "../logs",
+    header_template: str = DEFAULT_HEADER_TEMPLATE,
+    workers: int = 1,
+    output_dir: str = None,
 ):
     """
     Main entry point: splits an input PDF into pages (for EEO-1) or copies intact,
@@ -96,100 +388,421 @@ def process_pdf(
     :param predictor: OCR predictor callable that returns page blocks with text.
     :param sim_threshold (float): Similarity threshold to retain pages.
     :param log_dir: Log directory path
+    :param header_template (str): Path to the stored header image; when missing,
+        pages are validated with OCR and the first header it reads exactly is
+        saved there.
+    :param workers (int): Worker processes used to crop page ranges of large
+        EEO-1 documents in parallel.
+    :param output_dir (str): Directory of the cropped page PDFs (default: a
+        tmp directory next to the input PDF).
     """
     file_dir = os.path.dirname(pdf_path)
     key_map = load_cell_coordination_config(form_config)
-    output_dir = f"{file_dir}/tmp"
+    output_dir = output_dir or f"{file_dir}/tmp"
     os.makedirs(output_dir, exist_ok=True)
-    global file_logger
     create_dir_if_not_exists(log_dir)
 
     base_filename = os.path.basename(pdf_path).replace(".pdf", "")
-    file_logger = Logger(
-        log_file_path=f"{log_dir}/split_pages_{base_filename}.log",
-        prefix="SPLIT_PAGES",
-    )
+    file_logger.bind(f"{log_dir}/split_pages_{base_filename}.log", document=base_filename)
+    start = time.perf_counter()
     try:
         doc = fitz.open(pdf_path)
         if form_type == "eeo1":
-            for page_num in range(len(doc)):
-                file_logger.info(f"Processing {base_filename} - Page {page_num + 1}")
-                new_pdf_path = os.path.join(
-                    output_dir, f"{base_filename}_page{page_num + 1}.pdf"
+            template = load_header_template(header_template)
+            if template is None:
+                file_logger.warning(
+                    f"Header template {header_template} not found, using OCR until "
+                    f"a header read by OCR is saved as the template"
+                )
+            # Crop every page in memory (by page range across workers) and
+            # validate all headers at once; only the pages that pass are written
+            page_count = len(doc)
+            file_logger.info(
+                f"Processing {base_filename} - {page_count} pages with {workers} workers"
+            )
+            cropped_doc, scores = crop_and_score_pages(
+                pdf_path, page_count, key_map, header_template, workers
+            )
+
+            keep = check_pages(
+                cropped_doc,
+                key_map,
+                predictor,
+                sim_threshold,
+                template,
+                scores,
+                header_template=header_template,
+            )
+            for page_num, is_kept in enumerate(keep):
+                if not is_kept:
+                    continue
+                out_path = os.path.join(
+                    output_dir, f"{base_filename}_page{page_num + 1}_cropped.pdf"
+                )
+                save_page(cropped_doc, page_num, out_path)
+                file_logger.info(
+                    f"Page {page_num + 1} of file {base_filename} has been processed."
                 )
-                new_doc = fitz.open()
-                new_doc.insert_pdf(doc, from_page=page_num, to_page=page_num)
-                new_doc.save(new_pdf_path)
-                new_doc.close()
-                cut_edges(new_pdf_path)
-                check_page(new_pdf_path, key_map, predictor, sim_threshold, page_num)
+            cropped_doc.close()
         else:
             file_logger.info(f"Processing {base_filename}")
-            new_pdf_path = os.path.join(output_dir, f"{base_filename}.pdf")
-            doc.save(new_pdf_path)
-            cut_edges(new_pdf_path)
+            crop_pdf_to_bounds(pdf_path, base_filename, output_dir, scale_factor=3)
+        file_logger.event(
+            "stage_done",
+            pages=len(doc),
+            duration_ms=round((time.perf_counter() - start) * 1000, 1),
+        )
         doc.close()
 
     except Exception as e:
         file_logger.error(f"Error processing {pdf_path}: {e}")
+    file_logger.close()
 
 
-def cut_edges(pdf_path: str):
-    """
-    Crop the PDF to the detected content bounds and save it.
-        
-    :prarm pdf_path (str): Path to the PDF file to crop.
+def render_ocr_header_strip(page, key_map):
     """
-    file_dir = os.path.dirname(pdf_path)
-    filename = os.path.splitext(os.path.basename(pdf_path))[0]
-    crop_pdf_to_bounds(pdf_path, filename, file_dir, scale_factor=3)
-    os.remove(pdf_path)
+    Render the TYPE_OF_REPORT strip of a cropped page as an RGB array for OCR.
 
+    :param page (fitz.Page): Cropped page.
+    :param key_map (dict): Mapping of sections to detection rects.
 
-def check_page(new_pdf_path, key_map, predictor, sim_threshold, page_num):
+    :returns np.ndarray: (H, W, 3) uint8 image.
     """
-    Use OCR predictor to extract the first line of text and compare against
-    expected header, removing pages below similarity threshold.
-
-    :param pdf_path (str): Path to the cropped PDF page.
-    :param key_map (dict): Mapping of sections to detection rects.
-    :param predictor: Doctr OCR predictor instance
-    :param sim_threshold (float): Minimum ratio to keep the page.
-    :param page_num (int): Current page number (for logging).
-    """
-    dir_name = os.path.dirname(new_pdf_path)
-    filename = os.path.splitext(os.path.basename(new_pdf_path))[0]
-    tmp_pdf_path = os.path.join(dir_name, f"{filename}_cropped.pdf")
-    new_doc = fitz.open(tmp_pdf_path)
-    page = new_doc[0]
     rect = fitz.Rect(*(key_map["a"]["TYPE_OF_REPORT"]))
     cropped_pix = page.get_pixmap(clip=rect)
     img = Image.frombytes(
         "RGB", (cropped_pix.width, cropped_pix.height), cropped_pix.samples
     )
-    img_np = np.array(img)
-    result = predictor([img_np])
+    return np.array(img)
+
+
+def check_pages(
+    cropped_doc,
+    key_map,
+    predictor,
+    sim_threshold,
+    template=None,
+    scores=None,
+    accept_score=ACCEPT_SCORE,
+    reject_score=REJECT_SCORE,
+    header_template=None,
+):
+    """
+    Validate the section A header of every cropped page of a document.
+    Each header strip is first scored against the stored template; the
+    strips whose score falls inside the ambiguous band (reject_score,
+    accept_score) are collected and read by a single batched OCR call,
+    then fuzzily compared with the expected header line. Without a
+    template, the first strip OCR reads exactly is saved as the template.
+
+    :param cropped_doc (fitz.Document): In-memory document of cropped pages.
+    :param key_map (dict): Mapping of sections to detection rects.
+    :param predictor: Doctr OCR predictor instance
+    :param sim_threshold (float): Minimum ratio to keep a page.
+    :param template (np.ndarray): Grayscale header template, or None to always use OCR.
+    :param scores (List[float]): Template scores already computed per page, if any.
+    :param accept_score (float): Template score at or above which a page is kept.
+    :param reject_score (float): Template score at or below which a page is removed.
+    :param header_template (str): Where to save a template built from this
+        document when there is none, or None to not build one.
+
+    :returns List[bool]: Whether each page should be kept.
+    """
+    keep = [False] * len(cropped_doc)
+    ocr_pages = []
+
+    for page_num, page in enumerate(cropped_doc):
+        if template is None:
+            ocr_pages.append(page_num)
+            continue
+        if scores is not None and scores[page_num] is not None:
+            score = scores[page_num]
+        else:
+            score = match_header_template(page, key_map, template)
+        decision = template_decision(page_num, score, accept_score, reject_score)
+        if decision is None:
+            ocr_pages.append(page_num)
+        else:
+            keep[page_num] = decision
 
-    LINE = "SECTION A - TYPE OF REPORT"
+    if not ocr_pages:
+        return keep
 
+    strips = [render_ocr_header_strip(cropped_doc[i], key_map) for i in ocr_pages]
+    try:
+        result = predictor(strips)
+    except Exception as e:
+        file_logger.warning(
+            f"Some error predicting {HEADER_LINE}, exception: {e}, removing {len(ocr_pages)} pages..."
+        )
+        return keep
+
+    for page_num, ocr_page in zip(ocr_pages, result.pages):
+        keep[page_num] = ocr_header_matches(page_num, ocr_page, sim_threshold)
+
+    if template is None and header_template:
+        for page_num, ocr_page in zip(ocr_pages, result.pages):
+            if keep[page_num] and bootstrap_template(
+                page_num,
+                ocr_page,
+                render_header_strip(cropped_doc[page_num], key_map),
+                header_template,
+            ):
+                break
+    return keep
+
+
+def template_decision(page_num, score, accept_score=ACCEPT_SCORE, reject_score=REJECT_SCORE):
+    """
+    Decide on a page from its header template score.
+
+    :param page_num (int): Page index, for logging.
+    :param score (float): Template score of the page.
+    :param accept_score (float): Score at or above which the page is kept.
+    :param reject_score (float): Score at or below which the page is removed.
+
+    :returns Optional[bool]: True to keep, False to remove, None when the
+        score is ambiguous and OCR must decide.
+    """
+    score = round(float(score), 4)
+    if score >= accept_score:
+        file_logger.event(
+            "header_template",
+            msg=f"Page {page_num + 1} saved\tTemplate Score: {score:.2f}",
+            page=page_num + 1,
+            score=score,
+            decision="kept",
+        )
+        return True
+    if score <= reject_score:
+        file_logger.event(
+            "header_template",
+            msg=f"Page {page_num + 1} removed\tTemplate Score: {score:.2f}",
+            page=page_num + 1,
+            score=score,
+            decision="removed",
+        )
+        return False
+    file_logger.event(
+        "header_template",
+        msg=f"Page {page_num + 1} ambiguous template score {score:.2f}, falling back to OCR",
+        page=page_num + 1,
+        score=score,
+        decision="ambiguous",
+    )
+    return None
+
+
+def header_similarity(ocr_page):
+    """
+    Read the first OCR line of a header strip and compare it with the expected header.
+
+    :param ocr_page: Doctr page result of the header strip.
+
+    :returns Tuple[str, float]: Text of the line and its similarity ratio.
+    """
+    first_line = ocr_page.blocks[0].lines[0]
+    page_text = " ".join([word.value for word in first_line.words])
+    return page_text, SequenceMatcher(None, HEADER_LINE, page_text).ratio()
+
+
+def bootstrap_template(page_num, ocr_page, strip, header_template):
+    """
+    Save the header strip of a page as the missing template if OCR read its
+    header (nearly) exactly, so later pages skip the OCR check.
+
+    :param page_num (int): Page index, for logging.
+    :param ocr_page: Doctr page result of the header strip.
+    :param strip (np.ndarray): Grayscale header strip from render_header_strip
+        or raster_header_strip.
+    :param header_template (str): Path to save the template to.
+
+    :returns bool: Whether the template was saved.
+    """
+    try:
+        _, similarity_score = header_similarity(ocr_page)
+    except (IndexError, AttributeError):
+        return False
+    if similarity_score < BOOTSTRAP_SIMILARITY:
+        return False
+    try:
+        save_header_template(strip, header_template)
+    except ValueError as e:
+        file_logger.warning(f"Header of page {page_num + 1} not saved as template: {e}")
+        return False
+    file_logger.event(
+        "header_template_built",
+        msg=f"Header of page {page_num + 1} saved as template {header_template}",
+        page=page_num + 1,
+        similarity=round(similarity_score, 4),
+        path=header_template,
+    )
+    return True
+
+
+def ocr_header_matches(page_num, ocr_page, sim_threshold):
+    """
+    Compare the first OCR line of a header strip with the expected header.
+
+    :param page_num (int): Page index, for logging.
+    :param ocr_page: Doctr page result of the header strip.
+    :param sim_threshold (float): Minimum ratio to keep a page.
+
+    :returns bool: Whether the page should be kept.
+    """
     try:
-        first_line = result.pages[0].blocks[0].lines[0]
-        page_text = " ".join([word.value for word in first_line.words])
-        similarity_score = SequenceMatcher(None, LINE, page_text).ratio()
+        page_text, similarity_score = header_similarity(ocr_page)
         if similarity_score >= sim_threshold:
-            file_logger.info(f"Page {page_num + 1} saved: {tmp_pdf_path}")
-            filename = os.path.splitext(os.path.basename(tmp_pdf_path))[0]
-            file_logger.info(
-                f"Page {page_num + 1} of file {filename} has been processed."
-            )
-        else:
-            file_logger.info(
-                f"Page {page_num + 1} removed: {tmp_pdf_path}\tText: {page_text}\tSimilarity Score: {similarity_score}"
+            file_logger.event(
+                "header_ocr",
+                msg=f"Page {page_num + 1} saved",
+                page=page_num + 1,
+                similarity=round(similarity_score, 4),
+                decision="kept",
             )
-            os.remove(tmp_pdf_path)
+            return True
+        file_logger.event(
+            "header_ocr",
+            msg=f"Page {page_num + 1} removed\tText: {page_text}\tSimilarity Score: {similarity_score}",
+            page=page_num + 1,
+            similarity=round(similarity_score, 4),
+            decision="removed",
+            value=page_text,
+        )
     except Exception as e:
         file_logger.warning(
-            f"Some error predicting {LINE}, exception: {e}, removing it..."
+            f"Some error predicting {HEADER_LINE} on page {page_num + 1}, exception: {e}, removing it..."
         )
-        os.remove(tmp_pdf_path)
-    new_doc.close()
+    return False
+
+
+def check_raster_page(
+    page_num, img, key_map, predictor, sim_threshold, template=None, header_template=None
+):
+    """
+    Validate the section A header of a cropped page raster: template score
+    first, OCR of the header strip when the score is ambiguous or there is
+    no template. Without a template, a strip OCR reads exactly is saved as
+    the template.
+
+    :param page_num (int): Page index, for logging.
+    :param img (np.ndarray): Cropped page raster.
+    :param key_map (dict): Mapping of sections to detection rects.
+    :param predictor: Doctr OCR predictor instance
+    :param sim_threshold (float): Minimum ratio to keep a page.
+    :param template (np.ndarray): Grayscale header template, or None to always use OCR.
+    :param header_template (str): Where to save a template built from this
+        page when there is none, or None to not build one.
+
+    :returns bool: Whether the page should be kept.
+    """
+    if template is not None:
+        decision = template_decision(
+            page_num, match_header_raster(img, key_map, template)
+        )
+        if decision is not None:
+            return decision
+    strip = raster_header_strip(img, key_map)
+    try:
+        result = predictor([cv2.cvtColor(strip, cv2.COLOR_GRAY2RGB)])
+    except Exception as e:
+        file_logger.warning(
+            f"Some error predicting {HEADER_LINE} on page {page_num + 1}, exception: {e}, removing it..."
+        )
+        return False
+    kept = ocr_header_matches(page_num, result.pages[0], sim_threshold)
+    if kept and template is None and header_template:
+        bootstrap_template(page_num, result.pages[0], strip, header_template)
+    return kept
+
+
+def split_image_pages(
+    form_type: str,
+    image_path: str,
+    form_config: str,
+    predictor,
+    page_num_ls,
+    sim_threshold: float = 0.70,
+    log_dir: str = "../logs",
+    header_template: str = DEFAULT_HEADER_TEMPLATE,
+):
+    """
+    Image counterpart of process_pdf for TIFF/PNG/JPEG scans. Frames are
+    decoded one at a time and cropped as rasters; nothing is written to disk.
+
+    EEO-1: every frame is its own form page and is yielded on its own once
+    its header passes validation. EEO-5: the frames listed in page_num_ls
+    make up one form and are yielded together.
+
+    :param form_type (str): 'eeo1' or 'eeo5'.
+    :param image_path (str): Path to the image file.
+    :param form_config (str): Path to the config mapping for header detection.
+    :param predictor: OCR predictor callable that returns page blocks with text.
+    :param page_num_ls (List[int]): Form page indices to keep for EEO-5.
+    :param sim_threshold (float): Similarity threshold to retain pages.
+    :param log_dir: Log directory path
+    :param header_template (str): Path to the stored header image.
+
+    :returns Iterator[Tuple[str, Dict[int, np.ndarray]]]: Base name of each
+        form and its cropped rasters keyed by form page index.
+    """
+    key_map = load_cell_coordination_config(form_config)
+    create_dir_if_not_exists(log_dir)
+
+    base_filename = os.path.splitext(os.path.basename(image_path))[0]
+    file_logger.bind(f"{log_dir}/split_pages_{base_filename}.log", document=base_filename)
+    try:
+        if form_type == "eeo1":
+            template = load_header_template(header_template)
+            if template is None:
+                file_logger.warning(
+                    f"Header template {header_template} not found, using OCR until "
+                    f"a header read by OCR is saved as the template"
+                )
+            file_logger.info(f"Processing {base_filename} page by page")
+            for page_num, img in iter_image_pages(image_path):
+                start = time.perf_counter()
+                cropped = crop_raster_to_bounds(img)
+                del img
+                kept = check_raster_page(
+                    page_num,
+                    cropped,
+                    key_map,
+                    predictor,
+                    sim_threshold,
+                    template,
+                    header_template,
+                )
+                if template is None:
+                    # Picks up a template saved from this or another document
+                    template = load_header_template(header_template)
+                # Timed per page: the pages are processed downstream between yields
+                file_logger.event(
+                    "page_done",
+                    page=page_num + 1,
+                    duration_ms=round((time.perf_counter() - start) * 1000, 1),
+                )
+                if not kept:
+                    continue
+                file_logger.info(
+                    f"Page {page_num + 1} of file {base_filename} has been processed."
+                )
+                yield f"{base_filename}_page{page_num + 1}_cropped", {0: cropped}
+        else:
+            file_logger.info(f"Processing {base_filename}")
+            start = time.perf_counter()
+            rasters = {
+                page_num: crop_raster_to_bounds(img)
+                for page_num, img in iter_image_pages(
+                    image_path, 0, max(page_num_ls) + 1
+                )
+            }
+            file_logger.event(
+                "stage_done",
+                pages=len(rasters),
+                duration_ms=round((time.perf_counter() - start) * 1000, 1),
+            )
+            yield f"{base_filename}_cropped", rasters
+    except Exception as e:
+        file_logger.error(f"Error processing {image_path}: {e}")
+    file_logger.close()
@@ -0,0 +1,410 @@
+"""
+Module: supervisor.py
+
+Runs documents in worker processes that are recycled after a number of
+documents or once their resident memory passes a limit. Long runs of torch
+and PyMuPDF fragment the heap of a process, so a fresh process keeps the
+throughput of week-long runs steady (re_render_pdf.py restarts Firefox
+every 50 files for the same reason).
+
+Workers check their limits only between documents: a worker that reaches
+one finishes its document, reports the result, announces that it retires
+and exits, and the supervisor starts its replacement right away. With the
+fork start method the replacement inherits the OCR model loaded once by
+the parent, so recycling does not reload it from disk.
+
+The supervisor hands each worker one document at a time over its own pipe,
+so it always knows the document in flight, and enforces deadlines per
+document and per stage (workers report each stage as it starts). A worker
+that overruns a deadline is killed; a worker that dies (e.g. killed by the
+system when out of memory) is replaced. Each worker leads its own process
+group, so the page-range pool it started is killed with it. Either way its
+document moves to the quarantine lane, which runs after the main lane with
+deadlines QUARANTINE_FACTOR times longer, so one bad file cannot hold up
+the others.
+A document that fails in quarantine too is reported as failed; the results
+its worker reported before are kept.
+"""
+
+import multiprocessing as mp
+import os
+import signal
+import time
+import traceback
+from collections import deque
+from multiprocessing.connection import wait
+from typing import Callable, Dict, Iterable, Iterator, Optional, Tuple
+
+from utilities.memory_profile import current_rss_mb
+
+MAX_DOCS_PER_WORKER = 50  # Documents a worker processes before it is replaced
+MAX_WORKER_RSS_MB = 8192  # Resident memory after which a worker is replaced
+DOCUMENT_TIMEOUT = None  # Seconds a document may take, None for no deadline
+STAGE_TIMEOUT = None  # Seconds a stage may take, None for no deadline
+QUARANTINE_FACTOR = 4  # Deadline multiplier of the quarantine lane
+POLL_INTERVAL = 1.0  # Seconds between deadline checks
+KILL_GRACE = 5.0  # Seconds a terminated worker gets before it is killed
+
+# Messages from a worker: (kind, task id, payload, retiring)
+STAGE, RESULT, DONE, FAILED = "stage", "result", "done", "failed"
+# Outcome of a document killed by the supervisor
+TIMED_OUT = "timed_out"
+MAIN_LANE, QUARANTINE_LANE = "main", "quarantine"
+
+
+def start_method() -> str:
+    """
+    :return: 'fork' where available, so workers inherit the loaded model,
+        'spawn' otherwise
+    """
+    return "fork" if "fork" in mp.get_all_start_methods() else "spawn"
+
+
+def _set_process_group(pid: int = 0):
+    """
+    Make a process the leader of its own process group, so the worker and
+    the processes it starts can be killed together. Called by both the
+    worker and the supervisor, so the group exists before either relies on it.
+
+    :param pid: Process to move, 0 for the calling process
+    """
+    if not hasattr(os, "setpgid"):
+        return
+    try:
+        os.setpgid(pid, 0)
+    except OSError:
+        # The worker already moved itself, exec'd (spawn) or exited
+        pass
+
+
+def _signal_group(proc, sig: int):
+    """
+    Send a signal to a worker and every process in its process group.
+
+    :param proc: Worker process
+    :param sig: Signal number
+    """
+    if hasattr(os, "killpg"):
+        try:
+            os.killpg(proc.pid, sig)
+        except OSError:
+            # No process left in the group
+            pass
+    if sig == signal.SIGTERM:
+        proc.terminate()
+    else:
+        proc.kill()
+
+
+def _kill_worker(proc):
+    """
+    Terminate a worker and the processes it started, and kill whatever is
+    left after KILL_GRACE seconds.
+
+    :param proc: Worker process
+    """
+    _signal_group(proc, signal.SIGTERM)
+    # Waiting on the sentinel does not reap the worker, so its process group
+    # id cannot be reused before the second signal
+    wait([proc.sentinel], KILL_GRACE)
+    _signal_group(proc, getattr(signal, "SIGKILL", signal.SIGTERM))
+
+
+def _worker_main(
+    worker_id: int,
+    init: Callable,
+    handler: Callable,
+    tasks,
+    messages,
+    max_docs: int,
+    max_rss_mb: float,
+):
+    """
+    Worker loop: process the tasks handed to this worker until it is told to
+    stop or reaches a limit.
+
+    :param worker_id: Worker number, passed to init
+    :param init: Called once with the worker id; returns the worker state
+    :param handler: Called with (state, task, report) for each task; its
+        return value is sent back. report(kind, payload) sends a STAGE name
+        or a RESULT right away.
+    :param tasks: Connection receiving (task id, task), None to stop
+    :param messages: Connection sending messages to the supervisor
+    :param max_docs: Documents processed before retiring
+    :param max_rss_mb: Resident memory in MB after which the worker retires
+    """
+    _set_process_group()
+    state = init(worker_id)
+    done = 0
+    while True:
+        try:
+            item = tasks.recv()
+        except EOFError:
+            return
+        if item is None:
+            return
+        task_id, task = item
+
+        def report(kind, payload, task_id=task_id):
+            messages.send((kind, task_id, payload, None))
+
+        try:
+            kind, payload = DONE, handler(state, task, report)
+        except Exception:
+            kind, payload = FAILED, traceback.format_exc()
+        done += 1
+        rss_mb = current_rss_mb()
+        retiring = None
+        if done >= max_docs:
+            retiring = f"{done} documents"
+        elif rss_mb > max_rss_mb:
+            retiring = f"RSS {rss_mb:.0f} MB"
+        messages.send((kind, task_id, payload, retiring))
+        if retiring:
+            return
+
+
+class _Worker:
+    """
+    Supervisor-side state of one worker process.
+    """
+
+    def __init__(self, worker_id: int, proc, tasks, messages):
+        self.id = worker_id
+        self.proc = proc
+        self.tasks = tasks
+        self.messages = messages
+        # Task in flight: (task id, lane), when it and its stage started
+        self.task: Optional[Tuple[int, str]] = None
+        self.started = 0.0
+        self.stage: Optional[str] = None
+        self.stage_started = 0.0
+
+
+class WorkerSupervisor:
+    """
+    Pool of recycled worker processes with per-document and per-stage deadlines.
+
+    :param workers: Worker processes running at the same time
+    :param init: Called once in each worker with its id; returns the state
+        passed to handler (e.g. the OCR predictor). Arguments are inherited,
+        not pickled, with the fork start method.
+    :param handler: Called in a worker with (state, task, report) for each
+        task; must return a picklable value. report(STAGE, name) starts a
+        stage deadline; report(RESULT, value) hands a partial result to the
+        supervisor at once, so it is kept even if the document fails later.
+    :param max_docs: Documents a worker processes before it is replaced
+    :param max_rss_mb: Resident memory in MB after which a worker is replaced
+    :param document_timeout: Seconds a document may take in the main lane
+    :param stage_timeout: Seconds a stage may take in the main lane
+    :param quarantine_factor: Deadline multiplier of the quarantine lane
+    """
+
+    def __init__(
+        self,
+        workers: int,
+        init: Callable,
+        handler: Callable,
+        max_docs: int = MAX_DOCS_PER_WORKER,
+        max_rss_mb: float = MAX_WORKER_RSS_MB,
+        document_timeout: Optional[float] = DOCUMENT_TIMEOUT,
+        stage_timeout: Optional[float] = STAGE_TIMEOUT,
+        quarantine_factor: float = QUARANTINE_FACTOR,
+    ):
+        self.workers = max(workers, 1)
+        self.init = init
+        self.handler = handler
+        self.max_docs = max(max_docs, 1)
+        self.max_rss_mb = max_rss_mb
+        self.timeouts = {
+            MAIN_LANE: (document_timeout, stage_timeout),
+            QUARANTINE_LANE: tuple(
+                t * quarantine_factor if t else t for t in (document_timeout, stage_timeout)
+            ),
+        }
+        self.context = mp.get_context(start_method())
+        self.next_worker = 0
+        self.recycled = 0
+        self.quarantined = 0
+        self.pool: Dict[int, _Worker] = {}
+        self.tasks: Dict[int, object] = {}
+
+    def _start_worker(self) -> _Worker:
+        worker_id = self.next_worker
+        self.next_worker += 1
+        # One pipe per direction and worker: a killed worker can only break
+        # its own pipes, never a lock shared with the other workers
+        task_reader, task_writer = self.context.Pipe(duplex=False)
+        message_reader, message_writer = self.context.Pipe(duplex=False)
+        # Not daemonic: workers split large PDFs with their own process pools
+        proc = self.context.Process(
+            target=_worker_main,
+            args=(
+                worker_id,
+                self.init,
+                self.handler,
+                task_reader,
+                message_writer,
+                self.max_docs,
+                self.max_rss_mb,
+            ),
+            name=f"ocr-worker-{worker_id}",
+        )
+        proc.start()
+        _set_process_group(proc.pid)
+        task_reader.close()
+        message_writer.close()
+        worker = _Worker(worker_id, proc, task_writer, message_reader)
+        self.pool[worker_id] = worker
+        return worker
+
+    def _stop_worker(self, worker: _Worker, kill: bool = False):
+        if kill:
+            # Also when the worker is gone: its pool processes may outlive it
+            _kill_worker(worker.proc)
+        worker.proc.join()
+        worker.tasks.close()
+        worker.messages.close()
+        del self.pool[worker.id]
+
+    def _assign(self, worker: _Worker, lanes: Dict[str, deque]):
+        """
+        Hand the next queued task, main lane first, to an idle worker.
+        """
+        for lane in (MAIN_LANE, QUARANTINE_LANE):
+            if lanes[lane]:
+                task_id = lanes[lane].popleft()
+                worker.task = (task_id, lane)
+                worker.started = worker.stage_started = time.monotonic()
+                worker.stage = None
+                worker.tasks.send((task_id, self.tasks[task_id]))
+                return
+
+    def _fail(self, worker: _Worker, lanes, pending, status: str, reason: str):
+        """
+        Replace a worker that died or overran, and quarantine or fail its task.
+
+        :return: Outcomes to yield
+        """
+        task = worker.task
+        self._stop_worker(worker, kill=True)
+        outcomes = []
+        if task is not None and task[0] in pending:
+            task_id, lane = task
+            if lane == MAIN_LANE:
+                print(f"Log: {reason}, moving its document to the quarantine lane")
+                self.quarantined += 1
+                lanes[QUARANTINE_LANE].append(task_id)
+            else:
+                del pending[task_id]
+                outcomes.append((self.tasks[task_id], status, reason))
+        if lanes[MAIN_LANE] or lanes[QUARANTINE_LANE]:
+            self._assign(self._start_worker(), lanes)
+        return outcomes
+
+    def _exit_reason(self, worker: _Worker) -> str:
+        """
+        :return: Why a worker that stopped responding is failed
+        """
+        worker.proc.join(KILL_GRACE)
+        return f"worker {worker.id} exited with code {worker.proc.exitcode}"
+
+    def _overrun(self, worker: _Worker, now: float) -> Optional[str]:
+        """
+        :return: Why the worker's task overran its deadline, or None
+        """
+        if worker.task is None:
+            return None
+        document_timeout, stage_timeout = self.timeouts[worker.task[1]]
+        where = f"in stage {worker.stage}" if worker.stage else "before its first stage"
+        if document_timeout and now - worker.started > document_timeout:
+            return f"worker {worker.id} exceeded the {document_timeout:.0f}s document deadline {where}"
+        if stage_timeout and now - worker.stage_started > stage_timeout:
+            return f"worker {worker.id} exceeded the {stage_timeout:.0f}s stage deadline {where}"
+        return None
+
+    def run(self, tasks: Iterable) -> Iterator[Tuple[object, str, object]]:
+        """
+        Process every task and yield the outcomes as they arrive.
+
+        :param tasks: Picklable tasks
+        :return: Iterator of (task, status, value): RESULT with each partial
+            result, then DONE with the handler's return value, FAILED with
+            the error text, or TIMED_OUT with the deadline overrun
+        """
+        self.tasks = dict(enumerate(tasks))
+        pending = dict(self.tasks)
+        if not pending:
+            return
+        lanes = {MAIN_LANE: deque(pending), QUARANTINE_LANE: deque()}
+        stopping = False
+
+        try:
+            for _ in range(min(self.workers, len(pending))):
+                self._assign(self._start_worker(), lanes)
+
+            while pending:
+                now = time.monotonic()
+                for worker in list(self.pool.values()):
+                    # The sentinel and pipes of a dead worker stay open while
+                    # the pool processes it forked live on, so check it directly
+                    if not worker.proc.is_alive() and not worker.messages.poll():
+                        yield from self._fail(
+                            worker, lanes, pending, FAILED, self._exit_reason(worker)
+                        )
+                        continue
+                    reason = self._overrun(worker, now)
+                    if reason:
+                        yield from self._fail(worker, lanes, pending, TIMED_OUT, reason)
+
+                by_conn = {w.messages: w for w in self.pool.values()}
+                by_sentinel = {w.proc.sentinel: w for w in self.pool.values()}
+                ready = wait(list(by_conn) + list(by_sentinel), timeout=POLL_INTERVAL)
+                # Read the messages first: a worker may exit right after its last one
+                for conn in sorted(ready, key=lambda c: c in by_sentinel):
+                    worker = by_conn.get(conn) or by_sentinel[conn]
+                    if worker.id not in self.pool:
+                        continue
+                    if conn in by_sentinel:
+                        if worker.messages.poll():
+                            continue
+                        message = None
+                    else:
+                        try:
+                            message = conn.recv()
+                        except (EOFError, OSError):
+                            message = None
+                    if message is None:
+                        yield from self._fail(
+                            worker, lanes, pending, FAILED, self._exit_reason(worker)
+                        )
+                        continue
+
+                    kind, task_id, payload, retiring = message
+                    if kind == STAGE:
+                        worker.stage, worker.stage_started = payload, time.monotonic()
+                        continue
+                    if kind == RESULT:
+                        yield self.tasks[task_id], RESULT, payload
+                        continue
+                    worker.task = None
+                    if retiring:
+                        print(f"Log: Worker {worker.id} recycled after {retiring}")
+                        self.recycled += 1
+                        self._stop_worker(worker)
+                        if lanes[MAIN_LANE] or lanes[QUARANTINE_LANE]:
+                            worker = self._start_worker()
+                    if worker.id in self.pool:
+                        self._assign(worker, lanes)
+                    if pending.pop(task_id, None) is not None:
+                        yield self.tasks[task_id], kind, payload
+
+            stopping = True
+            for worker in self.pool.values():
+                worker.tasks.send(None)
+        finally:
+            for worker in list(self.pool.values()):
+                if stopping:
+                    worker.proc.join(timeout=30)
+                # Only workers that have not exited: a reaped worker's id may be reused
+                self._stop_worker(worker, kill=worker.proc.exitcode is None)
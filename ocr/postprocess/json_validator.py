@@ -30,6 +30,7 @@ import glob
 import re
 from rapidfuzz import process, fuzz
 from ..utilities.table_validator import column_validator, row_validator_with_correction
+from ..pipeline.result_model import write_records
 from typing import Dict, Tuple, List
 
 
@@ -218,14 +219,18 @@ if __name__ == "__main__":
         is_valid_text = True
         is_valid_table, is_partial_valid_table = True, True
 
-        with open(json_file_path, "r+") as f:
+        with open(json_file_path, "r") as f:
             cnt += 1
             json_data = json.load(f)
 
+            # Files are only rewritten when a correction changed them
+            modified = False
             for index, item in enumerate(json_data):
                 item_id = item["id"]
                 if item_id == "h-TABLE":
+                    table_before = [row[:] for row in item["content"]]
                     is_valid_table, is_partial_valid_table = validate_table(item)
+                    modified |= item["content"] != table_before
                 elif item_id != "E-AND_F":
                     is_valid, _ = validate_text(item)
                     if not is_valid:
@@ -239,6 +244,8 @@ if __name__ == "__main__":
                         ocr_state_id = json_data[index + 3]["content"][1]
                         corrected_ocr_city, corrected_ocr_state_id = correct_city_state(
                             ocr_city, ocr_state_id, reference_data, city_list, state_id_list)
+                        modified |= (corrected_ocr_city, corrected_ocr_state_id) != (
+                            ocr_city, ocr_state_id)
                         item["content"][1] = corrected_ocr_city
                         json_data[index + 3]["content"][1] = corrected_ocr_state_id
                     else:
@@ -251,9 +258,8 @@ if __name__ == "__main__":
             if not is_partial_valid_table:
                 partial_invalid_table_files.append(json_file)
 
-            f.seek(0)
-            json.dump(json_data, f, indent=2)
-            f.truncate()
+        if modified:
+            write_records(json_file_path, json_data)
 
     # Write validation summary
     summary = "Validation Summary\n"
@@ -0,0 +1,121 @@
+"""
+check_page_boxes.py
+
+Regression check for the crop box handling of `flatten_pdf.py` and `triage_alignment.py`. PDFs whose
+MediaBox does not start at (0, 0) are common in scanned and re-printed intake files; their page boxes
+are in different coordinate systems in PyMuPDF, and comparing them directly made triage tag every such
+file needs-flattening and made every such file fail to flatten.
+
+The check writes small synthetic PDFs (offset media box with and without a crop box, plain page with a
+crop box) and verifies that triage reports a crop box only where the file has one, that every file is
+flattened and shows its whole media box afterwards, and that triage with a missing layouts file records
+the error instead of raising. It exits with status 1 if any check fails.
+
+Usage (from the `ocr/` directory):
+
+    python3 -m preprocess.check_page_boxes
+"""
+
+import os
+import sys
+import tempfile
+
+import fitz
+
+from preprocess.flatten_pdf import flatten_folder, has_custom_cropbox
+from preprocess.triage_alignment import NEEDS_FLATTENING, structural_issues, triage_pdf
+
+# Name -> (MediaBox, CropBox or None) written as raw PDF arrays
+CASES = {
+    "offset_media.pdf": ("[50 50 662 842]", None),
+    "offset_media_cropped.pdf": ("[50 50 662 842]", "[60 100 600 800]"),
+    "cropped.pdf": ("[0 0 612 792]", "[10 20 500 700]"),
+}
+
+
+def write_case(path, media_box, crop_box):
+    """
+    Write a one-page PDF with the given raw page boxes.
+
+    Args:
+        path (str): Output path.
+        media_box (str): MediaBox array, e.g. "[50 50 662 842]".
+        crop_box (str): CropBox array, or None for no CropBox key.
+    """
+    doc = fitz.open()
+    page = doc.new_page(width=612, height=792)
+    page.insert_text((72, 72), "SECTION A - TYPE OF REPORT", fontsize=11)
+    doc.xref_set_key(page.xref, "MediaBox", media_box)
+    if crop_box:
+        doc.xref_set_key(page.xref, "CropBox", crop_box)
+    doc.save(path)
+    doc.close()
+
+
+def check_triage(input_dir):
+    """
+    Check the crop box reason of triage and its handling of a bad layouts path.
+
+    Args:
+        input_dir (str): Directory holding the synthetic cases.
+
+    Returns:
+        list: Problem descriptions, empty when the check passes.
+    """
+    problems = []
+    for name, (_, crop_box) in CASES.items():
+        doc = fitz.open(os.path.join(input_dir, name))
+        reported = any("crop box" in reason for reason in structural_issues(doc))
+        doc.close()
+        if reported != bool(crop_box):
+            expected = "a crop box" if crop_box else "no crop box"
+            problems.append(f"{name}: triage should report {expected}")
+
+    path = os.path.join(input_dir, next(iter(CASES)))
+    entry = triage_pdf(path, layouts_path=os.path.join(input_dir, "missing_layouts.yaml"))
+    if entry["status"] != NEEDS_FLATTENING or not entry["reasons"]:
+        problems.append(f"triage with a missing layouts file returned {entry}")
+    return problems
+
+
+def check_cases(work_dir):
+    """
+    Triage and flatten the synthetic cases and collect the problems found.
+
+    Args:
+        work_dir (str): Empty scratch directory.
+
+    Returns:
+        list: Problem descriptions, empty when the check passes.
+    """
+    input_dir = os.path.join(work_dir, "in")
+    output_dir = os.path.join(work_dir, "out")
+    os.makedirs(input_dir)
+    for name, (media_box, crop_box) in CASES.items():
+        write_case(os.path.join(input_dir, name), media_box, crop_box)
+
+    problems = check_triage(input_dir)
+    processed, _, failed = flatten_folder(
+        input_dir, output_dir, os.path.join(work_dir, "done.txt"), workers=1
+    )
+    if processed != len(CASES) or failed:
+        problems.append(f"flattened {processed} of {len(CASES)} files, {failed} failed")
+    for name in CASES:
+        out_path = os.path.join(output_dir, name)
+        if not os.path.exists(out_path):
+            continue
+        doc = fitz.open(out_path)
+        if has_custom_cropbox(doc[0]):
+            problems.append(f"{name}: crop box {doc[0].cropbox} still hides part of the media box")
+        doc.close()
+    return problems
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as work_dir:
+        problems = check_cases(work_dir)
+    for problem in problems:
+        print(f"FAIL: {problem}")
+    if problems:
+        sys.exit(1)
+    print(f"OK: {len(CASES)} page box cases triaged and flattened")
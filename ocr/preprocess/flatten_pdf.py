@@ -0,0 +1,234 @@
+"""
+flatten_pdf.py
+
+This script flattens PDF files in-process with PyMuPDF, replacing the Firefox-based `re_render_pdf.py`.
+It fixes the same visual misplacements (e.g., checkboxes/text of form fields not aligned with the form)
+by regenerating the appearance of every form field and baking widgets and annotations into the page
+content, so every renderer draws the page the way a browser prints it.
+
+Steps:
+1. Load all PDF files in a given input folder.
+2. For each page: refresh form field appearances, bake widgets and annotations into the page content,
+   reset the crop box to the media box and remove the page rotation.
+3. Save the flattened PDF to an output folder.
+4. Files are processed in a pool of worker processes. Finished files are appended to a checkpoint file
+   so an interrupted batch resumes where it stopped.
+
+With a routing manifest from `triage_alignment.py`, only the files it tagged `needs-flattening` are processed.
+"""
+
+import os
+import json
+import logging
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import fitz
+
+# ==========> Customize script params STARTs here <==========
+input_folder = "../../files/offset/"
+output_folder = "../../files/offset/output/"
+log_file = "flatten_pdf_logs.log"
+checkpoint_file = "flatten_pdf_done.txt"
+workers = os.cpu_count() or 1
+# Routing manifest from triage_alignment.py; when set, only the files tagged
+# "needs-flattening" are processed
+manifest_file = None
+# ==========> Customize script params ENDs here <==========
+
+
+def media_cropbox(page):
+    """
+    The page's media box in the coordinates of `page.cropbox` and `set_cropbox`.
+    `page.mediabox` is in PDF coordinates, which differ when the media box does
+    not start at (0, 0).
+
+    Args:
+        page (fitz.Page): Page to read.
+
+    Returns:
+        fitz.Rect: Crop box showing the whole media box.
+    """
+    media = page.mediabox
+    return fitz.Rect(media.x0, 0, media.x1, media.height)
+
+
+def has_custom_cropbox(page):
+    """
+    Args:
+        page (fitz.Page): Page to check.
+
+    Returns:
+        bool: Whether the crop box hides part of the media box.
+    """
+    return page.cropbox != media_cropbox(page)
+
+
+def normalize_page(page):
+    """
+    Make the visible area of a page its full media box and bring it upright.
+
+    Args:
+        page (fitz.Page): Page to normalize in place.
+    """
+    if has_custom_cropbox(page):
+        page.set_cropbox(media_cropbox(page))
+    if page.rotation:
+        page.remove_rotation()
+
+
+def refresh_widgets(page):
+    """
+    Regenerate the appearance stream of every form field from its value.
+    Stale or missing appearances are what makes field text drift away from the form.
+
+    Args:
+        page (fitz.Page): Page whose widgets are updated in place.
+    """
+    for widget in page.widgets():
+        try:
+            widget.update()
+        except Exception as e:
+            logging.warning(f"Could not refresh widget {widget.field_name}: {e}")
+
+
+def flatten_pdf(input_path, output_path):
+    """
+    Flatten one PDF and save it atomically.
+
+    Args:
+        input_path (str): Path of the source PDF.
+        output_path (str): Path of the flattened PDF.
+
+    Returns:
+        tuple: (file name, error message or None)
+    """
+    filename = os.path.basename(input_path)
+    tmp_path = output_path + ".part"
+    try:
+        doc = fitz.open(input_path)
+        if doc.needs_pass:
+            doc.close()
+            return filename, "encrypted"
+        for page in doc:
+            refresh_widgets(page)
+        # Turn widgets and annotations into ordinary page content
+        doc.bake(annots=True, widgets=True)
+        for page in doc:
+            normalize_page(page)
+        doc.save(tmp_path, garbage=3, deflate=True)
+        doc.close()
+        os.replace(tmp_path, output_path)
+        return filename, None
+    except Exception as e:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return filename, str(e)
+
+
+def load_checkpoint(path):
+    """
+    Read the names of the files finished by previous runs.
+
+    Args:
+        path (str): Path of the checkpoint file.
+
+    Returns:
+        set: File names already flattened.
+    """
+    if not os.path.exists(path):
+        return set()
+    with open(path, "r") as f:
+        return {line.strip() for line in f if line.strip()}
+
+
+def load_flatten_list(manifest_path):
+    """
+    Read the names of the files a routing manifest tags as needing flattening.
+
+    Args:
+        manifest_path (str): Path of the JSON manifest written by triage_alignment.py.
+
+    Returns:
+        set: File names to flatten.
+    """
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        entries = json.load(f)
+    return {entry["file"] for entry in entries if entry["status"] == "needs-flattening"}
+
+
+def flatten_folder(input_folder, output_folder, checkpoint_file, workers, manifest_file=None):
+    """
+    Flatten every PDF of a folder in a process pool, skipping checkpointed files.
+
+    Args:
+        input_folder (str): Folder holding the source PDFs.
+        output_folder (str): Folder receiving the flattened PDFs.
+        checkpoint_file (str): File listing the finished file names, one per line.
+        workers (int): Number of worker processes.
+        manifest_file (str): Optional routing manifest restricting the batch to
+            the files tagged "needs-flattening".
+
+    Returns:
+        tuple: (processed count, skipped count, failed count)
+    """
+    os.makedirs(output_folder, exist_ok=True)
+    pdf_files = sorted(f for f in os.listdir(input_folder) if f.lower().endswith(".pdf"))
+    if manifest_file:
+        to_flatten = load_flatten_list(manifest_file)
+        pdf_files = [f for f in pdf_files if f in to_flatten]
+    logging.info(f"Found {len(pdf_files)} PDF files for processing.")
+
+    done = load_checkpoint(checkpoint_file)
+    pending = [f for f in pdf_files if f not in done]
+    skipped_cnt = len(pdf_files) - len(pending)
+    logging.info(f"Skipping {skipped_cnt} files already listed in {checkpoint_file}")
+
+    processed_cnt = 0
+    failed_cnt = 0
+    # Only the parent process writes the checkpoint, one line per finished file
+    with open(checkpoint_file, "a") as checkpoint, ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(
+                flatten_pdf,
+                os.path.join(input_folder, f),
+                os.path.join(output_folder, f),
+            )
+            for f in pending
+        ]
+        for future in as_completed(futures):
+            filename, error = future.result()
+            if error is None:
+                processed_cnt += 1
+                checkpoint.write(filename + "\n")
+                checkpoint.flush()
+                logging.info(f"Saved flattened PDF: {os.path.join(output_folder, filename)}")
+            else:
+                failed_cnt += 1
+                logging.error(f"Error processing {filename}: {error}")
+            remaining = len(pending) - processed_cnt - failed_cnt
+            print(
+                f"{processed_cnt} files have been processed, {skipped_cnt} files have been skipped, "
+                f"{failed_cnt} files have failed, {remaining} files remained."
+            )
+    return processed_cnt, skipped_cnt, failed_cnt
+
+
+if __name__ == "__main__":
+    # Set up logging
+    logging.basicConfig(
+        filename=log_file,
+        level=logging.INFO,
+        format="%(asctime)s - %(levelname)s - %(message)s"
+    )
+    logging.info("=== Script started ===")
+
+    processed_cnt, skipped_cnt, failed_cnt = flatten_folder(
+        input_folder, output_folder, checkpoint_file, workers, manifest_file
+    )
+
+    # Final log summary
+    print("Batch processing complete!")
+    logging.info(f"Total files processed: {processed_cnt}")
+    logging.info(f"Total files skipped: {skipped_cnt}")
+    logging.info(f"Total files failed: {failed_cnt}")
+    logging.info("=== Script finished ===")
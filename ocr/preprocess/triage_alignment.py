@@ -0,0 +1,220 @@
+"""
+triage_alignment.py
+
+This script sorts PDFs by how well they line up with their expected form layout, so that only the broken
+fraction is sent to the flattening / re-render repair. The first page of each PDF is rendered as a
+low-resolution thumbnail cropped to its content bounds (the same normalization the pipeline applies),
+its form lines are measured against the cell rectangles of the matching layout YAML, and the document
+is tagged as:
+
+- aligned:            the form lines sit where the layout expects them
+- offset-correctable: the form is shifted or scaled; registration in pdf_to_cells fixes it
+- needs-flattening:   no layout fits the form lines, or the file carries form fields, annotations or
+                      page boxes/rotation that render inconsistently (see flatten_pdf.py)
+
+The routing manifest is a JSON list with one entry per file. `flatten_pdf.py` can read it to flatten
+only the documents tagged `needs-flattening`.
+
+Run from the `ocr/` directory:
+
+    python3 -m preprocess.triage_alignment <input_dir> [manifest.json] [--workers N]
+"""
+
+import os
+import json
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+import fitz
+
+from pipeline.classify_form import (
+    DEFAULT_LAYOUTS,
+    DEFAULT_SECTION_CONFIG,
+    classify_pdf,
+    load_layouts,
+    render_thumbnail,
+)
+from pipeline.registration import MIN_SCORE, fit_image_transform, is_negligible
+from preprocess.flatten_pdf import has_custom_cropbox
+from utilities.form_lines import LAYOUT_HEIGHT, LAYOUT_WIDTH
+from utilities.load_config import load_cell_coordination_config, load_section_config
+
+ALIGNED = "aligned"
+OFFSET_CORRECTABLE = "offset-correctable"
+NEEDS_FLATTENING = "needs-flattening"
+DEFAULT_MANIFEST = "alignment_manifest.json"
+LAYOUT_RECT = fitz.Rect(0, 0, LAYOUT_WIDTH, LAYOUT_HEIGHT)
+ALIGNED_TOLERANCE = 2.0  # Largest displacement in points still tagged aligned
+
+# Layouts and their cell configs, loaded once per worker process and config paths
+_layouts = {}
+
+
+def _get_layouts(layouts_path, section_config_path):
+    """
+    Load the known layouts and their cell configs once per process and paths.
+
+    Args:
+        layouts_path (str): Path to the layouts YAML.
+        section_config_path (str): Path to the section config YAML.
+
+    Returns:
+        tuple: (layouts from load_layouts, layout name -> (cell config, sections))
+    """
+    key = (layouts_path, section_config_path)
+    if key not in _layouts:
+        layouts = load_layouts(layouts_path, section_config_path)
+        key_maps = {
+            name: (
+                load_cell_coordination_config(layout["form_config"]),
+                load_section_config(section_config_path, layout["form_type"])[0],
+            )
+            for name, layout in layouts.items()
+        }
+        _layouts[key] = (layouts, key_maps)
+    return _layouts[key]
+
+
+def structural_issues(doc):
+    """
+    List the document features that render differently across viewers.
+
+    Args:
+        doc (fitz.Document): Open PDF.
+
+    Returns:
+        list: Human-readable reasons; empty when the file has none.
+    """
+    reasons = []
+    if doc.is_form_pdf:
+        reasons.append("form fields")
+    for page in doc:
+        if page.first_annot is not None:
+            reasons.append(f"annotations on page {page.number + 1}")
+            break
+    for page in doc:
+        if page.rotation:
+            reasons.append(f"rotated page {page.number + 1}")
+            break
+    for page in doc:
+        if has_custom_cropbox(page):
+            reasons.append(f"crop box differs from media box on page {page.number + 1}")
+            break
+    return reasons
+
+
+def triage_pdf(pdf_path, layouts_path=DEFAULT_LAYOUTS, section_config_path=DEFAULT_SECTION_CONFIG):
+    """
+    Tag one PDF as aligned, offset-correctable or needs-flattening.
+
+    Args:
+        pdf_path (str): Path of the PDF.
+        layouts_path (str): Path to the layouts YAML.
+        section_config_path (str): Path to the section config YAML.
+
+    Returns:
+        dict: Manifest entry with the file name, status, layout, fit score,
+            transform (sx, tx, sy, ty) in layout points and the reasons.
+    """
+    entry = {
+        "file": os.path.basename(pdf_path),
+        "status": NEEDS_FLATTENING,
+        "layout": None,
+        "score": None,
+        "transform": None,
+        "reasons": [],
+    }
+    try:
+        layouts, key_maps = _get_layouts(layouts_path, section_config_path)
+        layout_name, _ = classify_pdf(pdf_path, layouts)
+        doc = fitz.open(pdf_path)
+        entry["reasons"] = structural_issues(doc)
+        if layout_name is None:
+            entry["reasons"].append("no layout matches the form lines")
+            doc.close()
+            return entry
+
+        key_map, sections = key_maps[layout_name]
+        transform, score = fit_image_transform(render_thumbnail(doc[0]), key_map, sections)
+        doc.close()
+        entry["layout"] = layout_name
+        entry["score"] = round(score, 4)
+        entry["transform"] = [round(v, 4) for v in transform]
+        if score < MIN_SCORE:
+            entry["reasons"].append("form lines do not fit the layout")
+        if entry["reasons"]:
+            return entry
+        aligned = is_negligible(transform, LAYOUT_RECT, ALIGNED_TOLERANCE)
+        entry["status"] = ALIGNED if aligned else OFFSET_CORRECTABLE
+    except Exception as e:
+        entry["reasons"].append(f"error: {e}")
+    return entry
+
+
+def triage_folder(input_dir, manifest_path=DEFAULT_MANIFEST, workers=1):
+    """
+    Triage every PDF of a folder and write the routing manifest.
+
+    Args:
+        input_dir (str): Folder holding the PDFs.
+        manifest_path (str): Path of the JSON manifest to write.
+        workers (int): Number of worker processes.
+
+    Returns:
+        list: Manifest entries, sorted by file name.
+    """
+    pdf_files = sorted(f for f in os.listdir(input_dir) if f.lower().endswith(".pdf"))
+    paths = [os.path.join(input_dir, f) for f in pdf_files]
+    if workers > 1 and len(paths) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            entries = list(pool.map(triage_pdf, paths, chunksize=8))
+    else:
+        entries = [triage_pdf(path) for path in paths]
+
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump(entries, f, indent=4)
+    return entries
+
+
+def load_manifest(manifest_path, status=None):
+    """
+    Read a routing manifest.
+
+    Args:
+        manifest_path (str): Path of the JSON manifest.
+        status (str): Keep only the entries with this status (all when None).
+
+    Returns:
+        list: Manifest entries.
+    """
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        entries = json.load(f)
+    if status is None:
+        return entries
+    return [entry for entry in entries if entry["status"] == status]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Tag PDFs as aligned, offset-correctable or needs-flattening."
+    )
+    parser.add_argument("input_dir", help="Directory containing input PDF forms")
+    parser.add_argument(
+        "manifest",
+        nargs="?",
+        default=DEFAULT_MANIFEST,
+        help=f"Path of the routing manifest (default: {DEFAULT_MANIFEST})",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Worker processes (default: number of CPUs)",
+    )
+    args = parser.parse_args()
+
+    entries = triage_folder(args.input_dir, args.manifest, args.workers)
+    for status in (ALIGNED, OFFSET_CORRECTABLE, NEEDS_FLATTENING):
+        count = sum(1 for entry in entries if entry["status"] == status)
+        print(f"{status}: {count}")
+    print(f"Manifest written to {args.manifest}")
@@ -1,28 +1,57 @@
 """
 Script to run OCR pipeline on PDF forms in a directory.
 Processes each PDF by splitting pages, extracting table cells, and extracting contents,
-then outputs results as JSON files.
+then outputs results as JSON files. Scanned forms delivered as TIFF/PNG/JPEG files are
+streamed frame by frame through the same stages without being converted to PDF.
 """
 
+import glob
+import json
 import os
 import shutil
 import argparse
+from functools import partial
 
 from doctr.models import ocr_predictor
 
-from pipeline.split_pages import process_pdf
-from pipeline.pdf_to_cells import pdf_to_cells
+from pipeline.split_pages import process_pdf, split_image_pages
+from pipeline.pdf_to_cells import pdf_to_cells, raster_to_cells
+from pipeline.image_input import INPUT_EXTENSIONS, is_image_file
 from pipeline.cells_to_contents import extract_contents
 from utilities.dir_helper import create_dir_if_not_exists, get_files_in_directory
 from utilities.load_config import load_table_config, load_section_config
+from pipeline.classify_form import DEFAULT_LAYOUTS, classify_pdf, load_layouts
+from pipeline.registration import IDENTITY
+from logger.logger import flush_logs, resource_usage
+from utilities.memory_profile import MemoryTracker
+from pipeline.supervisor import (
+    DONE,
+    MAX_DOCS_PER_WORKER,
+    MAX_WORKER_RSS_MB,
+    RESULT,
+    STAGE,
+    WorkerSupervisor,
+    start_method,
+)
+from storage.parquet_sink import ResultDataset, new_run_id
+from storage.sqlite_store import SqliteStore
+from storage.tensor_store import TensorStore
+
+AUTO_FORM_TYPE = "auto"
+FAILED_DOCUMENTS_FILE = "failed_documents.json"  # Written to the log directory by supervised runs
+# Page numbers to process per form type
+PAGE_NUMS = {
+    "eeo1": [0],
+    "eeo5": [0, 1],
+}
 
 def parse_args():
     parser = argparse.ArgumentParser(
-        description="Run OCR over all PDFs in a directory."
+        description="Run OCR over all PDFs and image scans in a directory."
     )
     parser.add_argument(
         "input_dir",
-        help="Directory containing input PDF forms"
+        help="Directory containing input PDF forms or TIFF/PNG/JPEG scans"
     )
     parser.add_argument(
         "output_dir",
@@ -34,20 +63,22 @@ def parse_args():
     parser.add_argument(
         "form_type",
         help=(
-            "Directory to store result JSON files "
-            "(default: INPUT_DIR/results)"
+            "Form type: 'eeo1', 'eeo5', or 'auto' to classify each document "
+            "against config/layouts.yaml"
         )
     )
     parser.add_argument(
         "form_config",
+        nargs="?",
         help=(
-            "Path to the form configuration file "
+            "Path to the form configuration file (omitted with 'auto')"
         )
     )
     parser.add_argument(
         "checkbox_config",
+        nargs="?",
         help=(
-            "Path to the checkbox configuration file "
+            "Path to the checkbox configuration file (omitted with 'auto')"
         )
     )
     parser.add_argument(
@@ -58,10 +89,129 @@ def parse_args():
             "Path to the directory of the log "
         )
     )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count() or 1,
+        help=(
+            "Worker processes used to split large multi-page PDFs, shared by "
+            "the --pipeline-workers (default: number of CPUs)"
+        )
+    )
+    parser.add_argument(
+        "--compact-json",
+        action="store_true",
+        help=(
+            "Write result JSON files without indentation"
+        )
+    )
+    parser.add_argument(
+        "--parquet-dir",
+        help=(
+            "Also write the results to a Parquet dataset under this directory, "
+            "partitioned by form type and run (requires pyarrow)"
+        )
+    )
+    parser.add_argument(
+        "--sqlite-db",
+        help=(
+            "Also record document metadata, validation flags and confidence "
+            "summaries in this SQLite store (query it with storage.sqlite_store)"
+        )
+    )
+    parser.add_argument(
+        "--tensor-dir",
+        help=(
+            "Also append every table to the memory-mapped table store under "
+            "this directory (corpus QA with storage.tensor_store)"
+        )
+    )
+    parser.add_argument(
+        "--run-id",
+        help=(
+            "Run id of the Parquet and SQLite records "
+            "(default: current UTC time and a random suffix)"
+        )
+    )
+    parser.add_argument(
+        "--memory-report",
+        help=(
+            "Write RSS deltas per document and stage, and the documents whose "
+            "memory is not released, to this JSON file"
+        )
+    )
+    parser.add_argument(
+        "--trace-memory",
+        action="store_true",
+        help=(
+            "Also trace Python allocations with tracemalloc for the memory "
+            "report (slower)"
+        )
+    )
+    parser.add_argument(
+        "--pipeline-workers",
+        type=int,
+        default=0,
+        help=(
+            "Process documents in this many worker processes, recycled after "
+            "--max-docs-per-worker documents or --max-worker-rss-mb of memory "
+            "(default: 0, in this process)"
+        )
+    )
+    parser.add_argument(
+        "--max-docs-per-worker",
+        type=int,
+        default=MAX_DOCS_PER_WORKER,
+        help=f"Documents a worker processes before it is replaced (default: {MAX_DOCS_PER_WORKER})"
+    )
+    parser.add_argument(
+        "--max-worker-rss-mb",
+        type=float,
+        default=MAX_WORKER_RSS_MB,
+        help=(
+            "Resident memory in MB after which a worker is replaced once its "
+            f"document is done (default: {MAX_WORKER_RSS_MB})"
+        )
+    )
+    parser.add_argument(
+        "--document-timeout",
+        type=float,
+        help=(
+            "Seconds a document may take before its worker is killed and the "
+            "document moves to the quarantine lane (implies --pipeline-workers 1)"
+        )
+    )
+    parser.add_argument(
+        "--stage-timeout",
+        type=float,
+        help=(
+            "Seconds a stage of a document may take, enforced like "
+            "--document-timeout"
+        )
+    )
+    parser.add_argument(
+        "--layouts",
+        default=DEFAULT_LAYOUTS,
+        help=(
+            "Known layouts used with form_type 'auto' "
+            f"(default: {DEFAULT_LAYOUTS})"
+        )
+    )
     args = parser.parse_args()
 
-    # Look for any arguments that ended up as None
-    missing = [name for name, val in vars(args).items() if val is None]
+    if args.form_type == AUTO_FORM_TYPE:
+        # With 'auto' the configs come from the layouts file, so a single
+        # trailing positional is the log directory
+        if args.checkbox_config is not None:
+            parser.error("form_config and checkbox_config are not used with 'auto'")
+        if args.form_config is not None:
+            args.log_dir = args.form_config
+        args.form_config = args.checkbox_config = ""
+
+    # Look for any positional arguments that ended up as None; options
+    # default to None when they are not given
+    positionals = [action.dest for action in parser._actions if not action.option_strings]
+    missing = [name for name in positionals if getattr(args, name) is None]
     if missing:
         parser.error(f"Missing required arguments: {', '.join(missing)}")
 
@@ -69,8 +219,336 @@ def parse_args():
     if args.output_dir is None:
         args.output_dir = os.path.join(args.input_dir, "results")
 
+    # Deadlines are enforced by the worker supervisor
+    if (args.document_timeout or args.stage_timeout) and args.pipeline_workers <= 0:
+        args.pipeline_workers = 1
+
     return args
 
+
+def build_route(form_type, form_config, checkbox_config, table_config_path, section_config_path):
+    """
+    Collect everything the per-document flow needs for one form layout.
+
+    :param form_type: 'eeo1' or 'eeo5'
+    :param form_config: Path to the form configuration file
+    :param checkbox_config: Path to the checkbox configuration file
+    :param table_config_path: Path to the table configuration file
+    :param section_config_path: Path to the section configuration file
+    :return: Dict with the form type, config paths, loaded table/section
+        configs and the page numbers to process
+    """
+    if form_type not in PAGE_NUMS:
+        raise Exception(f"Invalid FORM_TYPE: {form_type}")
+    return {
+        "form_type": form_type,
+        "form_config": form_config,
+        "checkbox_config": checkbox_config,
+        "table_config": load_table_config(table_config_path, form_type),
+        "section_config": load_section_config(section_config_path, form_type),
+        "page_nums": PAGE_NUMS[form_type],
+    }
+
+
+def process_document(
+    pdf_path,
+    route,
+    predictor,
+    res_dir,
+    log_dir,
+    workers,
+    compact_json=False,
+    sinks=(),
+    memory=None,
+    tmp_dir=None,
+):
+    """
+    Run split, cell extraction and content extraction for one PDF.
+
+    :param pdf_path: Path to the input PDF
+    :param route: Layout route from build_route
+    :param predictor: DocTR OCR predictor
+    :param res_dir: Directory of the result JSON files
+    :param log_dir: Directory of the logs
+    :param workers: Worker processes used to split large multi-page PDFs
+    :param compact_json: Write result JSON files without indentation
+    :param sinks: Result sinks (ResultDataset, SqliteStore, TensorStore)
+        receiving each result
+    :param memory: MemoryTracker measuring the input file and each form
+    :param tmp_dir: Directory of the intermediate files (default: a tmp
+        directory next to the input)
+    """
+    memory = memory or MemoryTracker()
+    form_type = route["form_type"]
+    form_config = route["form_config"]
+    # Temporary directory for intermediate PDF pages
+    pdf_tmp_path = tmp_dir or os.path.join(os.path.dirname(pdf_path), "tmp")
+
+    # Split the PDF into individual pages and perform initial OCR
+    with memory.document(os.path.basename(pdf_path)), memory.stage("split_pages"):
+        process_pdf(
+            form_type,
+            pdf_path,
+            form_config,
+            predictor,
+            log_dir=log_dir,
+            workers=workers,
+            output_dir=pdf_tmp_path,
+        )
+
+    # Iterate over the generated page PDFs
+    inner_pdf_files = get_files_in_directory(pdf_tmp_path)
+    for inner_pdf_file in inner_pdf_files:
+        cur_pdf_path = os.path.join(pdf_tmp_path, inner_pdf_file)
+        with memory.document(os.path.splitext(inner_pdf_file)[0]):
+            # Convert PDF pages to table cells
+            page_rasters = {}
+            with memory.stage("pdf_to_cells"):
+                transforms = pdf_to_cells(
+                    cur_pdf_path,
+                    form_config,
+                    route["section_config"],
+                    route["page_nums"],
+                    log_dir=log_dir,
+                    page_rasters=page_rasters,
+                )
+
+            # Directory containing cell images
+            cell_path = os.path.join(pdf_tmp_path, "cells")
+            # Extract contents from cells and generate results
+            with memory.stage("cells_to_contents"):
+                result = extract_contents(
+                    form_type,
+                    pdf_tmp_path,
+                    cell_path,
+                    route["checkbox_config"],
+                    res_dir,
+                    predictor,
+                    route["table_config"],
+                    log_dir=log_dir,
+                    page_transform=transforms.get(0, IDENTITY),
+                    checkbox_raster=page_rasters.get(0),
+                    compact_json=compact_json,
+                )
+        if result is not None:
+            for sink in sinks:
+                sink.append(form_type, route["table_config"], result, os.path.basename(pdf_path))
+
+    # Clean up temporary directory for next PDF
+    shutil.rmtree(pdf_tmp_path)
+    os.makedirs(pdf_tmp_path, exist_ok=True)
+
+
+def process_image_document(
+    image_path,
+    route,
+    predictor,
+    res_dir,
+    log_dir,
+    compact_json=False,
+    sinks=(),
+    memory=None,
+    tmp_dir=None,
+):
+    """
+    Run split, cell extraction and content extraction for one image scan.
+    Pages are decoded and cropped one form at a time; only the cell PDFs
+    are written to disk.
+
+    :param image_path: Path to the input TIFF/PNG/JPEG file
+    :param route: Layout route from build_route
+    :param predictor: DocTR OCR predictor
+    :param res_dir: Directory of the result JSON files
+    :param log_dir: Directory of the logs
+    :param compact_json: Write result JSON files without indentation
+    :param sinks: Result sinks (ResultDataset, SqliteStore, TensorStore)
+        receiving each result
+    :param memory: MemoryTracker measuring each form; frames are decoded and
+        cropped between forms, outside of the measured stages
+    :param tmp_dir: Directory of the intermediate files (default: a tmp
+        directory next to the input)
+    """
+    memory = memory or MemoryTracker()
+    form_type = route["form_type"]
+    form_config = route["form_config"]
+    tmp_path = tmp_dir or os.path.join(os.path.dirname(image_path), "tmp")
+    cell_path = os.path.join(tmp_path, "cells")
+
+    for name, rasters in split_image_pages(
+        form_type,
+        image_path,
+        form_config,
+        predictor,
+        route["page_nums"],
+        log_dir=log_dir,
+    ):
+        with memory.document(name):
+            # Convert page rasters to table cells
+            with memory.stage("raster_to_cells"):
+                transforms = raster_to_cells(
+                    name,
+                    rasters,
+                    form_config,
+                    route["section_config"],
+                    cell_path,
+                    log_dir=log_dir,
+                )
+
+            # Extract contents from cells and generate results
+            with memory.stage("cells_to_contents"):
+                result = extract_contents(
+                    form_type,
+                    tmp_path,
+                    cell_path,
+                    route["checkbox_config"],
+                    res_dir,
+                    predictor,
+                    route["table_config"],
+                    log_dir=log_dir,
+                    page_transform=transforms.get(0, IDENTITY),
+                    checkbox_raster=rasters[0],
+                    compact_json=compact_json,
+                )
+            # Release this form's rasters before the next frames are decoded
+            del rasters
+        if result is not None:
+            for sink in sinks:
+                sink.append(form_type, route["table_config"], result, os.path.basename(image_path))
+
+    # Clean up temporary directory for next file
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path, exist_ok=True)
+
+
+def load_predictor():
+    """
+    Initialize the OCR predictor with specified architectures.
+    Orientation is estimated and corrected once per page while cropping
+    (see pipeline/orientation.py), so the per-cell estimate is disabled.
+
+    :return: DocTR OCR predictor
+    """
+    return ocr_predictor(
+        det_arch="fast_base",
+        reco_arch="crnn_mobilenet_v3_large",
+        pretrained=True,
+        assume_straight_pages=True,
+        detect_orientation=False,
+        straighten_pages=False,
+    )
+
+
+class ForwardedResults:
+    """
+    Result sink of a worker process: sends the sink arguments of each result
+    to the supervisor as soon as it is done, so the main process appends it
+    to the real sinks even if a later form of the document hangs.
+
+    :param report: Report function passed by the supervisor
+    """
+
+    def __init__(self, report):
+        self.report = report
+
+    def append(self, form_type, table_config, result, source=None):
+        self.report(RESULT, (form_type, table_config, result, source))
+
+
+def init_worker(worker_id, input_dir, workers, trace_memory, predictor=None):
+    """
+    Prepare a pipeline worker process.
+
+    :param worker_id: Worker number from the supervisor
+    :param input_dir: Input directory; the worker's intermediate files go to
+        its own directory under INPUT_DIR/tmp
+    :param workers: Worker processes running at the same time, sharing the CPUs
+    :param trace_memory: Trace Python allocations for the memory report
+    :param predictor: Predictor inherited from the parent, loaded here if None
+    :return: Worker state passed to run_worker_task
+    """
+    import torch
+
+    torch.set_num_threads(max(1, (os.cpu_count() or 1) // workers))
+    return {
+        "predictor": predictor if predictor is not None else load_predictor(),
+        "tmp_dir": os.path.join(input_dir, "tmp", f"worker-{worker_id}"),
+        "memory": MemoryTracker(trace=trace_memory),
+    }
+
+
+def run_worker_task(state, task, report):
+    """
+    Process one document in a worker process.
+
+    :param state: Worker state from init_worker
+    :param task: (path, route, res_dir, log_dir, split workers, compact_json)
+    :param report: Sends stages and results to the supervisor
+    :return: Memory records of the document
+    """
+    path, route, res_dir, log_dir, split_workers, compact_json = task
+    results = ForwardedResults(report)
+    memory = state["memory"]
+    # Each stage start restarts the supervisor's stage deadline
+    memory.on_stage = lambda document, stage: report(STAGE, f"{document}/{stage}")
+    try:
+        if is_image_file(path):
+            process_image_document(
+                path,
+                route,
+                state["predictor"],
+                res_dir,
+                log_dir,
+                compact_json,
+                [results],
+                memory,
+                state["tmp_dir"],
+            )
+        else:
+            process_document(
+                path,
+                route,
+                state["predictor"],
+                res_dir,
+                log_dir,
+                split_workers,
+                compact_json,
+                [results],
+                memory,
+                state["tmp_dir"],
+            )
+    finally:
+        # A recycled worker exits without running atexit handlers
+        flush_logs()
+    records, memory.documents = memory.documents, []
+    return records
+
+
+def document_routes(input_dir, files, form_type, routes=None, layouts=None, fixed_route=None):
+    """
+    Pick the layout route of every input file, classifying them with 'auto'.
+
+    :param input_dir: Input directory
+    :param files: Input file names
+    :param form_type: 'eeo1', 'eeo5' or 'auto'
+    :param routes: Routes by layout name, with 'auto'
+    :param layouts: Known layouts, with 'auto'
+    :param fixed_route: Route of every file otherwise
+    :return: Iterator of (path, route); unknown layouts are skipped
+    """
+    for pdf_file in files:
+        pdf_path = os.path.join(input_dir, pdf_file)
+        if form_type == AUTO_FORM_TYPE:
+            layout_name, scores = classify_pdf(pdf_path, layouts)
+            score_str = ", ".join(f"{name}={score:.2f}" for name, score in scores.items())
+            if layout_name is None:
+                print(f"Error: No known layout matches {pdf_file} ({score_str}), skipping.")
+                continue
+            print(f"Log: {pdf_file} classified as {layout_name} ({score_str})")
+            yield pdf_path, routes[layout_name]
+        else:
+            yield pdf_path, fixed_route
+
+
 def main():
     """
     Main function to initialize OCR predictor and process all PDFs.
@@ -84,19 +562,11 @@ def main():
     if res_dir == "":
         res_dir = os.path.join(input_dir, "results")
 
-    # Choose form type: EEO-1 or EEO-5
+    # Choose form type: EEO-1, EEO-5, or auto to classify each document
     FORM_TYPE = args.form_type
     
     form_config = args.form_config
     checkbox_config = args.checkbox_config
-
-    # Load specific form and checkbox configs based on form type
-    if FORM_TYPE == "eeo1":
-        PAGE_NUM_LS = [0]  # Page number to process for EEO-1
-    elif FORM_TYPE == "eeo5":
-        PAGE_NUM_LS = [0, 1]  # Page number to process for EEO-5
-    else:
-        raise Exception(f"Invalid FORM_TYPE: {FORM_TYPE}")
     
     # ===================================> User Input Ends <===================================
 
@@ -104,58 +574,164 @@ def main():
     table_config_path = "config/table_config.yaml"
     section_config_path = "config/section_config.yaml"
 
-    # Initialize the OCR predictor with specified architectures
-    predictor = ocr_predictor(
-        det_arch="fast_base",
-        reco_arch="crnn_mobilenet_v3_large",
-        pretrained=True,
-        assume_straight_pages=True,
-        detect_orientation=True,
-        straighten_pages=False,
-    )
+    # Resolve the layout routes up front so a bad form type fails before
+    # the OCR models are loaded
+    if FORM_TYPE == AUTO_FORM_TYPE:
+        layouts = load_layouts(args.layouts, section_config_path)
+        routes = {
+            name: build_route(
+                layout["form_type"],
+                layout["form_config"],
+                layout["checkbox_config"],
+                table_config_path,
+                section_config_path,
+            )
+            for name, layout in layouts.items()
+        }
+    else:
+        fixed_route = build_route(
+            FORM_TYPE, form_config, checkbox_config, table_config_path, section_config_path
+        )
 
-    # Create result directory if it doesn't exist
-    create_dir_if_not_exists(res_dir)
+    # Optional result sinks, written in batches next to the JSON files
+    run_id = args.run_id or new_run_id()
+    sinks = []
+    if args.parquet_dir:
+        sinks.append(ResultDataset(args.parquet_dir, run_id))
+        print(f"Log: Writing Parquet dataset run {run_id} to {args.parquet_dir}")
+    if args.sqlite_db:
+        sinks.append(SqliteStore(args.sqlite_db, run_id, res_dir))
+        print(f"Log: Recording run {run_id} in {args.sqlite_db}")
+    if args.tensor_dir:
+        sinks.append(TensorStore(args.tensor_dir))
+        print(f"Log: Appending tables to {args.tensor_dir}")
 
-    # Load table and section configurations
-    table_config = load_table_config(table_config_path, FORM_TYPE)
-    section_config = load_section_config(section_config_path, FORM_TYPE)
+    # Load the OCR predictor once; forked workers inherit it
+    if args.pipeline_workers <= 0 or start_method() == "fork":
+        predictor = load_predictor()
+    else:
+        predictor = None
 
-    # Get list of PDF files from input directory
-    pdf_files = get_files_in_directory(input_dir)
+    # Create result directory if it doesn't exist
+    create_dir_if_not_exists(res_dir)
 
-    # Process each PDF file
-    for pdf_file in pdf_files:
-        pdf_path = os.path.join(input_dir, pdf_file)
-        # Split the PDF into individual pages and perform initial OCR
-        process_pdf(FORM_TYPE, pdf_path, form_config, predictor, log_dir=args.log_dir)
+    # Memory accounting per document and stage
+    memory = MemoryTracker(trace=args.trace_memory)
 
-        # Temporary directory for intermediate PDF pages
-        pdf_tmp_path = os.path.join(input_dir, "tmp")
+    # Get list of PDF and image files from input directory
+    pdf_files = get_files_in_directory(input_dir, INPUT_EXTENSIONS)
 
-        # Iterate over the generated page PDFs
-        inner_pdf_files = get_files_in_directory(pdf_tmp_path)
-        for inner_pdf_file in inner_pdf_files:
-            cur_pdf_path = os.path.join(pdf_tmp_path, inner_pdf_file)
-            # Convert PDF pages to table cells
-            pdf_to_cells(cur_pdf_path, form_config, section_config, PAGE_NUM_LS, log_dir=args.log_dir)
+    if FORM_TYPE == AUTO_FORM_TYPE:
+        inputs = document_routes(input_dir, pdf_files, FORM_TYPE, routes=routes, layouts=layouts)
+    else:
+        inputs = document_routes(input_dir, pdf_files, FORM_TYPE, fixed_route=fixed_route)
 
-            # Directory containing cell images
-            cell_path = os.path.join(pdf_tmp_path, "cells")
-            # Extract contents from cells and generate results
-            extract_contents(
-                FORM_TYPE,
-                pdf_tmp_path,
-                cell_path,
-                checkbox_config,
-                res_dir,
-                predictor,
-                table_config,
+    # Process each PDF file
+    try:
+        if args.pipeline_workers > 0:
+            supervisor = WorkerSupervisor(
+                args.pipeline_workers,
+                partial(
+                    init_worker,
+                    input_dir=input_dir,
+                    workers=args.pipeline_workers,
+                    trace_memory=args.trace_memory,
+                    predictor=predictor,
+                ),
+                run_worker_task,
+                max_docs=args.max_docs_per_worker,
+                max_rss_mb=args.max_worker_rss_mb,
+                document_timeout=args.document_timeout,
+                stage_timeout=args.stage_timeout,
+            )
+            # The split pools of all workers share the --workers budget, as
+            # init_worker shares the torch threads, so the CPU is not oversubscribed
+            split_workers = max(1, args.workers // args.pipeline_workers)
+            tasks = [
+                (pdf_path, route, res_dir, args.log_dir, split_workers, args.compact_json)
+                for pdf_path, route in inputs
+            ]
+            # Forms recorded per input until it is done: a quarantined retry
+            # skips the forms of the killed attempt, a failed input lists them
+            recorded = {}
+            failed = []
+            for task, status, value in supervisor.run(tasks):
+                pdf_path = task[0]
+                if status == RESULT:
+                    forms = recorded.setdefault(pdf_path, [])
+                    if value[2].name in forms:
+                        continue
+                    for sink in sinks:
+                        sink.append(*value)
+                    forms.append(value[2].name)
+                elif status == DONE:
+                    recorded.pop(pdf_path, None)
+                    memory.documents.extend(value)
+                else:
+                    print(f"Error: {os.path.basename(pdf_path)} {status}:\n{value}")
+                    failed.append(
+                        {
+                            "document": pdf_path,
+                            "status": status,
+                            "reason": value,
+                            "partial_results": recorded.pop(pdf_path, []),
+                        }
+                    )
+            print(
+                f"Log: {supervisor.recycled} workers recycled, "
+                f"{supervisor.quarantined} documents quarantined, {len(failed)} failed"
             )
+            if failed:
+                create_dir_if_not_exists(args.log_dir)
+                failed_path = os.path.join(args.log_dir, FAILED_DOCUMENTS_FILE)
+                with open(failed_path, "w") as f:
+                    json.dump(failed, f, indent=2)
+                print(f"Log: Failed documents and their partial results listed in {failed_path}")
+            for worker_dir in glob.glob(os.path.join(input_dir, "tmp", "worker-*")):
+                shutil.rmtree(worker_dir, ignore_errors=True)
 
-        # Clean up temporary directory for next PDF
-        shutil.rmtree(pdf_tmp_path)
-        os.makedirs(pdf_tmp_path, exist_ok=True)
+        else:
+            for pdf_path, route in inputs:
+                if is_image_file(pdf_path):
+                    process_image_document(
+                        pdf_path,
+                        route,
+                        predictor,
+                        res_dir,
+                        args.log_dir,
+                        args.compact_json,
+                        sinks,
+                        memory,
+                    )
+                else:
+                    process_document(
+                        pdf_path,
+                        route,
+                        predictor,
+                        res_dir,
+                        args.log_dir,
+                        args.workers,
+                        args.compact_json,
+                        sinks,
+                        memory,
+                    )
+    finally:
+        # Write the rows still buffered, also when a document failed
+        for sink in sinks:
+            sink.close()
+        if args.memory_report:
+            report = memory.write_report(args.memory_report)
+            print(
+                f"Log: Memory report written to {args.memory_report}: "
+                f"{len(report['flagged'])} of {report['documents']} documents retained "
+                f"more than {report['leak_threshold_mb']} MB"
+            )
+        usage = resource_usage()
+        print(
+            f"Log: Run finished with {usage['open_fds']} open file descriptors, "
+            f"peak memory {usage['max_rss_mb']} MB, {usage['open_logs']} log files open "
+            f"({usage['opened_logs']} opened, {usage['evicted_logs']} closed by the LRU cap)"
+        )
 
 
 if __name__ == "__main__":
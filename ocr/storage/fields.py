@@ -0,0 +1,144 @@
+"""
+Module: fields.py
+
+Document-level metadata read from a DocumentResult, shared by the result
+sinks. Values follow the postprocess filters: the recognized text of a
+field is its second OCR line (the first one is the printed label).
+"""
+
+import re
+from typing import Dict, List, Optional, Tuple
+
+from pipeline.result_model import CheckboxEntry, DocumentResult, TextEntry
+
+# Text field holding the reporting year, per form type
+YEAR_FIELDS = {
+    "eeo1": "h-CURRENT_YEAR_REPORTING_TOTAL_LABEL",
+    "eeo5": "title-OE_NUM_AND_YEAR",
+}
+# Result field id of each metadata column, per form type
+METADATA_FIELDS = {
+    "eeo1": {
+        "report_type": "a-TYPE_OF_REPORT",
+        "employer_name": "b-EMPLOYER",
+        "city": "b-CITY_TOWN",
+        "state": "b-STATE",
+        "zipcode": "b-ZIPCODE",
+        "hq_city": "c-CITY_TOWN",
+        "hq_state": "c-STATE",
+        "hq_zipcode": "c-ZIP_STATE",
+        "ein": "d-EIN",
+        "naics": "g-NAICS",
+    },
+    "eeo5": {
+        "employer_name": "b-NAME",
+        "city": "b-CITY",
+        "state": "b-STATE",
+        "zipcode": "b-ZIPCODE",
+    },
+}
+# Checkbox entry holding the type of report, for forms without a text field
+REPORT_TYPE_CHECKBOXES = {"eeo5": "a"}
+YEAR_PATTERN = re.compile(r"\b(?:19|20)\d{2}\b")
+PAGE_PATTERN = re.compile(r"_page(\d+)")
+DIGITS_PATTERN = re.compile(r"\d+")
+
+
+def reporting_year(lines: List[str]) -> Optional[int]:
+    """
+    :param lines: OCR lines of the year field
+    :return: First plausible year in the lines, or None
+    """
+    match = YEAR_PATTERN.search(" ".join(lines))
+    return int(match.group()) if match else None
+
+
+def page_number(name: str) -> Optional[int]:
+    """
+    :param name: Result name, e.g. 'filing_page3_cropped'
+    :return: Page number of the form within its input, or None
+    """
+    match = PAGE_PATTERN.search(name)
+    return int(match.group(1)) if match else None
+
+
+def extracted_text(lines: List[str]) -> Optional[str]:
+    """
+    :param lines: OCR lines of a text field
+    :return: Recognized value (second line), stripped, or None if empty
+    """
+    if len(lines) > 1 and lines[1].strip():
+        return lines[1].strip()
+    return None
+
+
+def metadata_columns(form_type: str) -> List[str]:
+    """
+    :param form_type: 'eeo1' or 'eeo5'
+    :return: Text metadata columns of document_metadata (all but reporting_year)
+    """
+    return ["report_type"] + [c for c in METADATA_FIELDS.get(form_type, {}) if c != "report_type"]
+
+
+def document_metadata(form_type: str, result: DocumentResult) -> Dict:
+    """
+    Read the typed metadata of a document. EIN keeps its digits only, NAICS
+    its first number, ZIP codes their first five digits, and states are
+    upper-cased, so they can be matched exactly.
+
+    :param form_type: 'eeo1' or 'eeo5'
+    :param result: Document result from extract_contents
+    :return: Dict with report_type, reporting_year and every column of
+        METADATA_FIELDS[form_type]; unreadable values are None
+    """
+    ids = METADATA_FIELDS.get(form_type, {})
+    by_id = {}
+    metadata = {column: None for column in ids}
+    metadata["report_type"] = metadata["reporting_year"] = None
+    for entry in result.entries:
+        if isinstance(entry, TextEntry):
+            by_id[entry.id] = entry.content
+        elif isinstance(entry, CheckboxEntry) and entry.id == REPORT_TYPE_CHECKBOXES.get(form_type):
+            checked = [name for name, value in entry.content.items() if value]
+            metadata["report_type"] = ", ".join(checked) or None
+
+    for column, field_id in ids.items():
+        if field_id in by_id:
+            metadata[column] = extracted_text(by_id[field_id])
+    if YEAR_FIELDS.get(form_type) in by_id:
+        metadata["reporting_year"] = reporting_year(by_id[YEAR_FIELDS[form_type]])
+
+    if metadata.get("ein"):
+        metadata["ein"] = "".join(DIGITS_PATTERN.findall(metadata["ein"])) or None
+    if metadata.get("naics"):
+        match = DIGITS_PATTERN.search(metadata["naics"])
+        metadata["naics"] = match.group() if match else None
+    for column in ("zipcode", "hq_zipcode"):
+        if metadata.get(column):
+            digits = "".join(DIGITS_PATTERN.findall(metadata[column]))
+            metadata[column] = digits[:5] or None
+    for column in ("state", "hq_state"):
+        if metadata.get(column):
+            metadata[column] = metadata[column].upper()
+    return metadata
+
+
+def table_columns(form_type: str, table_config) -> Dict[str, Tuple[str, Tuple[int, int]]]:
+    """
+    Map the table entry ids of a form type to their column name and shape.
+
+    :param form_type: 'eeo1' or 'eeo5'
+    :param table_config: Table configuration of the form type
+    :return: Dict of entry id -> (column name, (rows, cols))
+    """
+    if form_type == "eeo1":
+        return {"h-TABLE": ("table", tuple(table_config))}
+    if form_type == "eeo5":
+        cols = table_config["a1"][1]
+        rows_a = sum(table_config[part][0] for part in ("a1", "a2", "a3"))
+        return {
+            "table-A": ("table_a", (rows_a, cols)),
+            "table-B": ("table_b", tuple(table_config["b"])),
+            "table-C": ("table_c", tuple(table_config["c"])),
+        }
+    raise Exception(f"Invalid FORM_TYPE: {form_type}")
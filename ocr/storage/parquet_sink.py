@@ -0,0 +1,304 @@
+"""
+Module: parquet_sink.py
+
+Partitioned Parquet dataset of OCR results, written alongside the
+per-document JSON files so downstream steps can load a whole batch in one
+vectorized read instead of parsing one JSON file at a time.
+
+Files are laid out with Hive partitioning by form type and run:
+
+    <root>/form_type=<form_type>/run=<run_id>/part-<pid>-<seq>.parquet
+
+Each row holds one document:
+- document, source: result name and input file name
+- page: page number of the form within its input (from the result name)
+- reporting_year: year found in the form's year field, null if unreadable
+- report_type, employer_name, city, state, zipcode (plus hq_city, hq_state,
+  hq_zipcode, ein and naics for EEO-1): text metadata from
+  storage.fields.document_metadata, null if unreadable
+- processed_at: UTC time the document was appended
+- fields, field_confidence: text field id -> OCR lines / line confidences
+- checkboxes: checkbox name -> checked
+- <table>, <table>_confidence: each table flattened row-major into a
+  fixed-size list (12 x 15 = 180 values for the EEO-1 table); null when the
+  table is missing or its shape does not match table_config
+
+Rows are buffered and written as one part file per batch. The table columns
+differ between form types, so a dataset is read one form type at a time.
+"""
+
+import os
+import uuid
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from pipeline.result_model import CheckboxEntry, DocumentResult, TableEntry, TextEntry
+from storage.fields import document_metadata, metadata_columns, page_number, table_columns
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:  # optional dependency
+    pa = ds = pq = None
+
+BATCH_SIZE = 256  # Documents buffered before a part file is written
+COMPRESSION = "zstd"  # Parquet codec of the part files
+
+def new_run_id() -> str:
+    """
+    :return: Run id made of the current UTC time and a short random suffix
+    """
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S")
+    return f"{stamp}-{uuid.uuid4().hex[:6]}"
+
+
+def result_schema(columns: Dict[str, Tuple[str, Tuple[int, int]]], metadata: List[str]):
+    """
+    :param columns: Table columns from table_columns
+    :param metadata: Text metadata columns from metadata_columns
+    :return: pyarrow schema of one form type's rows
+    """
+    fields = [
+        pa.field("document", pa.string(), nullable=False),
+        pa.field("source", pa.string()),
+        pa.field("page", pa.int16()),
+        pa.field("reporting_year", pa.int16()),
+        pa.field("processed_at", pa.timestamp("ms", tz="UTC"), nullable=False),
+        *(pa.field(name, pa.string()) for name in metadata),
+        pa.field("fields", pa.map_(pa.string(), pa.list_(pa.string()))),
+        pa.field("field_confidence", pa.map_(pa.string(), pa.list_(pa.float32()))),
+        pa.field("checkboxes", pa.map_(pa.string(), pa.bool_())),
+    ]
+    for name, (rows, cols) in columns.values():
+        fields.append(pa.field(name, pa.list_(pa.int32(), rows * cols)))
+        fields.append(pa.field(f"{name}_confidence", pa.list_(pa.float32(), rows * cols)))
+    return pa.schema(fields)
+
+
+class ParquetSink:
+    """
+    Buffered writer of one form type's rows for one run.
+    """
+
+    def __init__(
+        self,
+        root: str,
+        form_type: str,
+        run_id: str,
+        table_config,
+        batch_size: int = BATCH_SIZE,
+    ):
+        if pa is None:
+            raise ImportError("pyarrow is required to write the Parquet dataset")
+        self.form_type = form_type
+        self.columns = table_columns(form_type, table_config)
+        self.schema = result_schema(self.columns, metadata_columns(form_type))
+        self.out_dir = os.path.join(root, f"form_type={form_type}", f"run={run_id}")
+        self.batch_size = batch_size
+        self.rows: List[Dict] = []
+        self.parts = 0
+
+    def append(self, result: DocumentResult, source: Optional[str] = None) -> None:
+        """
+        Buffer one document and write a part file once the batch is full.
+
+        :param result: Document result from extract_contents
+        :param source: Input file the document was read from
+        """
+        row = {
+            "document": result.name,
+            "source": source,
+            "page": page_number(result.name),
+            "processed_at": datetime.now(timezone.utc),
+            "fields": [],
+            "field_confidence": [],
+            "checkboxes": [],
+        }
+        row.update(document_metadata(self.form_type, result))
+        for name, _ in self.columns.values():
+            row[name] = row[f"{name}_confidence"] = None
+
+        for entry in result.entries:
+            if isinstance(entry, TextEntry):
+                row["fields"].append((entry.id, entry.content))
+                row["field_confidence"].append((entry.id, entry.confidence))
+            elif isinstance(entry, TableEntry):
+                if entry.id not in self.columns:
+                    continue
+                name, shape = self.columns[entry.id]
+                if entry.content.shape == shape and entry.confidence.shape == shape:
+                    row[name] = entry.content.ravel()
+                    row[f"{name}_confidence"] = entry.confidence.ravel()
+            elif isinstance(entry, CheckboxEntry):
+                row["checkboxes"].extend(entry.content.items())
+
+        self.rows.append(row)
+        if len(self.rows) >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        """
+        Write the buffered rows as one part file.
+        """
+        if not self.rows:
+            return
+        arrays = []
+        for field in self.schema:
+            values = [row[field.name] for row in self.rows]
+            if pa.types.is_fixed_size_list(field.type):
+                arrays.append(fixed_size_array(values, field.type))
+            else:
+                arrays.append(pa.array(values, type=field.type))
+        table = pa.Table.from_arrays(arrays, schema=self.schema)
+
+        os.makedirs(self.out_dir, exist_ok=True)
+        name = f"part-{os.getpid()}-{self.parts:05d}.parquet"
+        # Written under a hidden name, which dataset readers skip, so they
+        # never see a partial file
+        tmp_path = os.path.join(self.out_dir, f".{name}")
+        pq.write_table(table, tmp_path, compression=COMPRESSION)
+        os.replace(tmp_path, os.path.join(self.out_dir, name))
+        self.parts += 1
+        self.rows = []
+
+    def close(self) -> None:
+        """
+        Write any buffered rows.
+        """
+        self.flush()
+
+
+def fixed_size_array(values: List[Optional[np.ndarray]], type):
+    """
+    Build a fixed-size list array from flat numpy rows in one copy.
+
+    :param values: Flat arrays of the list size, or None for null rows
+    :param type: pyarrow fixed-size list type
+    :return: pyarrow FixedSizeListArray
+    """
+    size = type.list_size
+    value_dtype = type.value_type.to_pandas_dtype()
+    mask = np.array([v is None for v in values])
+    flat = np.zeros((len(values), size), dtype=value_dtype)
+    for i, v in enumerate(values):
+        if v is not None:
+            flat[i] = v
+    return pa.FixedSizeListArray.from_arrays(
+        pa.array(flat.ravel()), type=type, mask=pa.array(mask) if mask.any() else None
+    )
+
+
+class ResultDataset:
+    """
+    Parquet sinks of one run, opened per form type on first use.
+    """
+
+    def __init__(self, root: str, run_id: Optional[str] = None, batch_size: int = BATCH_SIZE):
+        if pa is None:
+            raise ImportError("pyarrow is required to write the Parquet dataset")
+        self.root = root
+        self.run_id = run_id or new_run_id()
+        self.batch_size = batch_size
+        self.sinks: Dict[str, ParquetSink] = {}
+
+    def append(
+        self,
+        form_type: str,
+        table_config,
+        result: DocumentResult,
+        source: Optional[str] = None,
+    ) -> None:
+        """
+        Buffer one document in the sink of its form type.
+
+        :param form_type: 'eeo1' or 'eeo5'
+        :param table_config: Table configuration of the form type
+        :param result: Document result from extract_contents
+        :param source: Input file the document was read from
+        """
+        sink = self.sinks.get(form_type)
+        if sink is None:
+            sink = ParquetSink(self.root, form_type, self.run_id, table_config, self.batch_size)
+            self.sinks[form_type] = sink
+        sink.append(result, source)
+
+    def close(self) -> None:
+        """
+        Write the buffered rows of every sink.
+        """
+        for sink in self.sinks.values():
+            sink.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def read_results(
+    root: str,
+    form_type: str,
+    columns: Optional[List[str]] = None,
+    runs: Optional[List[str]] = None,
+    reporting_year: Optional[int] = None,
+    metadata: Optional[Dict[str, str]] = None,
+):
+    """
+    Read one form type's rows of a dataset in a single scan.
+
+    :param root: Dataset root directory
+    :param form_type: 'eeo1' or 'eeo5'
+    :param columns: Columns to read (all when None)
+    :param runs: Run ids to keep (all when None)
+    :param reporting_year: Reporting year to keep (all when None)
+    :param metadata: Metadata column -> value to keep, e.g. {"state": "CA"}
+    :return: pyarrow Table, with the run id as a string column
+    """
+    if pa is None:
+        raise ImportError("pyarrow is required to read the Parquet dataset")
+    dataset = ds.dataset(
+        os.path.join(root, f"form_type={form_type}"),
+        format="parquet",
+        partitioning=ds.partitioning(pa.schema([("run", pa.string())]), flavor="hive"),
+    )
+    expr = None
+    if runs is not None:
+        expr = ds.field("run").isin(runs)
+    if reporting_year is not None:
+        year_expr = ds.field("reporting_year") == reporting_year
+        expr = year_expr if expr is None else expr & year_expr
+    for column, value in (metadata or {}).items():
+        value_expr = ds.field(column) == value
+        expr = value_expr if expr is None else expr & value_expr
+    return dataset.to_table(columns=columns, filter=expr)
+
+
+def table_array(table, column: str, shape: Tuple[int, int]) -> np.ndarray:
+    """
+    Stack a fixed-size list column into an (N, rows, cols) array without
+    converting row by row. Null tables become rows of -1.
+
+    :param table: pyarrow Table from read_results
+    :param column: Table column name, e.g. 'table' or 'table_a_confidence'
+    :param shape: (rows, cols) of one table
+    :return: Array of shape (N, rows, cols)
+    """
+    chunked = table.column(column)
+    size = shape[0] * shape[1]
+    parts = []
+    for chunk in chunked.chunks:
+        values = chunk.values.slice(chunk.offset * size, len(chunk) * size)
+        # Null tables may be read back with null values
+        values = values.fill_null(-1).to_numpy(zero_copy_only=False)
+        values = values.reshape(len(chunk), *shape)
+        if chunk.null_count:
+            values = values.copy()
+            values[chunk.is_null().to_numpy(zero_copy_only=False)] = -1
+        parts.append(values)
+    if not parts:
+        return np.empty((0, *shape))
+    return np.concatenate(parts)
@@ -0,0 +1,371 @@
+"""
+Module: sqlite_store.py
+
+Indexed SQLite store of document metadata, so questions such as "all MA
+establishments with NAICS 62 in 2023 whose table failed validation" are
+answered from an index instead of by scanning every result JSON.
+
+One row per document and run holds:
+- lineage: document, run_id, form_type, source file, result JSON path, page
+- metadata: report type, employer name, EIN, NAICS, city/state/ZIP of the
+  establishment and headquarters, reporting year (see storage.fields)
+- validation: whether every table passes the row/column total checks, and
+  the number of failing rows and columns
+- confidence summaries: minimum and mean confidence of the text values and
+  of the table cells, fields below the text threshold of json_validator and
+  table cells below LOW_CONFIDENCE
+
+Run from the `ocr/` directory to query a store:
+
+    python3 -m storage.sqlite_store <db> [--state MA] [--naics 62] [--year 2023] [--invalid-table]
+"""
+
+import argparse
+import csv
+import os
+import sqlite3
+import sys
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from pipeline.result_model import DocumentResult, TableEntry, TextEntry
+from storage.fields import document_metadata, page_number
+from utilities.table_validator import LOW_CONFIDENCE, validate_tables
+
+BATCH_SIZE = 256  # Documents buffered before a transaction is committed
+TEXT_THRESHOLD = 0.5  # Value-line confidence below which a text field is flagged
+
+COLUMNS = [
+    ("document", "TEXT NOT NULL"),
+    ("run_id", "TEXT NOT NULL"),
+    ("form_type", "TEXT NOT NULL"),
+    ("source", "TEXT"),
+    ("result_path", "TEXT"),
+    ("page", "INTEGER"),
+    ("processed_at", "TEXT NOT NULL"),
+    ("report_type", "TEXT"),
+    ("employer_name", "TEXT"),
+    ("ein", "TEXT"),
+    ("naics", "TEXT"),
+    ("city", "TEXT"),
+    ("state", "TEXT"),
+    ("zipcode", "TEXT"),
+    ("hq_city", "TEXT"),
+    ("hq_state", "TEXT"),
+    ("hq_zipcode", "TEXT"),
+    ("reporting_year", "INTEGER"),
+    ("table_valid", "INTEGER"),
+    ("invalid_rows", "INTEGER"),
+    ("invalid_cols", "INTEGER"),
+    ("text_confidence_min", "REAL"),
+    ("text_confidence_mean", "REAL"),
+    ("low_confidence_fields", "INTEGER"),
+    ("table_confidence_min", "REAL"),
+    ("table_confidence_mean", "REAL"),
+    ("low_confidence_cells", "INTEGER"),
+]
+COLUMN_NAMES = [name for name, _ in COLUMNS]
+# Indexes on the keys queries filter by
+INDEXES = {
+    "idx_documents_state_naics_year": ("state", "naics", "reporting_year"),
+    "idx_documents_hq_state_naics_year": ("hq_state", "naics", "reporting_year"),
+    "idx_documents_year_valid": ("reporting_year", "table_valid"),
+    "idx_documents_ein": ("ein",),
+    "idx_documents_zipcode": ("zipcode",),
+    "idx_documents_hq_zipcode": ("hq_zipcode",),
+    "idx_documents_source": ("source",),
+}
+# Columns printed by the query command unless --columns is given
+DEFAULT_QUERY_COLUMNS = [
+    "document", "form_type", "employer_name", "ein", "naics", "city", "state",
+    "zipcode", "reporting_year", "table_valid", "result_path",
+]
+
+
+def connect(db_path: str) -> sqlite3.Connection:
+    """
+    Open a store, creating its table and indexes if needed.
+
+    :param db_path: Path of the SQLite database
+    :return: Open connection
+    """
+    conn = sqlite3.connect(db_path)
+    # WAL lets queries run while a pipeline run is writing
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    columns = ", ".join(f"{name} {decl}" for name, decl in COLUMNS)
+    conn.execute(
+        f"CREATE TABLE IF NOT EXISTS documents "
+        f"(id INTEGER PRIMARY KEY, {columns}, UNIQUE (document, run_id))"
+    )
+    for name, keys in INDEXES.items():
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON documents ({', '.join(keys)})")
+    conn.commit()
+    return conn
+
+
+def validation_summary(form_type: str, result: DocumentResult) -> Dict:
+    """
+    Check the row and column totals of every table of a document and
+    summarize the confidences.
+
+    :param form_type: 'eeo1' or 'eeo5'
+    :param result: Document result from extract_contents
+    :return: Dict with the validation and confidence columns
+    """
+    summary = {
+        "table_valid": None,
+        "invalid_rows": None,
+        "invalid_cols": None,
+        "text_confidence_min": None,
+        "text_confidence_mean": None,
+        "low_confidence_fields": 0,
+        "table_confidence_min": None,
+        "table_confidence_mean": None,
+        "low_confidence_cells": None,
+    }
+    text_conf = []
+    table_conf = []
+    for entry in result.entries:
+        if isinstance(entry, TextEntry):
+            # The first line is the printed label
+            values = entry.confidence[1:]
+            text_conf.extend(values)
+            if any(conf < TEXT_THRESHOLD for conf in values):
+                summary["low_confidence_fields"] += 1
+        elif isinstance(entry, TableEntry):
+            if entry.content.ndim != 2 or entry.content.shape[1] < 2:
+                continue
+            if entry.content.shape != entry.confidence.shape:
+                continue
+            # Validate copies: row checks correct low-confidence cells in place
+            row_valid, col_valid = validate_tables(
+                form_type, entry.content[None].copy(), entry.confidence[None]
+            )
+            invalid_rows = int((~row_valid).sum())
+            invalid_cols = int((~col_valid).sum())
+            summary["invalid_rows"] = (summary["invalid_rows"] or 0) + invalid_rows
+            summary["invalid_cols"] = (summary["invalid_cols"] or 0) + invalid_cols
+            table_conf.append(entry.confidence.ravel())
+
+    if summary["invalid_rows"] is not None:
+        summary["table_valid"] = int(summary["invalid_rows"] == 0 and summary["invalid_cols"] == 0)
+    if text_conf:
+        summary["text_confidence_min"] = float(min(text_conf))
+        summary["text_confidence_mean"] = float(np.mean(text_conf))
+    if table_conf:
+        cells = np.concatenate(table_conf)
+        summary["table_confidence_min"] = float(cells.min())
+        summary["table_confidence_mean"] = float(cells.mean())
+        summary["low_confidence_cells"] = int((cells < LOW_CONFIDENCE).sum())
+    return summary
+
+
+class SqliteStore:
+    """
+    Batched writer of document rows for one run.
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        run_id: str,
+        result_dir: Optional[str] = None,
+        batch_size: int = BATCH_SIZE,
+    ):
+        self.conn = connect(db_path)
+        self.run_id = run_id
+        self.result_dir = result_dir
+        self.batch_size = batch_size
+        self.rows: List[tuple] = []
+        placeholders = ", ".join("?" for _ in COLUMN_NAMES)
+        # A re-processed document replaces its row of the same run
+        self.insert_sql = (
+            f"INSERT OR REPLACE INTO documents ({', '.join(COLUMN_NAMES)}) "
+            f"VALUES ({placeholders})"
+        )
+
+    def append(
+        self,
+        form_type: str,
+        table_config,
+        result: DocumentResult,
+        source: Optional[str] = None,
+    ) -> None:
+        """
+        Buffer one document and commit once the batch is full.
+
+        :param form_type: 'eeo1' or 'eeo5'
+        :param table_config: Unused; accepted so every result sink is fed alike
+        :param result: Document result from extract_contents
+        :param source: Input file the document was read from
+        """
+        row = {
+            "document": result.name,
+            "run_id": self.run_id,
+            "form_type": form_type,
+            "source": source,
+            "result_path": None,
+            "page": page_number(result.name),
+            "processed_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        }
+        if self.result_dir is not None:
+            row["result_path"] = os.path.join(self.result_dir, f"{result.name}_result.json")
+        row.update(document_metadata(form_type, result))
+        row.update(validation_summary(form_type, result))
+        self.rows.append(tuple(row.get(name) for name in COLUMN_NAMES))
+        if len(self.rows) >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        """
+        Insert the buffered rows in one transaction.
+        """
+        if not self.rows:
+            return
+        with self.conn:
+            self.conn.executemany(self.insert_sql, self.rows)
+        self.rows = []
+
+    def close(self) -> None:
+        """
+        Insert any buffered rows and close the connection.
+        """
+        self.flush()
+        self.conn.close()
+
+
+def query_documents(
+    conn: sqlite3.Connection,
+    columns: List[str] = DEFAULT_QUERY_COLUMNS,
+    form_type: Optional[str] = None,
+    state: Optional[str] = None,
+    hq_state: Optional[str] = None,
+    naics: Optional[str] = None,
+    year: Optional[int] = None,
+    ein: Optional[str] = None,
+    zipcode: Optional[str] = None,
+    run_id: Optional[str] = None,
+    table_valid: Optional[bool] = None,
+    limit: Optional[int] = None,
+) -> List[tuple]:
+    """
+    Select documents by their indexed keys.
+
+    :param conn: Open connection from connect
+    :param columns: Columns to return
+    :param form_type: 'eeo1' or 'eeo5'
+    :param state: Establishment state, e.g. 'MA'
+    :param hq_state: Headquarters state
+    :param naics: NAICS code or prefix, e.g. '62'
+    :param year: Reporting year
+    :param ein: EIN, digits only
+    :param zipcode: Five-digit ZIP code of the establishment
+    :param run_id: Run id
+    :param table_valid: Keep documents whose tables pass (True) or fail (False)
+    :param limit: Maximum number of rows
+    :return: Matching rows, ordered by document
+    """
+    unknown = [c for c in columns if c not in COLUMN_NAMES]
+    if unknown:
+        raise ValueError(f"Unknown columns: {', '.join(unknown)}")
+    clauses = []
+    params = []
+    for column, value in (
+        ("form_type", form_type),
+        ("state", state.upper() if state else state),
+        ("hq_state", hq_state.upper() if hq_state else hq_state),
+        ("reporting_year", year),
+        ("ein", ein),
+        ("zipcode", zipcode),
+        ("run_id", run_id),
+    ):
+        if value is not None:
+            clauses.append(f"{column} = ?")
+            params.append(value)
+    if naics is not None:
+        # Prefix match as a range, so the index is used
+        clauses.append("naics >= ? AND naics < ?")
+        params += [naics, naics[:-1] + chr(ord(naics[-1]) + 1)]
+    if table_valid is not None:
+        clauses.append("table_valid = ?")
+        params.append(int(table_valid))
+
+    sql = f"SELECT {', '.join(columns)} FROM documents"
+    if clauses:
+        sql += " WHERE " + " AND ".join(clauses)
+    sql += " ORDER BY document"
+    if limit is not None:
+        sql += " LIMIT ?"
+        params.append(limit)
+    return conn.execute(sql, params).fetchall()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Query the SQLite results store written by run_pipeline.py."
+    )
+    parser.add_argument("db", help="Path of the SQLite store")
+    parser.add_argument("--form-type", help="'eeo1' or 'eeo5'")
+    parser.add_argument("--state", help="Establishment state, e.g. MA")
+    parser.add_argument("--hq-state", help="Headquarters state")
+    parser.add_argument("--naics", help="NAICS code or prefix, e.g. 62")
+    parser.add_argument("--year", type=int, help="Reporting year")
+    parser.add_argument("--ein", help="EIN (digits only)")
+    parser.add_argument("--zip", dest="zipcode", help="Five-digit ZIP code")
+    parser.add_argument("--run-id", help="Run id")
+    valid = parser.add_mutually_exclusive_group()
+    valid.add_argument(
+        "--invalid-table",
+        dest="table_valid",
+        action="store_false",
+        default=None,
+        help="Only documents whose table failed validation",
+    )
+    valid.add_argument(
+        "--valid-table",
+        dest="table_valid",
+        action="store_true",
+        default=None,
+        help="Only documents whose tables passed validation",
+    )
+    parser.add_argument(
+        "--columns",
+        default=",".join(DEFAULT_QUERY_COLUMNS),
+        help="Comma-separated columns to print",
+    )
+    parser.add_argument("--limit", type=int, help="Maximum number of rows")
+    parser.add_argument("--count", action="store_true", help="Print only the number of matches")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.db):
+        parser.error(f"No store at {args.db}")
+    conn = connect(args.db)
+    columns = [c.strip() for c in args.columns.split(",") if c.strip()]
+    try:
+        rows = query_documents(
+            conn,
+            columns,
+            form_type=args.form_type,
+            state=args.state,
+            hq_state=args.hq_state,
+            naics=args.naics,
+            year=args.year,
+            ein=args.ein,
+            zipcode=args.zipcode,
+            run_id=args.run_id,
+            table_valid=args.table_valid,
+            limit=args.limit,
+        )
+    except ValueError as e:
+        parser.error(str(e))
+    conn.close()
+
+    if args.count:
+        print(len(rows))
+    else:
+        writer = csv.writer(sys.stdout)
+        writer.writerow(columns)
+        writer.writerows(rows)
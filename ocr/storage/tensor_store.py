@@ -0,0 +1,403 @@
+"""
+Module: tensor_store.py
+
+Memory-mapped store of every table of a corpus, for corpus-wide QA without
+re-parsing the result JSON files.
+
+Each form type has its own directory holding one raw array file per table,
+row-aligned with a document index:
+
+    <root>/<form_type>/documents.txt            one document id per row
+    <root>/<form_type>/<table>.int32            (N, rows, cols) values
+    <root>/<form_type>/<table>_confidence.f16   (N, rows, cols) confidences
+    <root>/<form_type>/shapes.json              (rows, cols) of every table
+
+The tables are 'table' (12 x 15) for EEO-1 and 'table_a' (19 x 15),
+'table_b' (3 x 15) and 'table_c' (6 x 15) for EEO-5. A table missing from
+a document is stored as -1 values with zero confidence. Rows are appended in
+batches; the document ids are written last, so the index only ever lists
+complete rows and a store interrupted mid-batch is trimmed when reopened.
+
+The QA reductions (margin differences, invalid row/column counts,
+low-confidence heatmaps) run over the memory-mapped arrays in chunks.
+
+Run from the `ocr/` directory:
+
+    python3 -m storage.tensor_store ingest <root> <form_type> <json_dir>
+    python3 -m storage.tensor_store qa <root> <form_type> [--output report.json]
+"""
+
+import argparse
+import glob
+import json
+import os
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from pipeline.result_model import DocumentResult, TableEntry
+from storage.fields import table_columns
+from utilities.load_config import load_table_config
+from utilities.table_repair import total_row_index
+from utilities.table_validator import LOW_CONFIDENCE, check_columns
+
+BATCH_SIZE = 1024  # Documents buffered before their rows are written
+CHUNK_SIZE = 65536  # Tables reduced at once by the QA functions
+MISSING = -1  # Value of every cell of a missing table
+LARGE_DIFF = 10  # Margin difference above which a document is listed by qa
+DOCUMENTS_FILE = "documents.txt"
+SHAPES_FILE = "shapes.json"
+
+
+def value_path(group_dir: str, name: str) -> str:
+    """
+    :return: Path of a table's value array
+    """
+    return os.path.join(group_dir, f"{name}.int32")
+
+
+def confidence_path(group_dir: str, name: str) -> str:
+    """
+    :return: Path of a table's confidence array
+    """
+    return os.path.join(group_dir, f"{name}_confidence.f16")
+
+
+def read_documents(group_dir: str) -> List[str]:
+    """
+    :param group_dir: Directory of one form type
+    :return: Document ids, in row order
+    """
+    path = os.path.join(group_dir, DOCUMENTS_FILE)
+    if not os.path.exists(path):
+        return []
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read().splitlines()
+
+
+class TableTensors:
+    """
+    Batched writer of one form type's tables.
+    """
+
+    def __init__(self, root: str, form_type: str, table_config, batch_size: int = BATCH_SIZE):
+        self.group_dir = os.path.join(root, form_type)
+        self.columns = table_columns(form_type, table_config)
+        self.batch_size = batch_size
+        self.names: List[str] = []
+        self.values = {name: [] for name, _ in self.columns.values()}
+        self.confidences = {name: [] for name, _ in self.columns.values()}
+
+        shapes = {name: list(shape) for name, shape in self.columns.values()}
+        os.makedirs(self.group_dir, exist_ok=True)
+        shapes_path = os.path.join(self.group_dir, SHAPES_FILE)
+        if os.path.exists(shapes_path):
+            with open(shapes_path, "r") as f:
+                if json.load(f) != shapes:
+                    raise ValueError(f"Table shapes of {self.group_dir} do not match table_config")
+        else:
+            with open(shapes_path, "w") as f:
+                json.dump(shapes, f)
+
+        # Drop rows written after the last complete batch
+        count = len(read_documents(self.group_dir))
+        for name, (rows, cols) in self.columns.values():
+            for path, itemsize in (
+                (value_path(self.group_dir, name), 4),
+                (confidence_path(self.group_dir, name), 2),
+            ):
+                size = count * rows * cols * itemsize
+                if os.path.exists(path) and os.path.getsize(path) > size:
+                    os.truncate(path, size)
+
+    def append(self, result: DocumentResult) -> None:
+        """
+        Buffer the tables of one document.
+
+        :param result: Document result from extract_contents
+        """
+        tables = {
+            entry.id: entry for entry in result.entries if isinstance(entry, TableEntry)
+        }
+        for entry_id, (name, shape) in self.columns.items():
+            entry = tables.get(entry_id)
+            if entry is not None and entry.content.shape == shape and entry.confidence.shape == shape:
+                self.values[name].append(entry.content)
+                self.confidences[name].append(entry.confidence)
+            else:
+                self.values[name].append(np.full(shape, MISSING))
+                self.confidences[name].append(np.zeros(shape))
+        self.names.append(result.name)
+        if len(self.names) >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        """
+        Append the buffered rows to the array files, then to the index.
+        """
+        if not self.names:
+            return
+        for name, _ in self.columns.values():
+            with open(value_path(self.group_dir, name), "ab") as f:
+                np.stack(self.values[name]).astype(np.int32).tofile(f)
+            with open(confidence_path(self.group_dir, name), "ab") as f:
+                np.stack(self.confidences[name]).astype(np.float16).tofile(f)
+            self.values[name] = []
+            self.confidences[name] = []
+        with open(os.path.join(self.group_dir, DOCUMENTS_FILE), "a", encoding="utf-8") as f:
+            f.write("".join(f"{name}\n" for name in self.names))
+        self.names = []
+
+
+class TensorStore:
+    """
+    Table writers of a store, opened per form type on first use.
+    """
+
+    def __init__(self, root: str, batch_size: int = BATCH_SIZE):
+        self.root = root
+        self.batch_size = batch_size
+        self.groups: Dict[str, TableTensors] = {}
+
+    def append(
+        self,
+        form_type: str,
+        table_config,
+        result: DocumentResult,
+        source: Optional[str] = None,
+    ) -> None:
+        """
+        Buffer the tables of one document in the writer of its form type.
+
+        :param form_type: 'eeo1' or 'eeo5'
+        :param table_config: Table configuration of the form type
+        :param result: Document result from extract_contents
+        :param source: Unused; accepted so every result sink is fed alike
+        """
+        group = self.groups.get(form_type)
+        if group is None:
+            group = TableTensors(self.root, form_type, table_config, self.batch_size)
+            self.groups[form_type] = group
+        group.append(result)
+
+    def close(self) -> None:
+        """
+        Write the buffered rows of every form type.
+        """
+        for group in self.groups.values():
+            group.flush()
+
+
+class TableSet:
+    """
+    Read-only view of one form type's tables.
+
+    :ivar documents: Document ids, in row order
+    :ivar index: Document id -> row (the latest row of a re-processed document)
+    :ivar tables: Table name -> (N, rows, cols) int32 memmap
+    :ivar confidences: Table name -> (N, rows, cols) float16 memmap
+    """
+
+    def __init__(self, root: str, form_type: str):
+        group_dir = os.path.join(root, form_type)
+        with open(os.path.join(group_dir, SHAPES_FILE), "r") as f:
+            shapes = json.load(f)
+        self.documents = read_documents(group_dir)
+        self.index = {name: row for row, name in enumerate(self.documents)}
+        self.tables = {}
+        self.confidences = {}
+        n = len(self.documents)
+        for name, (rows, cols) in shapes.items():
+            if n == 0:
+                self.tables[name] = np.empty((0, rows, cols), dtype=np.int32)
+                self.confidences[name] = np.empty((0, rows, cols), dtype=np.float16)
+                continue
+            self.tables[name] = np.memmap(
+                value_path(group_dir, name), dtype=np.int32, mode="r", shape=(n, rows, cols)
+            )
+            self.confidences[name] = np.memmap(
+                confidence_path(group_dir, name), dtype=np.float16, mode="r", shape=(n, rows, cols)
+            )
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+
+def margin_diffs(form_type: str, tables: np.ndarray) -> np.ndarray:
+    """
+    Largest gap between the reported grand total and the sums of the row
+    totals and of the column totals, as computed by margin_check.
+
+    :param form_type: 'eeo1' or 'eeo5'
+    :param tables: (N, rows, cols) integer tables
+    :return: (N,) int64 differences, 0 for consistent margins
+    """
+    total_row = total_row_index(form_type, tables.shape[1])
+    tables = tables.astype(np.int64, copy=False)
+    whole_total = tables[:, total_row, -1]
+    row_sum = tables[:, :total_row, -1].sum(axis=1)
+    col_sum = tables[:, total_row, :-1].sum(axis=1)
+    return np.maximum(np.abs(row_sum - whole_total), np.abs(col_sum - whole_total))
+
+
+def table_qa(
+    form_type: str,
+    tables: np.ndarray,
+    confidences: np.ndarray,
+    threshold: float = LOW_CONFIDENCE,
+    large_diff: int = LARGE_DIFF,
+    chunk_size: int = CHUNK_SIZE,
+) -> Dict:
+    """
+    Corpus-wide QA of one table, reduced chunk by chunk. Missing tables are
+    skipped.
+
+    :param form_type: 'eeo1' or 'eeo5'
+    :param tables: (N, rows, cols) integer tables, e.g. a TableSet memmap
+    :param confidences: (N, rows, cols) confidences
+    :param threshold: Confidence below which a cell counts as low
+    :param large_diff: Margin difference above which a row is listed
+    :param chunk_size: Tables reduced at once
+    :return: Dict with
+        - count: number of tables present
+        - margin_diff: {difference: number of tables}, without 0
+        - large_diff_rows: rows whose margin difference exceeds large_diff
+        - invalid_rows: (rows,) number of tables whose row total fails
+        - invalid_cols: (cols,) number of tables whose column total fails
+        - low_confidence: (rows, cols) fraction of tables with a low-confidence cell
+    """
+    _, rows, cols = tables.shape
+    count = 0
+    diff_values = []
+    diff_counts = []
+    large_rows = []
+    invalid_rows = np.zeros(rows, dtype=np.int64)
+    invalid_cols = np.zeros(cols, dtype=np.int64)
+    low_confidence = np.zeros((rows, cols), dtype=np.int64)
+
+    for start in range(0, len(tables), chunk_size):
+        chunk = np.asarray(tables[start : start + chunk_size])
+        conf = np.asarray(confidences[start : start + chunk_size])
+        present = ~(chunk == MISSING).all(axis=(1, 2))
+        chunk = chunk[present].astype(np.int64)
+        conf = conf[present]
+        count += len(chunk)
+
+        diffs = margin_diffs(form_type, chunk)
+        values, counts = np.unique(diffs[diffs != 0], return_counts=True)
+        diff_values.append(values)
+        diff_counts.append(counts)
+        large_rows.append(start + np.flatnonzero(present)[diffs > large_diff])
+
+        invalid_rows += (chunk[:, :, :-1].sum(axis=2) != chunk[:, :, -1]).sum(axis=0)
+        invalid_cols += (~check_columns(form_type, chunk)).sum(axis=0)
+        low_confidence += (conf < threshold).sum(axis=0)
+
+    margin_diff = {}
+    if diff_values:
+        values = np.concatenate(diff_values)
+        counts = np.concatenate(diff_counts)
+        unique, inverse = np.unique(values, return_inverse=True)
+        totals = np.bincount(inverse, weights=counts).astype(np.int64)
+        margin_diff = dict(zip(unique.tolist(), totals.tolist()))
+    return {
+        "count": count,
+        "margin_diff": margin_diff,
+        "large_diff_rows": np.concatenate(large_rows) if large_rows else np.empty(0, np.int64),
+        "invalid_rows": invalid_rows,
+        "invalid_cols": invalid_cols,
+        "low_confidence": low_confidence / max(count, 1),
+    }
+
+
+def corpus_qa(table_set: TableSet, form_type: str, **kwargs) -> Dict:
+    """
+    Run table_qa over every table of a store.
+
+    :param table_set: TableSet of the form type
+    :param form_type: 'eeo1' or 'eeo5'
+    :param kwargs: Passed to table_qa
+    :return: Dict of table name -> JSON-ready QA report, with the large
+        margin differences listed by document id
+    """
+    report = {}
+    for name, tables in table_set.tables.items():
+        qa = table_qa(form_type, tables, table_set.confidences[name], **kwargs)
+        report[name] = {
+            "count": qa["count"],
+            "margin_diff": qa["margin_diff"],
+            "large_diff_documents": [table_set.documents[row] for row in qa["large_diff_rows"]],
+            "invalid_rows": qa["invalid_rows"].tolist(),
+            "invalid_cols": qa["invalid_cols"].tolist(),
+            "low_confidence": np.round(qa["low_confidence"], 4).tolist(),
+        }
+    return report
+
+
+def ingest_json(root: str, form_type: str, json_dir: str, table_config) -> int:
+    """
+    Add the tables of existing result JSON files to a store.
+
+    :param root: Store root directory
+    :param form_type: 'eeo1' or 'eeo5'
+    :param json_dir: Directory searched recursively for '*_result.json'
+    :param table_config: Table configuration of the form type
+    :return: Number of documents added
+    """
+    ids = table_columns(form_type, table_config)
+    store = TensorStore(root)
+    paths = sorted(glob.glob(os.path.join(json_dir, "**", "*_result.json"), recursive=True))
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            records = json.load(f)
+        result = DocumentResult(os.path.basename(path)[: -len("_result.json")])
+        for record in records:
+            if record["id"] not in ids:
+                continue
+            try:
+                entry = TableEntry(
+                    record["id"], record["section"], record["content"], record["confidence"]
+                )
+            except ValueError:
+                # Ragged tables are stored as missing
+                continue
+            result.add(entry)
+        store.append(form_type, table_config, result)
+    store.close()
+    return len(paths)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Corpus-wide table store and QA.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    ingest = subparsers.add_parser("ingest", help="Add result JSON files to a store")
+    ingest.add_argument("root", help="Store root directory")
+    ingest.add_argument("form_type", help="'eeo1' or 'eeo5'")
+    ingest.add_argument("json_dir", help="Directory of '*_result.json' files")
+
+    qa = subparsers.add_parser("qa", help="Margin, validity and confidence report")
+    qa.add_argument("root", help="Store root directory")
+    qa.add_argument("form_type", help="'eeo1' or 'eeo5'")
+    qa.add_argument("--output", help="Write the JSON report here instead of stdout")
+    qa.add_argument(
+        "--large-diff",
+        type=int,
+        default=LARGE_DIFF,
+        help=f"List documents whose margin difference exceeds this (default: {LARGE_DIFF})",
+    )
+    args = parser.parse_args()
+
+    if args.command == "ingest":
+        table_config = load_table_config("config/table_config.yaml", args.form_type)
+        count = ingest_json(args.root, args.form_type, args.json_dir, table_config)
+        print(f"Added {count} documents to {os.path.join(args.root, args.form_type)}")
+    else:
+        table_set = TableSet(args.root, args.form_type)
+        report = corpus_qa(table_set, args.form_type, large_diff=args.large_diff)
+        text = json.dumps(report, indent=4)
+        if args.output:
+            with open(args.output, "w") as f:
+                f.write(text)
+        else:
+            print(text)
@@ -0,0 +1,127 @@
+"""
+check_table_repair.py
+
+Regression check for `table_repair.py` on tables shaped like pipeline output. `assign_words_to_grid`
+leaves empty cells at confidence -1 and `post_process_table` reads them as 0; EEO tables are mostly
+empty, so these cells must not crowd the misread ones out of the repair pool or look cheap to edit.
+
+The check builds sparse EEO-1 (12x15) and EEO-5 tables with consistent totals and empty cells at
+confidence -1, misreads one or two filled cells at a lower confidence, and repairs them with
+`repair_table`. It fails if any table is repaired to values other than the true ones, or if fewer
+than MIN_REPAIRED of the tables with one misread cell are repaired. It exits with status 1 on failure.
+
+Usage (from the `ocr/` directory):
+
+    python3 -m utilities.check_table_repair [table_count]
+"""
+
+import copy
+import sys
+from typing import List, Tuple
+
+import numpy as np
+
+from utilities.table_repair import repair_table
+
+FILL_RATE = 0.35  # Share of the body cells holding a count; the rest are empty
+MIN_REPAIRED = 0.95  # Share of single-misread tables that must be repaired
+
+
+def pipeline_table(
+    rng: np.random.Generator, form_type: str
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Build a consistent table the way the pipeline stores it.
+
+    Args:
+        rng (np.random.Generator): Random generator.
+        form_type (str): 'eeo1' or 'eeo5'.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: Table and cell confidences, -1 for
+            the empty cells.
+    """
+    rows, cols = (10, 14) if form_type == "eeo1" else (6, 9)
+    extra = 1 if form_type == "eeo1" else 0  # EEO-1 prior year row
+    body = np.where(
+        rng.random((rows + extra, cols)) < FILL_RATE, rng.integers(1, 60, (rows + extra, cols)), 0
+    )
+    body = np.hstack([body, body.sum(axis=1, keepdims=True)])
+    total = body[:rows].sum(axis=0, keepdims=True)
+    table = np.vstack([body[:rows], total, body[rows:]])
+    conf = np.where(table > 0, rng.uniform(0.85, 1.0, table.shape), -1.0)
+    return table, conf
+
+
+def misread(
+    rng: np.random.Generator, table: np.ndarray, conf: np.ndarray, errors: int
+) -> Tuple[List[List[int]], List[List[float]]]:
+    """
+    Misread filled body cells the way OCR does: a wrong digit at a lower confidence.
+
+    Args:
+        rng (np.random.Generator): Random generator.
+        table (np.ndarray): Consistent table.
+        conf (np.ndarray): Cell confidences.
+        errors (int): Cells to misread.
+
+    Returns:
+        Tuple[List[List[int]], List[List[float]]]: Misread table and confidences.
+    """
+    data, confidence = table.copy(), conf.copy()
+    filled = np.argwhere(table[: table.shape[0] - 2, :-1] > 0)
+    for i, j in filled[rng.choice(len(filled), errors, replace=False)]:
+        data[i, j] += int(rng.choice([-10, -1, 1, 10]))
+        data[i, j] = abs(data[i, j])
+        confidence[i, j] = rng.uniform(0.3, 0.7)
+    return data.tolist(), confidence.tolist()
+
+
+def check_repairs(count: int, seed: int = 0) -> List[str]:
+    """
+    Repair misread pipeline-shaped tables and collect the problems found.
+
+    Args:
+        count (int): Tables per form type and number of misread cells.
+        seed (int): Random seed.
+
+    Returns:
+        List[str]: Problem descriptions, empty when the check passes.
+    """
+    rng = np.random.default_rng(seed)
+    problems = []
+    for form_type in ("eeo1", "eeo5"):
+        for errors in (1, 2):
+            repaired = wrong = 0
+            for _ in range(count):
+                table, conf = pipeline_table(rng, form_type)
+                data, confidence = misread(rng, table, conf, errors)
+                before = copy.deepcopy(data)
+                if repair_table(form_type, data, confidence):
+                    if data == table.tolist():
+                        repaired += 1
+                    else:
+                        wrong += 1
+                elif data != before:
+                    wrong += 1
+            print(
+                f"{form_type}, {errors} misread cell(s): {repaired}/{count} repaired, "
+                f"{wrong} repaired wrongly"
+            )
+            if wrong:
+                problems.append(f"{form_type}: {wrong} tables with {errors} misreads repaired wrongly")
+            if errors == 1 and repaired < MIN_REPAIRED * count:
+                problems.append(
+                    f"{form_type}: only {repaired}/{count} tables with one misread repaired"
+                )
+    return problems
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    problems = check_repairs(count)
+    for problem in problems:
+        print(f"FAIL: {problem}")
+    if problems:
+        sys.exit(1)
+    print("OK: pipeline-shaped tables repaired")
@@ -24,7 +24,7 @@ def get_files_in_directory(directory, extension="pdf"):
 
     Args:
         directory (str): Path to the directory to scan.
-        extension (str): File extension to filter by (default is 'pdf').
+        extension (str or tuple): File extension(s) to filter by (default is 'pdf').
 
     Returns:
         List[str]: List of file names matching the extension.
@@ -0,0 +1,190 @@
+"""
+form_lines.py
+
+Helpers to compare the ruling lines of a page raster with a cell layout.
+A page is reduced to 1D line profiles (how much horizontal rule ink each
+row holds, how much vertical rule ink each column holds); a layout config
+is reduced to the same profiles by drawing the edges of its cell rects.
+The profiles are cheap to compute on a low-resolution render and are
+used to tell layouts apart and to locate a page relative to its layout.
+"""
+
+from typing import Dict, Iterable, Optional
+
+import cv2
+import numpy as np
+
+RULE_INK_THRESHOLD = 160  # Gray levels below this count as rule ink
+RULE_MIN_LENGTH = 0.025  # Shortest rule kept, as a fraction of the page extent
+PROFILE_SIGMA = 1.5  # Gaussian blur (pixels) applied to both profiles
+# Size in points of the cropped page space the layout configs are defined in
+LAYOUT_WIDTH = 523
+LAYOUT_HEIGHT = 679
+
+
+def rule_mask(img: np.ndarray, axis: int, min_length: float = RULE_MIN_LENGTH) -> np.ndarray:
+    """
+    Keep the ruling lines running along one axis of a grayscale raster.
+
+    Args:
+        img (np.ndarray): 2D uint8 grayscale raster.
+        axis (int): 0 for horizontal rules, 1 for vertical rules.
+        min_length (float): Shortest rule kept, as a fraction of the raster
+            width (horizontal) or height (vertical).
+
+    Returns:
+        np.ndarray: uint8 mask (0/1) of the rule pixels.
+    """
+    ink = (img < RULE_INK_THRESHOLD).astype(np.uint8)
+    h, w = ink.shape
+    if axis == 0:
+        kernel = (max(1, int(w * min_length)), 1)
+    else:
+        kernel = (1, max(1, int(h * min_length)))
+    return cv2.morphologyEx(
+        ink, cv2.MORPH_OPEN, cv2.getStructuringElement(cv2.MORPH_RECT, kernel)
+    )
+
+
+def smooth_profile(profile: np.ndarray, sigma: float = PROFILE_SIGMA) -> np.ndarray:
+    """
+    Blur a 1D profile with a Gaussian so that nearby lines still overlap.
+
+    Args:
+        profile (np.ndarray): 1D profile.
+        sigma (float): Standard deviation of the blur in samples.
+
+    Returns:
+        np.ndarray: Blurred float32 profile of the same length.
+    """
+    if sigma <= 0:
+        return profile.astype(np.float32)
+    blurred = cv2.GaussianBlur(
+        profile.astype(np.float32).reshape(-1, 1), (1, 0), sigmaX=0, sigmaY=sigma
+    )
+    return blurred.ravel()
+
+
+def rule_profile(
+    img: np.ndarray,
+    axis: int,
+    min_length: float = RULE_MIN_LENGTH,
+    sigma: float = PROFILE_SIGMA,
+) -> np.ndarray:
+    """
+    Project the rules of a raster onto one axis.
+
+    Args:
+        img (np.ndarray): 2D uint8 grayscale raster.
+        axis (int): 0 for the row profile of horizontal rules, 1 for the
+            column profile of vertical rules.
+        min_length (float): Shortest rule kept (see rule_mask).
+        sigma (float): Gaussian blur of the profile.
+
+    Returns:
+        np.ndarray: Profile with one value per row (axis 0) or column (axis 1),
+            the fraction of that line covered by rule ink.
+    """
+    mask = rule_mask(img, axis, min_length)
+    profile = mask.sum(axis=1 - axis) / float(mask.shape[1 - axis])
+    return smooth_profile(profile, sigma)
+
+
+def layout_rule_profile(
+    key_map: Dict,
+    axis: int,
+    length: int,
+    scale: float = 1.0,
+    sections: Optional[Iterable[str]] = None,
+    sigma: float = PROFILE_SIGMA,
+) -> np.ndarray:
+    """
+    Build the expected rule profile of a layout from the edges of its cell rects.
+
+    Args:
+        key_map (Dict): Layout config mapping sections to cell rects.
+        axis (int): 0 for the row profile (top/bottom edges), 1 for the
+            column profile (left/right edges).
+        length (int): Number of samples of the profile.
+        scale (float): Pixels per layout point.
+        sections (Iterable[str]): Sections to draw; all sections when None.
+        sigma (float): Gaussian blur of the profile.
+
+    Returns:
+        np.ndarray: Profile holding, per row or column, the summed extent of
+            the cell edges lying on it as a fraction of the page extent.
+    """
+    profile = np.zeros(length, dtype=np.float32)
+    extent = float(LAYOUT_WIDTH if axis == 0 else LAYOUT_HEIGHT)
+    for section in sections if sections is not None else key_map.keys():
+        for rect in key_map.get(section, {}).values():
+            x0, y0, x1, y1 = rect
+            if axis == 0:
+                edges, span = (y0, y1), (x1 - x0) / extent
+            else:
+                edges, span = (x0, x1), (y1 - y0) / extent
+            for edge in edges:
+                # Split the edge between its two neighbouring samples so
+                # that fractional positions shift the profile smoothly;
+                # sample i of a rendered profile covers [i, i + 1)
+                pos = edge * scale - 0.5
+                idx = int(np.floor(pos))
+                frac = pos - idx
+                if 0 <= idx < length:
+                    profile[idx] += span * (1 - frac)
+                if 0 <= idx + 1 < length:
+                    profile[idx + 1] += span * frac
+    return smooth_profile(profile, sigma)
+
+
+def profile_correlation(a: np.ndarray, b: np.ndarray) -> float:
+    """
+    Pearson correlation of two profiles of the same length.
+
+    Args:
+        a (np.ndarray): First profile.
+        b (np.ndarray): Second profile.
+
+    Returns:
+        float: Correlation in [-1, 1], or 0 if either profile is flat.
+    """
+    a = a - a.mean()
+    b = b - b.mean()
+    denom = float(np.sqrt((a * a).sum() * (b * b).sum()))
+    if denom == 0:
+        return 0.0
+    return float((a * b).sum() / denom)
+
+
+def layout_edges(
+    key_map: Dict,
+    axis: int,
+    sections: Optional[Iterable[str]] = None,
+    merge: float = 2.0,
+) -> np.ndarray:
+    """
+    Collect the cell edge positions of a layout along one axis.
+
+    Neighbouring cells rarely share exactly the same coordinate in the
+    configs, so edges closer than `merge` points are taken to be the same
+    rule and replaced by their mean.
+
+    Args:
+        key_map (Dict): Layout config mapping sections to cell rects.
+        axis (int): 0 for top/bottom edges (y), 1 for left/right edges (x).
+        sections (Iterable[str]): Sections to use; all sections when None.
+        merge (float): Largest gap in points between edges of the same rule.
+
+    Returns:
+        np.ndarray: Sorted rule positions in layout points.
+    """
+    edges = []
+    for section in sections if sections is not None else key_map.keys():
+        for rect in key_map.get(section, {}).values():
+            x0, y0, x1, y1 = rect
+            edges.extend((y0, y1) if axis == 0 else (x0, x1))
+    if not edges:
+        return np.zeros(0, dtype=np.float64)
+    edges = np.sort(np.asarray(edges, dtype=np.float64))
+    groups = np.split(edges, np.flatnonzero(np.diff(edges) >= merge) + 1)
+    return np.array([group.mean() for group in groups])
@@ -1,136 +1,207 @@
 """
 get_log_summary.py
 
-This script parses and summarizes log files generated from OCR postprocessing or table validation runs.
-It extracts error messages related to invalid tables and low-confidence cells, formats them for readability,
-and computes an overall accuracy rate.
+This script summarizes the structured event logs (`.jsonl`) written by the OCR pipeline next to its
+text logs. Each event is one JSON object per line with a document ID (`doc`), stage, event type
+(`event`), level and fields such as `loc`, `value`, `conf` or `duration_ms`, so nothing has to be
+scraped from the text logs with regular expressions.
 
 ---
 
 Key Features:
-- Scans all `.log` files in a specified directory
+- Streams every `.jsonl` file in a specified directory line by line, never loading a whole log
+- Summarizes the files in parallel worker processes and merges their partial summaries
 - Identifies and categorizes:
   - Invalid table structures
   - Low-confidence OCR cells
 - Outputs formatted error summaries to a single summary file
-- Reports total counts and percentage of valid vs. invalid tables
+- Reports valid, repaired and invalid table counts, the accuracy rate, event counts per stage
+  and the time spent per stage and per cell
 """
 
+import json
 import os
-import re
-from typing import List
+import sys
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List
+
 from dir_helper import get_files_in_directory
 
+# Table events and the outcome they count as
+TABLE_OUTCOMES = {
+    "valid_table": "valid",
+    "valid_table_invalid_sum": "valid",
+    "repaired_table": "repaired",
+    "invalid_table": "invalid",
+}
+CHUNK_SIZE = 16  # Event logs summarized per task
+
 
-def get_filename(path: str) -> str:
+def new_summary() -> Dict:
     """
-    Extracts the filename (without extension) from a full path.
+    Returns:
+        Dict: Empty partial summary.
     """
-    filename_with_ext = os.path.basename(path)
-    filename, _ = os.path.splitext(filename_with_ext)
-    return filename
+    return {
+        "logs": 0,
+        "documents": 0,
+        "tables": Counter(),
+        "events": Counter(),
+        "durations": defaultdict(list),
+        "messages": [],
+        "malformed": 0,
+    }
+
+
+def event_message(event: Dict) -> str:
+    """
+    Format an invalid table or low-confidence cell event for the summary.
 
+    Args:
+        event (Dict): Event of type 'invalid_table' or 'unconfident_cell'.
 
-def get_invalid_table_message(path: str, line: str) -> str:
+    Returns:
+        str: Summary line, ending with a newline.
     """
-    Parse and format invalid table message from a log line.
+    if event["event"] == "invalid_table":
+        return (
+            f"ERROR_IN_TABLE-{event['doc']}:{event.get('table')}:"
+            f"row-{event.get('rows')},col-{event.get('cols')}\n"
+        )
+    return (
+        f"UNCONFIDENT_CELL-{event['doc']}:"
+        f"val:{event.get('value')},conf:{event.get('conf')},loc:{event.get('loc')}\n"
+    )
+
+
+def examine_single_log(path: str, summary: Dict) -> None:
     """
-    pattern = r"row-\[([^\]]+)\],col-\[([^\]]+)\]"
-    filename = get_filename(path)
-    msg = "ERROR_IN_TABLE-"
-    match = re.search(pattern, line)
-    if match:
-        row_str = match.group(1)
-        col_str = match.group(2)
-        row_list = [s.strip() == "True" for s in row_str.split(",")]
-        col_list = [s.strip() == "True" for s in col_str.split(",")]
-        msg += f"{filename}:row-{row_list},col-{col_list}\n"
-    else:
-        msg += f"{filename}:WARNING-info not found\n"
-    return msg
-
-
-def get_unconfident_cell_message(path: str, line: str) -> str:
+    Stream one event log into a partial summary.
+
+    Args:
+        path (str): Path to a `.jsonl` event log.
+        summary (Dict): Partial summary, updated in place.
     """
-    Parse and format message for an OCR cell with low confidence.
+    has_table = False
+    summary["logs"] += 1
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                event = json.loads(line)
+                kind = event["event"]
+            except (ValueError, KeyError, TypeError):
+                # A run killed mid-write leaves a partial last line
+                summary["malformed"] += 1
+                continue
+            stage = event.get("stage", "")
+            summary["events"][(stage, kind)] += 1
+            if "duration_ms" in event:
+                key = "cell" if kind == "cell_done" else stage
+                summary["durations"][key].append(event["duration_ms"])
+            if kind in TABLE_OUTCOMES:
+                has_table = True
+                summary["tables"][TABLE_OUTCOMES[kind]] += 1
+            if kind in ("invalid_table", "unconfident_cell"):
+                summary["messages"].append(event_message(event))
+    if has_table:
+        summary["documents"] += 1
+
+
+def summarize_logs(paths: List[str]) -> Dict:
+    """
+    Summarize a chunk of event logs; runs in a worker process.
+
+    Args:
+        paths (List[str]): Paths to `.jsonl` event logs.
+
+    Returns:
+        Dict: Partial summary of the chunk.
     """
-    pattern = r"val:(\d+),conf:([\d\.]+),loc:\[([^\]]+)\]"
-    filename = get_filename(path)
-    msg = f"UNCONFIDENT_CELL-{filename}:"
-    match = re.search(pattern, line)
-    if match:
-        val = int(match.group(1))
-        conf = float(match.group(2))
-        loc_str = match.group(3)
-        loc = [int(s.strip()) for s in loc_str.split(",")]
-        msg += f"val:{val},conf:{conf},loc:{loc}\n"
-    else:
-        msg += "WARNING-info not found\n"
-    return msg
-
-
-def write_to_log(path: str, message: str) -> None:
+    summary = new_summary()
+    for path in paths:
+        examine_single_log(path, summary)
+    return summary
+
+
+def merge_summary(total: Dict, part: Dict) -> None:
     """
-    Append a formatted message to a log file.
+    Add a partial summary to the running total.
+
+    Args:
+        total (Dict): Running summary, updated in place.
+        part (Dict): Partial summary of one chunk.
     """
-    with open(path, "a") as f:
-        f.write(message)
+    for key in ("logs", "documents", "malformed"):
+        total[key] += part[key]
+    total["tables"].update(part["tables"])
+    total["events"].update(part["events"])
+    for key, values in part["durations"].items():
+        total["durations"][key].extend(values)
+    total["messages"].extend(part["messages"])
 
 
-def examine_single_log(path: str, out_log: str) -> bool:
+def duration_stats(values: List[float]) -> str:
     """
-    Process a single log file to extract table validity and error messages.
+    Args:
+        values (List[float]): Durations in milliseconds.
 
     Returns:
-        bool: True if the table is marked valid, False otherwise.
+        str: Count, total, mean, median and maximum of the durations.
     """
-    isValidTable = False
-    with open(path, "r") as f:
-        lines = f.readlines()
-        for line in lines:
-            if "Valid table" in line:
-                isValidTable = True
-            elif "Invalid table" in line:
-                msg = get_invalid_table_message(path, line)
-                write_to_log(out_log, msg)
-            elif "Unconfident_cell" in line:
-                msg = get_unconfident_cell_message(path, line)
-                write_to_log(out_log, msg)
-    return isValidTable
-
-
-def process_logs(logs: List[str], log_dir: str, out_path: str) -> None:
+    ordered = sorted(values)
+    total = sum(ordered)
+    return (
+        f"n={len(ordered)}, total={total / 1000:.1f}s, mean={total / len(ordered):.1f}ms, "
+        f"median={ordered[len(ordered) // 2]:.1f}ms, max={ordered[-1]:.1f}ms"
+    )
+
+
+def process_logs(logs: List[str], log_dir: str, out_path: str, workers: int = None) -> None:
     """
-    Process all logs in a directory and summarize validation results.
+    Summarize all event logs of a directory in parallel and write one summary.
 
     Args:
-        logs (List[str]): List of log filenames.
+        logs (List[str]): List of event log filenames.
         log_dir (str): Path to the log directory.
         out_path (str): Path to write the summary log file.
+        workers (int): Worker processes (default: one per CPU).
     """
-    valid_table_cnt = 0
-    invalid_table_cnt = 0
-
-    for log in logs:
-        log_path = os.path.join(log_dir, log)
-        isValidTable = examine_single_log(log_path, out_path)
-        if isValidTable:
-            valid_table_cnt += 1
-        else:
-            invalid_table_cnt += 1
-
-    with open(out_path, "a") as f:
-        f.write(f"Total Logs: {len(logs)}\n")
-        f.write(f"Summary: {valid_table_cnt} valid tables, {invalid_table_cnt} invalid tables\n")
-        if valid_table_cnt + invalid_table_cnt > 0:
-            accuracy = valid_table_cnt / (valid_table_cnt + invalid_table_cnt) * 100
+    paths = [os.path.join(log_dir, log) for log in logs]
+    chunks = [paths[i : i + CHUNK_SIZE] for i in range(0, len(paths), CHUNK_SIZE)]
+    total = new_summary()
+    if len(chunks) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            # map keeps the chunk order, so the summary lines stay sorted by log
+            for part in executor.map(summarize_logs, chunks):
+                merge_summary(total, part)
+    elif chunks:
+        merge_summary(total, summarize_logs(chunks[0]))
+
+    tables = total["tables"]
+    valid, repaired, invalid = tables["valid"], tables["repaired"], tables["invalid"]
+    with open(out_path, "w") as f:
+        f.writelines(total["messages"])
+        f.write(f"Total Logs: {total['logs']}, documents with tables: {total['documents']}\n")
+        f.write(
+            f"Summary: {valid} valid tables, {repaired} repaired tables, "
+            f"{invalid} invalid tables\n"
+        )
+        if valid + repaired + invalid > 0:
+            accuracy = (valid + repaired) / (valid + repaired + invalid) * 100
             f.write(f"Summary: accuracy: {accuracy:.2f}%\n")
+        for (stage, kind), count in sorted(total["events"].items()):
+            f.write(f"Events: {stage},{kind}: {count}\n")
+        for key, values in sorted(total["durations"].items()):
+            f.write(f"Timing: {key}: {duration_stats(values)}\n")
+        if total["malformed"]:
+            f.write(f"Skipped {total['malformed']} malformed event lines\n")
 
 
 # Example usage
 if __name__ == "__main__":
-    log_dir = "../../logs"
-    logs = get_files_in_directory(log_dir, "log")
+    log_dir = sys.argv[1] if len(sys.argv) > 1 else "../../logs"
+    summary_log_path = sys.argv[2] if len(sys.argv) > 2 else "../../summary.log"
+    logs = get_files_in_directory(log_dir, ".jsonl")
     logs.sort()
-    summary_log_path = "../../summary.log"
     process_logs(logs, log_dir, summary_log_path)
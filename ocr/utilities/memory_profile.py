@@ -0,0 +1,190 @@
+"""
+memory_profile.py
+
+Per-document and per-stage memory accounting for OCR runs.
+Records the resident set size (RSS) of the process around each document and each pipeline stage,
+and optionally the Python allocations traced by tracemalloc, flags documents whose memory is not
+released when they are done, and writes a JSON report.
+
+RSS covers everything the process holds (numpy buffers, PyTorch tensors, PDF renderers) but the
+allocator rarely returns freed memory to the system, so it mostly shows growth. tracemalloc only
+sees Python allocations but measures what a document actually retained; it slows the run down
+and is off by default.
+"""
+
+import json
+import os
+import resource
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+LEAK_THRESHOLD_MB = 20.0  # Memory a document may retain before it is flagged
+TOP_ALLOCATIONS = 10  # Allocation sites listed for each flagged document (tracemalloc only)
+TRACE_FRAMES = 1  # Stack frames stored per traced allocation
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+_MB = 1024 * 1024
+
+
+def current_rss_mb() -> float:
+    """
+    Read the current resident set size of this process.
+
+    Returns:
+        float: RSS in MB; the peak RSS where /proc is unavailable.
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE / _MB
+    except OSError:
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+        return max_rss / _MB if sys.platform == "darwin" else max_rss / 1024
+
+
+class MemoryTracker:
+    """
+    Collects memory measurements of the documents and stages of one run.
+
+    Args:
+        trace (bool): Also measure Python allocations with tracemalloc.
+        leak_threshold_mb (float): Retained memory above which a document is flagged.
+        top (int): Allocation sites listed for each flagged document.
+        on_stage (Callable): Called with (document, stage) when a stage starts,
+            e.g. to report progress to a supervisor.
+    """
+
+    def __init__(
+        self,
+        trace: bool = False,
+        leak_threshold_mb: float = LEAK_THRESHOLD_MB,
+        top: int = TOP_ALLOCATIONS,
+        on_stage: Optional[Callable[[Optional[str], str], None]] = None,
+    ):
+        self.trace = trace
+        self.leak_threshold_mb = leak_threshold_mb
+        self.top = top
+        self.on_stage = on_stage
+        self.documents: List[Dict] = []
+        self.current: Optional[Dict] = None
+        self.start_rss_mb = current_rss_mb()
+        if trace and not tracemalloc.is_tracing():
+            tracemalloc.start(TRACE_FRAMES)
+
+    def _traced_mb(self) -> Optional[float]:
+        if not self.trace:
+            return None
+        return tracemalloc.get_traced_memory()[0] / _MB
+
+    @contextmanager
+    def document(self, name: str):
+        """
+        Measure one document. Stages measured inside are recorded with it.
+
+        Args:
+            name (str): Document name.
+        """
+        record = {"document": name, "stages": []}
+        outer, self.current = self.current, record
+        snapshot = tracemalloc.take_snapshot() if self.trace else None
+        rss_before, traced_before = current_rss_mb(), self._traced_mb()
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record["duration_ms"] = round((time.perf_counter() - start) * 1000, 1)
+            record["rss_mb"] = round(current_rss_mb(), 1)
+            record["rss_delta_mb"] = round(record["rss_mb"] - rss_before, 1)
+            if self.trace:
+                # Python allocations still alive once the document is done
+                retained = self._traced_mb() - traced_before
+                record["traced_retained_mb"] = round(retained, 2)
+            else:
+                retained = record["rss_delta_mb"]
+            record["flagged"] = retained > self.leak_threshold_mb
+            if record["flagged"] and snapshot is not None:
+                stats = tracemalloc.take_snapshot().compare_to(snapshot, "lineno")
+                record["top_allocations"] = [
+                    f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}: "
+                    f"{stat.size_diff / 1024:+.1f} KiB ({stat.count_diff:+d} blocks)"
+                    for stat in stats[: self.top]
+                ]
+            self.current = outer
+            self.documents.append(record)
+
+    @contextmanager
+    def stage(self, name: str):
+        """
+        Measure one stage of the current document.
+
+        Args:
+            name (str): Stage name, e.g. 'cells_to_contents'.
+        """
+        if self.on_stage is not None:
+            self.on_stage(self.current["document"] if self.current else None, name)
+        rss_before, traced_before = current_rss_mb(), self._traced_mb()
+        if self.trace:
+            tracemalloc.reset_peak()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            record = {
+                "stage": name,
+                "duration_ms": round((time.perf_counter() - start) * 1000, 1),
+                "rss_delta_mb": round(current_rss_mb() - rss_before, 1),
+            }
+            if self.trace:
+                current, peak = tracemalloc.get_traced_memory()
+                record["traced_delta_mb"] = round(current / _MB - traced_before, 2)
+                record["traced_peak_mb"] = round(peak / _MB - traced_before, 2)
+            if self.current is not None:
+                self.current["stages"].append(record)
+
+    def report(self) -> Dict:
+        """
+        Summarize the run.
+
+        Returns:
+            Dict: Start, end and peak RSS, the growth after the first document
+                (warm-up, e.g. model weights), the flagged documents and every
+                document record.
+        """
+        end_rss_mb = current_rss_mb()
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        peak_rss_mb = max_rss / _MB if sys.platform == "darwin" else max_rss / 1024
+        report = {
+            "documents": len(self.documents),
+            "start_rss_mb": round(self.start_rss_mb, 1),
+            "end_rss_mb": round(end_rss_mb, 1),
+            "peak_rss_mb": round(peak_rss_mb, 1),
+            "growth_after_first_mb": None,
+            "trace": self.trace,
+            "leak_threshold_mb": self.leak_threshold_mb,
+            "flagged": [d["document"] for d in self.documents if d["flagged"]],
+            "records": self.documents,
+        }
+        if self.documents:
+            report["growth_after_first_mb"] = round(end_rss_mb - self.documents[0]["rss_mb"], 1)
+        return report
+
+    def write_report(self, path: str) -> Dict:
+        """
+        Write the report as JSON.
+
+        Args:
+            path (str): Output JSON path.
+
+        Returns:
+            Dict: The report written.
+        """
+        report = self.report()
+        out_dir = os.path.dirname(path)
+        if out_dir:
+            os.makedirs(out_dir, exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2)
+        return report
@@ -0,0 +1,347 @@
+"""
+table_repair.py
+
+This module repairs numeric tables whose row and column totals disagree after OCR. Unlike the
+single-cell row correction in `table_validator.py`, it uses the row totals and the column totals
+together and considers alternative readings of several cells at once.
+
+---
+
+How it works:
+- The residual of every row (cells minus total column) and every column (cells minus total row)
+  is computed; a table is consistent when all residuals are zero.
+- Empty cells (confidence -1, read as 0) count as confident zeros.
+- The least confident cells of each table form a small repair pool. Each pool cell gets a few
+  replacement values: the OCR top-k candidates when they are available, and the values that
+  would zero its row residual or its column residual.
+- Every repair of one or two pool cells is scored. Replacing a reading of confidence p by a value
+  of score q costs log(p) - log(q); values not proposed by the recognizer get a small fixed score.
+- The cheapest repair that zeroes every residual wins. Tables where two different repairs tie are
+  left untouched, since the totals cannot tell them apart.
+
+All steps are vectorized over an (N, rows, cols) stack of tables; `repair_table` wraps a single
+list-based table the way the pipeline stores it.
+"""
+
+from itertools import combinations
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+POOL_SIZE = 8  # Least confident cells considered for repair per table
+MAX_CHANGES = 2  # Largest number of cells changed by one repair
+UNSEEN_SCORE = 0.05  # Score of a value implied by the totals but not proposed by OCR
+MIN_PROBABILITY = 1e-3  # Confidences are clipped to [this, 1 - this] before taking logs
+TIE_TOLERANCE = 1e-9  # Repairs whose costs differ by less than this are ties
+BATCH_SIZE = 256  # Tables searched per chunk, bounding the memory of the pair search
+
+
+def total_row_index(form_type: str, rows: int) -> int:
+    """
+    Index of the row holding the column totals.
+
+    Args:
+        form_type (str): 'eeo1' (total row followed by the prior year row) or 'eeo5'.
+        rows (int): Number of table rows.
+
+    Returns:
+        int: Row index of the column totals.
+
+    Raises:
+        ValueError: If the form type is unknown.
+    """
+    if form_type == "eeo1":
+        return rows - 2
+    if form_type == "eeo5":
+        return rows - 1
+    raise ValueError(f"Unsupported form type: {form_type}")
+
+
+def table_residuals(form_type: str, tables: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Row and column residuals of a stack of tables.
+
+    Args:
+        form_type (str): 'eeo1' or 'eeo5'.
+        tables (np.ndarray): (N, rows, cols) integer tables.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: (N, rows) row residuals (sum of the cells
+            minus the total column) and (N, cols) column residuals (sum of the
+            cells above the total row minus the total row).
+    """
+    total_row = total_row_index(form_type, tables.shape[-2])
+    row_res = tables[..., :-1].sum(axis=-1) - tables[..., -1]
+    col_res = tables[..., :total_row, :].sum(axis=-2) - tables[..., total_row, :]
+    return row_res, col_res
+
+
+def _pool_options(form_type, tables, confidences, candidates, candidate_scores, pool_size):
+    """
+    Build the replacement options of the repair pool.
+
+    Args:
+        form_type (str): 'eeo1' or 'eeo5'.
+        tables (np.ndarray): (N, rows, cols) integer tables.
+        confidences (np.ndarray): (N, rows, cols) OCR confidences.
+        candidates (np.ndarray): Optional (N, rows, cols, K) alternative readings.
+        candidate_scores (np.ndarray): Optional (N, rows, cols, K) candidate scores.
+        pool_size (int): Least confident cells considered per table.
+
+    Returns:
+        tuple: (pool cell flat indices (N, M), option values (N, M, K),
+            option costs (N, M, K) with inf for unusable options, residual
+            slot touched by the row (N, M) and column (N, M) of each cell,
+            residual sign per unit change for the row (N, M) and column (N, M)).
+    """
+    n, rows, cols = tables.shape
+    total_row = total_row_index(form_type, rows)
+    row_res, col_res = table_residuals(form_type, tables)
+    pool_size = min(pool_size, rows * cols)
+
+    flat_conf = confidences.reshape(n, -1)
+    pool = np.argsort(flat_conf, axis=1, kind="stable")[:, :pool_size]
+    r, c = np.divmod(pool, cols)
+    current = np.take_along_axis(tables.reshape(n, -1), pool, axis=1)
+    p = np.take_along_axis(flat_conf, pool, axis=1)
+    p = np.clip(p, MIN_PROBABILITY, 1 - MIN_PROBABILITY)
+
+    # A unit increase of a cell moves its row residual by +1, or by -1 for the
+    # total column; its column residual by +1 above the total row, -1 on it,
+    # and not at all below it (the EEO-1 prior year row)
+    row_sign = np.where(c == cols - 1, -1, 1)
+    col_sign = np.where(r < total_row, 1, np.where(r == total_row, -1, 0))
+    row_slot = r
+    col_slot = np.where(col_sign != 0, rows + c, rows + cols)  # rows + cols is a dummy slot
+
+    res_r = np.take_along_axis(row_res, r, axis=1)
+    res_c = np.take_along_axis(col_res, c, axis=1)
+    implied_row = current - row_sign * res_r
+    implied_col = np.where(col_sign != 0, current - col_sign * res_c, -1)
+    implied = np.stack([implied_row, implied_col], axis=-1)
+    implied_scores = np.full(implied.shape, UNSEEN_SCORE)
+
+    if candidates is not None:
+        cand = take_candidates(candidates, pool)
+        if candidate_scores is None:
+            scores = np.full(cand.shape, UNSEEN_SCORE)
+        else:
+            scores = take_candidates(candidate_scores, pool)
+        values = np.concatenate([cand, implied], axis=-1)
+        scores = np.concatenate([scores, implied_scores], axis=-1)
+    else:
+        values, scores = implied, implied_scores
+
+    # Candidates come first, so a value both proposed and implied keeps the
+    # recognizer's score; later duplicates are dropped
+    k = values.shape[-1]
+    same = values[..., :, None] == values[..., None, :]
+    duplicate = (same & np.tril(np.ones((k, k), dtype=bool), -1)).any(axis=-1)
+    usable = (values >= 0) & (values != current[..., None]) & ~duplicate
+    q = np.clip(scores, MIN_PROBABILITY, 1)
+    costs = np.where(usable, np.log(p)[..., None] - np.log(q), np.inf)
+    return pool, values, costs, row_slot, col_slot, row_sign, col_sign
+
+
+def take_candidates(candidates: np.ndarray, pool: np.ndarray) -> np.ndarray:
+    """
+    Gather the top-k candidates of the pool cells.
+
+    Args:
+        candidates (np.ndarray): (N, rows, cols, K) per-cell candidates.
+        pool (np.ndarray): (N, M) flat cell indices.
+
+    Returns:
+        np.ndarray: (N, M, K) candidates of the pool cells.
+    """
+    n, k = candidates.shape[0], candidates.shape[-1]
+    flat = candidates.reshape(n, -1, k)
+    return np.take_along_axis(flat, pool[..., None], axis=1)
+
+
+def _search_chunk(form_type, tables, confidences, candidates, candidate_scores, pool_size, max_changes):
+    """
+    Find the cheapest consistent repair of each table of a chunk; the
+    arguments are those of repair_tables.
+
+    Returns:
+        tuple: (repaired tables, repaired mask, repair costs)
+    """
+    n, rows, cols = tables.shape
+    row_res, col_res = table_residuals(form_type, tables)
+    # One residual vector per table, plus a dummy slot that is always zero
+    residuals = np.concatenate([row_res, col_res, np.zeros((n, 1), dtype=row_res.dtype)], axis=1)
+    nonzero = np.count_nonzero(residuals, axis=1)
+
+    repaired = tables.copy()
+    done = nonzero == 0
+    costs = np.where(done, 0.0, np.inf)
+    if done.all():
+        return repaired, np.zeros(n, dtype=bool), costs
+
+    pool, values, option_costs, row_slot, col_slot, row_sign, col_sign = _pool_options(
+        form_type, tables, confidences, candidates, candidate_scores, pool_size
+    )
+    m, k = values.shape[1:]
+    current = np.take_along_axis(tables.reshape(n, -1), pool, axis=1)
+    deltas = values - current[..., None]
+
+    # Each option touches two residual slots; flatten options to (N, M * K)
+    slots = np.stack(
+        [np.repeat(row_slot[..., None], k, axis=-1), np.repeat(col_slot[..., None], k, axis=-1)],
+        axis=-1,
+    ).reshape(n, m * k, 2)
+    moves = np.stack(
+        [row_sign[..., None] * deltas, col_sign[..., None] * deltas], axis=-1
+    ).reshape(n, m * k, 2)
+    option_costs = option_costs.reshape(n, m * k)
+    owner = np.repeat(np.arange(m), k)
+
+    # Enumerate single and pair repairs as index tuples into the options
+    combos = [(i,) for i in range(m * k)]
+    if max_changes >= 2:
+        combos += [
+            (a, b)
+            for a, b in combinations(range(m * k), 2)
+            if owner[a] != owner[b]
+        ]
+    width = max(len(combo) for combo in combos)
+    index = np.array([combo + (-1,) * (width - len(combo)) for combo in combos])
+    present = index >= 0
+    index = np.where(present, index, 0)
+
+    # (N, combos, width * 2) slots and moves touched by each repair
+    combo_slots = np.where(present[None, :, :, None], slots[:, index], rows + cols)
+    combo_moves = np.where(present[None, :, :, None], moves[:, index], 0)
+    combo_slots = combo_slots.reshape(n, len(combos), -1)
+    combo_moves = combo_moves.reshape(n, len(combos), -1)
+    combo_costs = np.where(present[None], option_costs[:, index], 0).sum(axis=-1)
+
+    # New value of every touched slot: its residual plus all moves landing on it
+    same_slot = combo_slots[..., :, None] == combo_slots[..., None, :]
+    new_values = np.take_along_axis(
+        residuals[:, None, :], combo_slots, axis=2
+    ) + (same_slot * combo_moves[..., None, :]).sum(axis=-1)
+    base_values = np.take_along_axis(residuals[:, None, :], combo_slots, axis=2)
+    # Count each touched slot once
+    t = combo_slots.shape[-1]
+    first = ~(same_slot & np.tril(np.ones((t, t), dtype=bool), -1)).any(axis=-1)
+    remaining = (
+        nonzero[:, None]
+        - ((base_values != 0) & first).sum(axis=-1)
+        + ((new_values != 0) & first).sum(axis=-1)
+    )
+    combo_costs = np.where((remaining == 0) & np.isfinite(combo_costs), combo_costs, np.inf)
+
+    best = np.argmin(combo_costs, axis=1)
+    best_cost = combo_costs[np.arange(n), best]
+    ties = (combo_costs <= best_cost[:, None] + TIE_TOLERANCE).sum(axis=1)
+    fixed = ~done & np.isfinite(best_cost) & (ties == 1)
+
+    for slot in range(width):
+        chosen = index[best, slot]
+        use = fixed & present[best, slot]
+        rows_idx = np.nonzero(use)[0]
+        cells = pool[rows_idx, owner[chosen[use]]]
+        flat = repaired.reshape(n, -1)
+        flat[rows_idx, cells] = values.reshape(n, m * k)[rows_idx, chosen[use]]
+    costs = np.where(fixed, best_cost, costs)
+    return repaired, fixed, costs
+
+
+def repair_tables(
+    form_type: str,
+    tables: np.ndarray,
+    confidences: np.ndarray,
+    candidates: Optional[np.ndarray] = None,
+    candidate_scores: Optional[np.ndarray] = None,
+    pool_size: int = POOL_SIZE,
+    max_changes: int = MAX_CHANGES,
+    max_cost: float = np.inf,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Repair a stack of tables so that every row and column total holds.
+
+    Args:
+        form_type (str): 'eeo1' or 'eeo5'.
+        tables (np.ndarray): (N, rows, cols) integer tables.
+        confidences (np.ndarray): (N, rows, cols) OCR confidences (-1 for empty cells).
+        candidates (np.ndarray): Optional (N, rows, cols, K) alternative readings
+            per cell, -1 where there is none.
+        candidate_scores (np.ndarray): Optional (N, rows, cols, K) scores of the candidates.
+        pool_size (int): Least confident cells considered per table.
+        max_changes (int): Cells changed by one repair, 1 or 2.
+        max_cost (float): Repairs costing more than this are rejected.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray, np.ndarray]: Repaired (N, rows, cols) tables,
+            (N,) mask of the tables that were changed, and (N,) repair costs
+            (0 for tables already consistent, inf for tables left unrepaired).
+    """
+    if max_changes not in (1, 2):
+        raise ValueError("max_changes must be 1 or 2")
+    tables = np.asarray(tables, dtype=np.int64)
+    confidences = np.asarray(confidences, dtype=np.float64)
+    # Empty cells keep confidence -1 but are read as 0: treat them as confident
+    # zeros, otherwise they fill the pool and the cheapest repair edits them
+    confidences = np.where(confidences < 0, 1 - MIN_PROBABILITY, confidences)
+    n = tables.shape[0]
+
+    repaired = tables.copy()
+    fixed = np.zeros(n, dtype=bool)
+    costs = np.full(n, np.inf)
+    for start in range(0, n, BATCH_SIZE):
+        part = slice(start, start + BATCH_SIZE)
+        repaired[part], fixed[part], costs[part] = _search_chunk(
+            form_type,
+            tables[part],
+            confidences[part],
+            None if candidates is None else np.asarray(candidates)[part],
+            None if candidate_scores is None else np.asarray(candidate_scores)[part],
+            pool_size,
+            max_changes,
+        )
+
+    rejected = fixed & (costs > max_cost)
+    repaired[rejected] = tables[rejected]
+    fixed &= ~rejected
+    costs[rejected] = np.inf
+    return repaired, fixed, costs
+
+
+def repair_table(
+    form_type: str,
+    data: List[List[int]],
+    confidence_table: List[List[float]],
+    candidates: Optional[np.ndarray] = None,
+    candidate_scores: Optional[np.ndarray] = None,
+) -> List[Tuple[int, int, int, int]]:
+    """
+    Repair one list-based table in place.
+
+    Args:
+        form_type (str): 'eeo1' or 'eeo5'.
+        data (List[List[int]]): Table content; repaired cells are written back.
+        confidence_table (List[List[float]]): Cell confidence levels.
+        candidates (np.ndarray): Optional (rows, cols, K) alternative readings.
+        candidate_scores (np.ndarray): Optional (rows, cols, K) candidate scores.
+
+    Returns:
+        List[Tuple[int, int, int, int]]: (row, col, old value, new value) of every
+            changed cell; empty when the table was consistent or could not be repaired.
+    """
+    table = np.asarray(data, dtype=np.int64)[None]
+    repaired, fixed, _ = repair_tables(
+        form_type,
+        table,
+        np.asarray(confidence_table, dtype=np.float64)[None],
+        None if candidates is None else np.asarray(candidates)[None],
+        None if candidate_scores is None else np.asarray(candidate_scores)[None],
+    )
+    if not fixed[0]:
+        return []
+    changes = []
+    for i, j in zip(*np.nonzero(repaired[0] != table[0])):
+        changes.append((int(i), int(j), int(table[0, i, j]), int(repaired[0, i, j])))
+        data[i][j] = int(repaired[0, i, j])
+    return changes
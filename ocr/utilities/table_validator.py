@@ -12,10 +12,17 @@ Key Features:
 - Correction logic when one low-confidence cell is likely to cause a mismatch
 - Support for both EEO-1 and EEO-5 table formats
 - Utility to update the grand total cell when intermediate sums are valid
+- Batched validation of an (N, rows, cols) stack of tables in one call
+
+The checks operate on numpy arrays; the list-based functions convert their input and write
+corrections back into the caller's lists.
 """
 
 from typing import List, Tuple
-import pandas as pd
+
+import numpy as np
+
+LOW_CONFIDENCE = 0.7  # Cells below this confidence may be corrected from the row total
 
 
 def table_validator(
@@ -37,6 +44,82 @@ def table_validator(
     return is_row_valid, is_col_valid
 
 
+def validate_tables(
+    form_type: str, tables: np.ndarray, confidences: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Batched table_validator over a stack of same-shaped tables.
+
+    Args:
+        form_type (str): Either 'eeo1' or 'eeo5'.
+        tables (np.ndarray): (N, rows, cols) integer tables; row corrections are
+            applied in place.
+        confidences (np.ndarray): (N, rows, cols) confidence scores.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: (N, rows) row validity and (N, cols)
+            column validity.
+    """
+    is_row_valid = correct_rows(tables, confidences)
+    is_col_valid = check_columns(form_type, tables)
+    return is_row_valid, is_col_valid
+
+
+def check_columns(form_type: str, tables: np.ndarray) -> np.ndarray:
+    """
+    Compare column sums with the total row.
+
+    EEO-1 tables carry the total in the second to last row (the last row is the
+    prior year total); EEO-5 tables carry it in the last row.
+
+    Args:
+        form_type (str): 'eeo1' or 'eeo5'; any other type validates nothing.
+        tables (np.ndarray): (..., rows, cols) integer tables.
+
+    Returns:
+        np.ndarray: (..., cols) column validity.
+    """
+    h = tables.shape[-2]
+    if form_type == "eeo1":
+        total_row = h - 2
+    elif form_type == "eeo5":
+        total_row = h - 1
+    else:
+        return np.zeros(tables.shape[:-2] + tables.shape[-1:], dtype=bool)
+    return tables[..., :total_row, :].sum(axis=-2) == tables[..., total_row, :]
+
+
+def correct_rows(tables: np.ndarray, confidences: np.ndarray) -> np.ndarray:
+    """
+    Compare row sums with the total column. A mismatching row with exactly one
+    low-confidence cell is corrected in place: the cell is recomputed from the
+    total, or the total from the other cells when the total is the uncertain
+    one, and the row is then counted as valid.
+
+    Args:
+        tables (np.ndarray): (..., rows, cols) integer tables, modified in place.
+        confidences (np.ndarray): (..., rows, cols) confidence scores.
+
+    Returns:
+        np.ndarray: (..., rows) row validity.
+    """
+    w = tables.shape[-1]
+    sums = tables[..., :-1].sum(axis=-1)
+    targets = tables[..., -1]
+    is_valid = sums == targets
+
+    low = confidences < LOW_CONFIDENCE
+    fixable = ~is_valid & (low.sum(axis=-1) == 1)
+    if fixable.any():
+        low_index = low.argmax(axis=-1)
+        current = np.take_along_axis(tables, low_index[..., None], axis=-1)[..., 0]
+        fixed = np.where(low_index == w - 1, sums, targets - (sums - current))
+        idx = np.nonzero(fixable)
+        tables[idx + (low_index[idx],)] = fixed[idx]
+        is_valid |= fixable
+    return is_valid
+
+
 def column_validator(form_type: str, data: List[List[int]]) -> List[bool]:
     """
     Validate that each column sum matches the reported total.
@@ -48,24 +131,7 @@ def column_validator(form_type: str, data: List[List[int]]) -> List[bool]:
     Returns:
         List[bool]: Validity of each column.
     """
-    df = pd.DataFrame(data)
-    isValid = [False for _ in range(len(df.columns))]
-    h, w = len(data), len(data[0])
-
-    for col in df.columns:
-        if form_type == "eeo1":
-            total = df.loc[0 : h - 3, col].sum()
-            target = df.loc[h - 2, col]
-        elif form_type == "eeo5":
-            total = df.loc[0 : h - 2, col].sum()
-            target = df.loc[h - 1, col]
-        else:
-            continue
-
-        if total == target:
-            isValid[int(col)] = True
-
-    return isValid
+    return check_columns(form_type, np.asarray(data, dtype=np.int64)).tolist()
 
 
 def row_validator_with_correction(
@@ -76,42 +142,18 @@ def row_validator_with_correction(
 
     Args:
         form_type (str): 'eeo1' or 'eeo5'.
-        data (List[List[int]]): Table content.
+        data (List[List[int]]): Table content; corrected cells are written back.
         confidence_table (List[List[float]]): Cell confidence levels.
 
     Returns:
         List[bool]: Row validity list.
     """
-    df = pd.DataFrame(data)
-    isValid = [False for _ in range(len(df.index))]
-    h, w = len(data), len(data[0])
-
-    for row_index in df.index:
-        total = df.loc[row_index, 0 : w - 2].sum()
-        target = df.loc[row_index, w - 1]
-
-        if total == target:
-            isValid[int(row_index)] = True
-        else:
-            conf_row = confidence_table[row_index]
-            low_conf_indices = [i for i, conf in enumerate(conf_row) if conf < 0.7]
-
-            if len(low_conf_indices) == 1:
-                low_conf_index = low_conf_indices[0]
-
-                # Try correcting the low-confidence value
-                if low_conf_index != w - 1:
-                    rest_sum = (
-                        sum(data[row_index][:-1]) - data[row_index][low_conf_index]
-                    )
-                    new_value = data[row_index][-1] - rest_sum
-                    data[row_index][low_conf_index] = new_value
-                else:
-                    data[row_index][low_conf_index] = sum(data[row_index][:-1])
-
-                isValid[int(row_index)] = True
-
-    return isValid
+    table = np.asarray(data, dtype=np.int64)
+    before = table.copy()
+    is_valid = correct_rows(table, np.asarray(confidence_table, dtype=np.float64))
+    for i, j in zip(*np.nonzero(table != before)):
+        data[i][j] = int(table[i, j])
+    return is_valid.tolist()
 
 
 def row_validator(data: List[List[int]]) -> List[bool]:
@@ -124,16 +166,8 @@ def row_validator(data: List[List[int]]) -> List[bool]:
     Returns:
         List[bool]: Row validity.
     """
-    df = pd.DataFrame(data)
-    isValid = [False for _ in range(len(df.index))]
-
-    for row_index in df.index:
-        total = df.loc[row_index, 0:13].sum()
-        target = df.loc[row_index, 14]
-        if total == target:
-            isValid[int(row_index)] = True
-
-    return isValid
+    table = np.asarray(data, dtype=np.int64)
+    return (table[:, 0:14].sum(axis=1) == table[:, 14]).tolist()
 
 
 def update_total(data: List[List[int]]) -> bool:
@@ -146,10 +180,10 @@ def update_total(data: List[List[int]]) -> bool:
     Returns:
         bool: True if update succeeded, False otherwise.
     """
-    df = pd.DataFrame(data)
-    h, w = len(data), len(data[0])
-    sum1 = df.iloc[0 : h - 3, -1].sum()
-    sum2 = df.iloc[h - 2, 0 : w - 1].sum()
+    table = np.asarray(data, dtype=np.int64)
+    h, w = table.shape
+    sum1 = int(table[0 : h - 3, -1].sum())
+    sum2 = int(table[h - 2, 0 : w - 1].sum())
 
     if sum1 == sum2:
         data[-2][-1] = sum1